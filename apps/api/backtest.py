@@ -0,0 +1,89 @@
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+# Rebalanced-portfolio simulation over a T x n matrix of daily log returns (from
+# PriceStore.returns_matrix) without a per-day loop: between rebalances each holding grows by its
+# cumulative return, so the portfolio's value in a period is sum_i w_i * exp(L_t,i - L_start,i)
+# with L the running sum of log returns. All periods are evaluated at once by indexing each row's
+# period weights and base. Turnover compares each new target with the previous period's drifted weights.
+
+REBALANCE = ("none", "monthly", "quarterly", "yearly")
+TRADING_DAYS = 252
+CURVE_POINTS = 250
+
+
+def period_starts(days: np.ndarray, rebalance: str) -> np.ndarray:
+    """Row indices where a new holding period starts: 0, then the first trading day of each month/quarter/year."""
+    if rebalance == "none" or len(days) == 0:
+        return np.zeros(1, dtype=np.int64)
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    keys = {"monthly": months, "quarterly": months // 3, "yearly": months // 12}[rebalance]
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def simulate(returns: np.ndarray, starts: np.ndarray, targets: np.ndarray, cost_bps: float = 0.0) -> Dict[str, np.ndarray]:
+    """
+    returns: T x n daily log returns (NaN = no price, treated as flat); starts: K period start
+    rows; targets: K x n weights set at the start of each period (before that day's return).
+    -> daily portfolio returns (net of cost_bps per unit of one-way turnover) and per-rebalance turnover.
+    """
+    T = len(returns)
+    logs = np.nan_to_num(returns, nan=0.0)
+    cum = np.vstack([np.zeros((1, logs.shape[1])), np.cumsum(logs, axis=0)])  # cum[t] = sum of rows < t
+
+    period = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, T]))
+    growth = np.exp(cum[1:] - cum[starts][period])          # each holding since its period start
+    value = np.einsum("tn,tn->t", targets[period], growth)   # portfolio value relative to period start
+    prev = np.r_[1.0, value[:-1]]
+    prev[starts] = 1.0
+    daily = value / prev - 1
+
+    # weights just before each rebalance, after drifting through the previous period
+    ends = np.r_[starts[1:], T] - 1
+    end_growth = targets * np.exp(cum[ends + 1] - cum[starts])
+    drifted = end_growth / end_growth.sum(axis=1, keepdims=True)
+    turnover = np.r_[0.0, 0.5 * np.abs(targets[1:] - drifted[:-1]).sum(axis=1)]
+    if cost_bps:
+        daily[starts] -= turnover * cost_bps / 10_000
+    return {"daily": daily, "turnover": turnover}
+
+
+def summarize(days: np.ndarray, daily: np.ndarray, turnover: np.ndarray, day_to_iso: Callable[[int], str]) -> Dict[str, Any]:
+    """Total and annualized return, volatility, Sharpe (rf = 0), max drawdown, turnover, and a downsampled equity curve."""
+    equity = np.cumprod(1 + daily)
+    peak = np.maximum.accumulate(np.r_[1.0, equity])[1:]
+    drawdown = equity / peak - 1
+    years = len(daily) / TRADING_DAYS
+    total = float(equity[-1] - 1)
+    vol = float(daily.std(ddof=1) * np.sqrt(TRADING_DAYS)) if len(daily) > 1 else 0.0
+    trough = int(drawdown.argmin())
+    pick = np.unique(np.linspace(0, len(equity) - 1, min(CURVE_POINTS, len(equity))).astype(np.int64))
+    return {
+        "start": day_to_iso(days[0]),
+        "end": day_to_iso(days[-1]),
+        "days": int(len(daily)),
+        "total_return": round(total, 4),
+        "annual_return": round(float((1 + total) ** (1 / years) - 1), 4) if years > 0 and total > -1 else None,
+        "volatility": round(vol, 4),
+        "sharpe": round(float(daily.mean() * TRADING_DAYS / vol), 3) if vol > 0 else None,
+        "max_drawdown": round(float(drawdown[trough]), 4),
+        "max_drawdown_date": day_to_iso(days[trough]),
+        "rebalances": int(len(turnover) - 1),
+        "turnover": round(float(turnover.sum()), 4),
+        "annual_turnover": round(float(turnover.sum() / years), 4) if years > 0 else None,
+        "curve": [{"date": day_to_iso(days[i]), "value": round(float(equity[i]), 5)} for i in pick],
+    }
+
+
+def fixed_targets(weights: np.ndarray, k: int) -> np.ndarray:
+    return np.broadcast_to(weights / weights.sum(), (k, len(weights))).copy()
+
+
+def rolling_targets(returns: np.ndarray, starts: np.ndarray, lookback: int,
+                    optimize: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+    """Re-run `optimize(trailing returns)` at every period start, seeing only the `lookback` rows before it."""
+    rows: List[np.ndarray] = []
+    for s in starts:
+        rows.append(optimize(returns[max(0, s - lookback):s]))
+    return np.vstack(rows)
@@ -0,0 +1,539 @@
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import types
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import product
+from string import ascii_uppercase
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+from neo4j.exceptions import ServiceUnavailable
+
+from providers import metrics
+from scoring import materialize
+from screening import ScreenFrame
+
+# Local stand-ins for Finnhub (sync client + async HTTP), the Groq/OpenAI client and the Neo4j
+# query layer, each with injected latency and error rate. Payloads are replayed from a fixture
+# file (see bench/record.py) when it has the symbol and synthesized per symbol otherwise.
+
+CANDLE_ORIGIN = 16000  # first synthetic trading day (2013-10-22), so paths don't depend on the window
+
+SECTORS = ("Technology", "Financial Services", "Health Care", "Energy", "Consumer Cyclical",
+           "Industrials", "Utilities", "Real Estate", "Communication Services", "Materials")
+
+
+class Injector:
+    """Latency (mean ± jitter, in ms) and error rate for one fake dependency."""
+
+    def __init__(self, name: str, latency_ms: float = 0.0, error_rate: float = 0.0,
+                 jitter: float = 0.25, seed: int | None = None):
+        self.name = name
+        self.latency_ms = max(0.0, latency_ms)
+        self.error_rate = max(0.0, min(1.0, error_rate))
+        self.jitter = max(0.0, min(1.0, jitter))
+        self.calls = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self) -> tuple[float, bool]:
+        with self._lock:
+            self.calls += 1
+            spread = self.jitter * (2 * self._rng.random() - 1)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return self.latency_ms * (1 + spread) / 1000, fail
+
+    def wait(self) -> bool:
+        """Sleep for one call's latency; True means this call should fail."""
+        delay, fail = self._draw()
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    async def await_(self) -> bool:
+        delay, fail = self._draw()
+        if delay:
+            await asyncio.sleep(delay)
+        return fail
+
+    def stats(self) -> Dict[str, Any]:
+        return {"latency_ms": self.latency_ms, "error_rate": self.error_rate,
+                "calls": self.calls, "errors": self.errors}
+
+
+def universe(n: int, fixtures: Dict[str, Any] | None = None, seed: int = 0) -> List[str]:
+    """Fixture symbols first, then deterministic 3-letter tickers up to n."""
+    tickers = list(dict.fromkeys((fixtures or {}).get("profile", {})))[:n]
+    pool = ["".join(p) for p in product(ascii_uppercase, repeat=3)]
+    random.Random(seed).shuffle(pool)
+    taken = set(tickers)
+    tickers.extend(t for t in pool[: n + len(taken)] if t not in taken)
+    return tickers[:n]
+
+
+#--------------------------------------- payloads ----------------------------------------
+class MarketData:
+    """Raw Finnhub payloads per symbol, in the shapes the real API returns."""
+
+    def __init__(self, fixtures: Dict[str, Any] | None = None, news_per_symbol: int = 20):
+        self.fixtures = fixtures or {}
+        self.news_per_symbol = news_per_symbol
+
+    def _recorded(self, kind: str, sym: str) -> Any:
+        return self.fixtures.get(kind, {}).get(sym)
+
+    @staticmethod
+    def _rng(kind: str, sym: str) -> random.Random:
+        return random.Random(zlib.crc32(f"{kind}:{sym}".encode("utf-8")))
+
+    def profile(self, sym: str) -> Dict[str, Any]:
+        recorded = self._recorded("profile", sym)
+        if recorded is not None:
+            return recorded
+        rng = self._rng("profile", sym)
+        return {
+            "ticker": sym,
+            "name": f"{sym.title()} Holdings Inc",
+            "finnhubIndustry": rng.choice(SECTORS),
+            "exchange": "NASDAQ NMS - GLOBAL MARKET",
+            "country": "US",
+            "currency": "USD",
+            "ipo": f"{rng.randint(1980, 2020)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+            "marketCapitalization": round(rng.lognormvariate(9, 1.5), 2),
+            "shareOutstanding": round(rng.uniform(50, 5000), 2),
+            "weburl": f"https://www.{sym.lower()}.example.com",
+        }
+
+    def metric(self, sym: str) -> Dict[str, Any]:
+        recorded = self._recorded("metrics", sym)
+        if recorded is not None:
+            return recorded
+        rng = self._rng("metrics", sym)
+        return {"symbol": sym, "metricType": "all", "metric": {
+            "peTTM": round(rng.uniform(-10, 80), 2),
+            "pbAnnual": round(rng.uniform(0.5, 20), 2),
+            "psTTM": round(rng.uniform(0.3, 25), 2),
+            "roeTTM": round(rng.uniform(-20, 60), 2),
+            "roaTTM": round(rng.uniform(-10, 25), 2),
+            "grossMarginTTM": round(rng.uniform(5, 80), 2),
+            "operatingMarginTTM": round(rng.uniform(-15, 45), 2),
+            "netProfitMarginTTM": round(rng.uniform(-20, 35), 2),
+            "debtToEquity": round(rng.uniform(0, 3), 2),
+            "currentRatio": round(rng.uniform(0.4, 4), 2),
+            "quickRatio": round(rng.uniform(0.3, 3.5), 2),
+            "beta": round(rng.uniform(0.3, 2.2), 2),
+            "dividendYieldTTM": round(max(0.0, rng.uniform(-2, 5)), 2),
+            "revenueGrowthTTM": round(rng.uniform(-15, 40), 2),
+            "epsGrowthTTM": round(rng.uniform(-30, 60), 2),
+        }}
+
+    def recommendation(self, sym: str) -> List[Dict[str, Any]]:
+        recorded = self._recorded("recommendation", sym)
+        if recorded is not None:
+            return recorded
+        rng = self._rng("recommendation", sym)
+        month = datetime.now(timezone.utc).date().replace(day=1)
+        rows = []
+        for _ in range(4):
+            rows.append({"symbol": sym, "period": month.isoformat(), "strongBuy": rng.randint(0, 15),
+                         "buy": rng.randint(0, 25), "hold": rng.randint(0, 20),
+                         "sell": rng.randint(0, 5), "strongSell": rng.randint(0, 3)})
+            month = (month - timedelta(days=1)).replace(day=1)
+        return rows
+
+    def news(self, sym: str) -> List[Dict[str, Any]]:
+        recorded = self._recorded("news", sym)
+        if recorded is not None:
+            return recorded
+        rng = self._rng("news", sym)
+        now = int(time.time())
+        words = ("beats", "misses", "expands", "cuts", "guides", "launches", "faces", "wins", "raises", "delays")
+        items = []
+        for i in range(self.news_per_symbol):
+            ts = now - rng.randint(600, 10 * 86400)
+            items.append({
+                "category": "company", "datetime": ts, "id": rng.randint(1, 10**9),
+                "headline": f"{sym} {rng.choice(words)} {rng.choice(('estimates', 'outlook', 'margins', 'product line', 'guidance'))}",
+                "image": "", "related": sym, "source": rng.choice(("Reuters", "Bloomberg", "MarketWatch", "Yahoo")),
+                "summary": f"Synthetic headline {i} for {sym}.",
+                "url": f"https://news.example.com/{sym.lower()}/{ts}-{i}",
+            })
+        return items
+
+    def candles(self, sym: str, start: int, end: int) -> Dict[str, Any]:
+        """Daily candles (weekdays) from a one-factor random walk: a shared market path times the
+        symbol's beta plus its own noise, so returns correlate like real ones."""
+        recorded = self._recorded("candles", sym)
+        if recorded is not None:
+            keep = [i for i, t in enumerate(recorded.get("t") or []) if start <= t <= end]
+            if not keep:
+                return {"s": "no_data"}
+            return {"s": "ok", **{k: [recorded[k][i] for i in keep] for k in ("t", "o", "h", "l", "c", "v")}}
+        first, last = start // 86400, end // 86400
+        days = np.arange(CANDLE_ORIGIN, last + 1)
+        if last < first or len(days) == 0:
+            return {"s": "no_data"}
+        beta = self.metric(sym)["metric"].get("beta", 1.0)
+        market = np.random.default_rng(7).normal(0.0003, 0.011, len(days))
+        own = np.random.default_rng(zlib.crc32(f"candles:{sym}".encode("utf-8"))).normal(0, 0.016, len(days))
+        close = 50 * np.exp(np.cumsum(beta * market + own))
+        keep = (days >= first) & ((days + 3) % 7 < 5)  # 1970-01-01 was a Thursday
+        t, c = days[keep] * 86400, np.round(close[keep], 4)
+        return {"s": "ok" if len(t) else "no_data", "t": t.tolist(), "c": c.tolist(),
+                "o": np.round(c * 0.998, 4).tolist(), "h": np.round(c * 1.01, 4).tolist(),
+                "l": np.round(c * 0.99, 4).tolist(), "v": [1_000_000.0] * len(t)}
+
+
+#--------------------------------------- Finnhub ----------------------------------------
+class FakeHTTPError(Exception):
+    """Shaped like finnhub.FinnhubAPIException (status_code), so the rate limiter retries it."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"injected HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeFinnhubClient:
+    """Stands in for finnhub.Client: the methods providers/finnhub.py calls."""
+
+    def __init__(self, data: MarketData, injector: Injector, error_status: int = 503):
+        self.data = data
+        self.injector = injector
+        self.error_status = error_status
+
+    def _call(self, payload):
+        if self.injector.wait():
+            raise FakeHTTPError(self.error_status)
+        return payload()
+
+    def company_profile2(self, symbol: str, **_):
+        return self._call(lambda: self.data.profile(symbol))
+
+    def company_basic_financials(self, symbol: str, metric: str = "all"):
+        return self._call(lambda: self.data.metric(symbol))
+
+    def recommendation_trends(self, symbol: str):
+        return self._call(lambda: self.data.recommendation(symbol))
+
+    def company_news(self, symbol: str, _from: str = "", to: str = ""):
+        return self._call(lambda: self.data.news(symbol))
+
+    def stock_candles(self, symbol: str, resolution: str, _from: int, to: int, **_):
+        return self._call(lambda: self.data.candles(symbol, _from, to))
+
+
+def finnhub_transport(data: MarketData, injector: Injector, error_status: int = 503) -> httpx.MockTransport:
+    """httpx transport answering the REST paths providers/finnhub_async.py requests."""
+    routes = {
+        "/stock/profile2": data.profile,
+        "/stock/metric": data.metric,
+        "/stock/recommendation": data.recommendation,
+        "/company-news": data.news,
+    }
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if await injector.await_():
+            return httpx.Response(error_status, json={"error": "injected"})
+        path = request.url.path.rsplit("/api/v1", 1)[-1]
+        route = routes.get(path)
+        if route is None:
+            return httpx.Response(404, json={"error": f"no fake for {path}"})
+        return httpx.Response(200, json=route(request.url.params.get("symbol", "").upper()))
+
+    return httpx.MockTransport(handler)
+
+
+#--------------------------------------- LLM ----------------------------------------
+class FakeLLM:
+    """OpenAI client stand-in: chat.completions.create, plain and stream=True."""
+
+    def __init__(self, injector: Injector, texts: List[str] | None = None):
+        self.injector = injector
+        self.texts = list(texts or [])
+        self._n = 0
+        self._lock = threading.Lock()
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    def _text(self, max_tokens: int) -> str:
+        with self._lock:
+            self._n += 1
+            n = self._n
+        if self.texts:
+            return self.texts[n % len(self.texts)]
+        words = ("Revenue", "growth", "remains", "steady", "while", "margins", "and", "guidance", "carry", "risk.")
+        return " ".join(words[i % len(words)] for i in range(max(8, max_tokens // 2)))
+
+    def create(self, *, max_tokens: int = 256, stream: bool = False, messages=(), response_format=None, **_):
+        if self.injector.wait():
+            raise TimeoutError("injected LLM error")
+        if response_format and response_format.get("type") == "json_object":
+            # batched news prompt: one entry per "[TICKER]" block
+            tickers = re.findall(r"^\[([A-Z0-9.\-]+)\]$", messages[-1]["content"], re.M)
+            text = json.dumps({t: {"summary": self._text(60)} for t in tickers})
+        else:
+            text = self._text(max_tokens)
+        if stream:
+            return iter([
+                types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=w + " "))])
+                for w in text.split()
+            ])
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=text))])
+
+
+#--------------------------------------- Neo4j ----------------------------------------
+class FakeGraph:
+    """
+    In-memory asset graph replacing main's Neo4j query functions. Each call still takes a slot
+    from main's PoolGauge and is timed like the real query, so pool waits and Server-Timing
+    behave as they do against a database.
+    """
+
+    def __init__(self, main, injector: Injector):
+        self.main = main
+        self.injector = injector
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.sectors: Dict[str, List[str]] = {}
+        self.sector_stats: Dict[str, Dict[str, Any]] = {}
+        self.dirty_sectors: set = set()  # written since their last aggregation
+        self.recs: Dict[str, List[Dict[str, Any]]] = {}
+        self.news: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _query(self, op: str):
+        with metrics.timed("neo4j", op), self.main._pool_gauge.slot():
+            if self.injector.wait():
+                raise ServiceUnavailable("injected Neo4j error")
+            with self._lock:
+                yield
+
+    def _item(self, key: str) -> Dict[str, Any]:
+        names = list(self.sectors.get(key, []))
+        stats = {"name": names[0], **self.sector_stats.get(names[0], {})} if names else None
+        return {**self.nodes[key], "sectors": names, "sectorStats": stats}
+
+    def _aggregate(self, names) -> None:
+        """main._aggregate_sector in Python: percentileCont(.., 0.5) is the interpolated median."""
+        def median(values):
+            values = [v for v in values if isinstance(v, (int, float))]
+            return float(np.median(values)) if values else None
+
+        now = self.main._now_ms()
+        for name in set(names):
+            self.dirty_sectors.discard(name)
+            members = [n for k, n in self.nodes.items() if name in self.sectors.get(k, [])]
+            scores = [n["score"] for n in members if isinstance(n.get("score"), (int, float))]
+            self.sector_stats[name] = {
+                "assetCount": len(members),
+                "medianPe": median(n.get("pe") for n in members if (n.get("pe") or 0) > 0),
+                "medianRoe": median(n.get("roe") for n in members),
+                "medianBeta": median(n.get("beta") for n in members),
+                "totalMarketCap": sum(n.get("marketCap") or 0 for n in members),
+                "avgScore": sum(scores) / len(scores) if scores else None,
+                "statsUpdatedAtMs": now,
+            }
+
+    def seed(self, data: MarketData, tickers: List[str]) -> None:
+        """Write the universe the way /ingest/finnhub would (profile + metrics, stamped now)."""
+        from providers.finnhub import _normalize_metrics, _normalize_profile
+        rows = []
+        for sym in tickers:
+            row = _normalize_profile(sym, data.profile(sym))
+            row["props"].update(_normalize_metrics(data.metric(sym).get("metric") or {}))
+            rows.append(row)
+        self.main._merge_fetched(rows)
+        for r in rows:
+            r["props"][self.main.REFRESH_STAMPS["metrics"]] = r["props"][self.main.REFRESH_STAMPS["profile"]]
+        self._upsert(rows)
+        self._aggregate(self.dirty_sectors)  # what the startup aggregation would do
+
+    def _upsert(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        now = self.main._now_ms()
+        results = []
+        for row in rows:
+            key = (row.get("ticker") or "").strip().upper()
+            if not key:
+                continue
+            node = self.nodes.get(key)
+            created = node is None
+            if created:
+                node = self.nodes[key] = {"ticker": key, "name": row.get("name") or row["ticker"]}
+                for prop in self.main.REFRESH_STAMPS.values():
+                    node[prop] = 0
+            elif row.get("name"):
+                node["name"] = row["name"]
+            sector = row.get("sector") or "Unknown"
+            if sector not in self.sectors.setdefault(key, []):
+                self.sectors[key].append(sector)
+            node.update(row.get("props") or {})
+            node.update(tickerKey=key, nameKey=node["name"].upper(), updatedAtMs=now)
+            node.update(materialize(node))
+            results.append({"ticker": key, "created": created, "name": node["name"],
+                            "sector": sector, "props": dict(node)})
+        self.dirty_sectors.update(s for r in results for s in self.sectors[r["ticker"]])
+        return results
+
+    # --- replacements for main's query functions ---
+
+    def load_snapshots(self, tickers: List[str], *, news_days: int = 30, news_limit: int = 10):
+        with self._query("_load_snapshots"):
+            records = self._snapshot_records(tickers, news_days, news_limit)
+        return self.main._shape_snapshots(records)
+
+    async def aload_snapshots(self, tickers: List[str], *, news_days: int = 30, news_limit: int = 10):
+        with metrics.timed("neo4j", "_aload_snapshots"):
+            async with self.main._apool_gauge.aslot():
+                if await self.injector.await_():
+                    raise ServiceUnavailable("injected Neo4j error")
+                with self._lock:
+                    records = self._snapshot_records(tickers, news_days, news_limit)
+        return self.main._shape_snapshots(records)
+
+    def _snapshot_records(self, tickers: List[str], news_days: int, news_limit: int) -> List[Dict[str, Any]]:
+        since = int(time.time()) - max(1, news_days) * 86400
+        records = []
+        for key in self.main._ticker_keys(tickers):
+            if key not in self.nodes:
+                continue
+            news = sorted((n for n in self.news.get(key, {}).values() if (n.get("datetime") or 0) >= since),
+                          key=lambda n: n.get("datetime") or 0, reverse=True)[:news_limit]
+            recs = sorted(self.recs.get(key, []), key=lambda r: r.get("period") or "", reverse=True)
+            records.append({"ticker": key, "item": self._item(key), "recs": recs, "news": news})
+        return records
+
+    def get_asset_items(self, tickers: List[str]) -> Dict[str, dict]:
+        keys = self.main._ticker_keys(tickers)
+        if not keys:
+            return {}
+        with self._query("_get_asset_items"):
+            return {k: self._item(k) for k in keys if k in self.nodes}
+
+    def upsert_assets(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with self._query("upsert_assets"):
+            results = self._upsert(rows)
+        if self.main._search_index.warm:
+            self.main._search_index.upsert(results)
+        self.main._invalidate_screen_frame()
+        created = [r["ticker"] for r in results if r["created"]]
+        updated = [r["ticker"] for r in results if not r["created"]]
+        return {
+            "total_touched": len(results),
+            "created_count": len(created),
+            "updated_count": len(updated),
+            "created_tickers": created,
+            "updated_tickers": updated,
+        }
+
+    def update_asset_props(self, rows: List[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        with self._query("update_asset_props"):
+            n = 0
+            for row in rows:
+                node = self.nodes.get(row["ticker"])
+                if node is not None:
+                    node.update(row.get("props") or {})
+                    node.update(materialize(node))
+                    n += 1
+            self.dirty_sectors.update(s for row in rows for s in self.sectors.get(row["ticker"], []))
+        self.main._invalidate_screen_frame()
+        return n
+
+    def store_scores(self, rows: List[Dict[str, Any]]) -> None:
+        if rows:
+            with self._query("_store_scores"):
+                for row in rows:
+                    if row["ticker"] in self.nodes:
+                        self.nodes[row["ticker"]].update(row["props"])
+
+    def store_recommendations(self, ticker: str, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        key = ticker.strip().upper()
+        with self._query("_store_recommendations"):
+            if key in self.nodes:
+                self.nodes[key]["recsFetchedAtMs"] = self.main._now_ms()
+                by_period = {r["period"]: r for r in self.recs.get(key, [])}
+                for row in rows:
+                    if row.get("period"):
+                        by_period[row["period"]] = {k: row.get(k) for k in self.main.REC_FIELDS if row.get(k) is not None}
+                self.recs[key] = list(by_period.values())
+
+    def store_news(self, ticker: str, items: List[Dict[str, Any]], *, days: int, limit: int) -> None:
+        if not items:
+            return
+        key = ticker.strip().upper()
+        with self._query("_store_news"):
+            if key in self.nodes:
+                self.nodes[key].update(newsFetchedAtMs=self.main._now_ms(), newsFetchedDays=int(days),
+                                       newsFetchedLimit=int(limit))
+                stored = self.news.setdefault(key, {})
+                for it in items:
+                    stored[self.main._news_key(it)] = {k: it.get(k) for k in self.main.NEWS_FIELDS if it.get(k) is not None}
+
+    def list_assets_with_sectors(self, sector: Optional[str] = None, limit: int = 100) -> list[dict]:
+        want = (sector or "").strip().upper()
+        with self._query("list_assets_with_sectors"):
+            rows = [{"ticker": k, "sector": s} for k in sorted(self.nodes) for s in self.sectors.get(k, [])
+                    if not want or s.upper() == want]
+        return rows[:limit]
+
+    def refresh_search_index(self) -> int:
+        with self._query("_refresh_search_index"):
+            rows = [{"ticker": k, "name": n["name"], "sectors": self.sectors.get(k, [])} for k, n in self.nodes.items()]
+        return self.main._search_index.load(rows)
+
+    def load_screen_frame(self) -> ScreenFrame:
+        with self._query("_load_screen_frame"):
+            rows = [{**n, "sector": (self.sectors.get(k) or ["Unknown"])[0]} for k, n in self.nodes.items()]
+        return ScreenFrame(rows)
+
+    def refresh_all_sector_stats(self, stale_only: bool = False) -> int:
+        with self._query("_refresh_all_sector_stats"):
+            names = {s for names in self.sectors.values() for s in names}
+            if stale_only:
+                names = (names - set(self.sector_stats)) | self.dirty_sectors
+            self._aggregate(names)
+        return len(names)
+
+    def list_sectors(self) -> List[Dict[str, Any]]:
+        with self._query("list_sectors"):
+            return [{"name": name, **stats} for name, stats in sorted(self.sector_stats.items())]
+
+    def install(self) -> None:
+        m = self.main
+        m._load_snapshots = self.load_snapshots
+        m._aload_snapshots = self.aload_snapshots
+        m._get_asset_items = self.get_asset_items
+        m.upsert_assets = self.upsert_assets
+        m.update_asset_props = self.update_asset_props
+        m._store_scores = self.store_scores
+        m._store_recommendations = self.store_recommendations
+        m._store_news = self.store_news
+        m.list_assets_with_sectors = self.list_assets_with_sectors
+        m._refresh_search_index = self.refresh_search_index
+        m._load_screen_frame = self.load_screen_frame
+        m._refresh_all_sector_stats = self.refresh_all_sector_stats
+        m.list_sectors = self.list_sectors
+
+
+def install(main, *, graph: FakeGraph, finnhub: FakeFinnhubClient, transport: httpx.MockTransport,
+            llm: FakeLLM | None) -> None:
+    """Point main and the Finnhub providers at the fakes. Call before the first request."""
+    import providers.finnhub as finnhub_sync
+    import providers.finnhub_async as finnhub_async
+
+    finnhub_sync.finnhub_client = finnhub
+    finnhub_async._client = httpx.AsyncClient(base_url=finnhub_async.API_BASE, transport=transport)
+    main._llm_client = llm
+    graph.install()
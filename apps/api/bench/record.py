@@ -0,0 +1,87 @@
+"""
+Record live Finnhub (and optionally Groq) responses into a fixture file for bench.run --fixtures.
+
+    cd apps/api
+    FINNHUB_API_KEY=... python -m bench.record AAPL MSFT NVDA --out bench/fixtures.json
+    # add --llm (needs GROQ_API_KEY) to also record one news summary per ticker
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+
+def record(tickers: List[str], days: int = 14, with_llm: bool = False) -> Dict[str, Any]:
+    from providers import ratelimit
+    from providers.finnhub import _news_window, finnhub_client
+
+    out: Dict[str, Any] = {"profile": {}, "metrics": {}, "recommendation": {}, "news": {}, "candles": {}}
+    start, end = _news_window(days)
+    for sym in dict.fromkeys(t.strip().upper() for t in tickers if t.strip()):
+        try:
+            out["profile"][sym] = ratelimit.call(lambda: finnhub_client.company_profile2(symbol=sym), op="/stock/profile2")
+            out["metrics"][sym] = ratelimit.call(
+                lambda: finnhub_client.company_basic_financials(symbol=sym, metric="all"), op="/stock/metric")
+            out["recommendation"][sym] = ratelimit.call(
+                lambda: finnhub_client.recommendation_trends(symbol=sym), op="/stock/recommendation")
+            out["news"][sym] = ratelimit.call(
+                lambda: finnhub_client.company_news(sym, _from=start, to=end), op="/company-news")[:50]
+        except Exception as e:
+            print("[record] ERROR:", sym, type(e).__name__, str(e))
+            for kind in out:
+                out[kind].pop(sym, None)
+            continue
+        try:
+            # a year of daily candles; not every Finnhub plan includes them, so a failure only skips prices
+            now = int(time.time())
+            candles = ratelimit.call(lambda: finnhub_client.stock_candles(sym, "D", now - 365 * 86400, now), op="/stock/candle")
+            if (candles or {}).get("s") == "ok":
+                out["candles"][sym] = candles
+        except Exception as e:
+            print("[record] ERROR: candles", sym, type(e).__name__, str(e))
+        print(f"[record] {sym}: {len(out['news'][sym])} headlines, {len((out['candles'].get(sym) or {}).get('t') or [])} candles")
+
+    if with_llm:
+        out["llm"] = _record_llm(out["news"])
+    return out
+
+
+def _record_llm(news: Dict[str, List[Dict[str, Any]]]) -> List[str]:
+    from openai import OpenAI
+
+    client = OpenAI(base_url="https://api.groq.com/openai/v1", api_key=os.environ["GROQ_API_KEY"])
+    texts = []
+    for sym, items in news.items():
+        headlines = "\n".join(f"- {it.get('headline', '')}" for it in items[:5])
+        resp = client.chat.completions.create(
+            model="meta-llama/llama-4-scout-17b-16e-instruct",
+            temperature=0.2,
+            max_tokens=350,
+            messages=[
+                {"role": "system", "content": "Be concise, neutral and factual."},
+                {"role": "user", "content": "Summarize these recent headlines in 3-5 sentences.\n\n" + headlines},
+            ],
+        )
+        texts.append((resp.choices[0].message.content or "").strip())
+    return [t for t in texts if t]
+
+
+def main(argv: List[str] | None = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench.record", description="Record fixtures for bench.run")
+    p.add_argument("tickers", nargs="+")
+    p.add_argument("--out", default="bench/fixtures.json")
+    p.add_argument("--days", type=int, default=14, help="news window")
+    p.add_argument("--llm", action="store_true", help="also record one Groq summary per ticker")
+    args = p.parse_args(argv)
+
+    fixtures = record(args.tickers, days=args.days, with_llm=args.llm)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(fixtures, fh, indent=1)
+    print(f"[record] wrote {len(fixtures['profile'])} symbols to {args.out}")
+    return 0 if fixtures["profile"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
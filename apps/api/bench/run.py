@@ -0,0 +1,314 @@
+"""
+Offline load benchmark: drives the FastAPI app in-process (ASGI, no sockets) with Finnhub,
+the LLM and Neo4j replaced by the fakes in bench/fakes.py, then prints p50/p95/p99 latency
+and throughput per endpoint.
+
+    cd apps/api
+    python -m bench.run --requests 600 --concurrency 16 --mix advice=1,ingest=1,search=4
+    python -m bench.run --json after.json --baseline before.json   # exit 1 on p95 regressions
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+import numpy as np
+
+DEFAULT_MIX = "advice=1,ingest=1,search=4"
+
+
+def _parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m bench.run", description=__doc__.strip().splitlines()[0])
+    p.add_argument("--requests", type=int, default=500, help="measured requests (after warm-up)")
+    p.add_argument("--duration", type=float, default=0, help="run for this many seconds instead of --requests")
+    p.add_argument("--warmup", type=int, default=20, help="requests sent before measuring")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--mix", default=DEFAULT_MIX, help=f"endpoint weights, from: {', '.join(SCENARIOS)}")
+    p.add_argument("--universe", type=int, default=500, help="assets in the fake graph")
+    p.add_argument("--fixtures", help="JSON recorded by bench.record; replayed before synthetic data")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--jitter", type=float, default=0.25, help="latency spread, fraction of the mean")
+    p.add_argument("--finnhub-ms", type=float, default=120)
+    p.add_argument("--finnhub-errors", type=float, default=0.0, help="fraction of Finnhub calls answered 503")
+    p.add_argument("--neo4j-ms", type=float, default=4)
+    p.add_argument("--neo4j-errors", type=float, default=0.0)
+    p.add_argument("--llm-ms", type=float, default=700)
+    p.add_argument("--llm-errors", type=float, default=0.0)
+    p.add_argument("--no-llm", action="store_true", help="run without an LLM client (data-only rationale)")
+    p.add_argument("--no-cache", action="store_true", help="send no_cache=true to /advice/v1")
+    p.add_argument("--price-days", type=int, default=0,
+                   help="preload this many days of candles into the price store (advice then uses return history)")
+    p.add_argument("--finnhub-rate", type=float, default=0,
+                   help="Finnhub calls/min for the app's rate limiter (default: unlimited)")
+    p.add_argument("--json", dest="json_out", help="write results here")
+    p.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    p.add_argument("--max-regression", type=float, default=0.2,
+                   help="allowed p95 growth over the baseline before exiting 1")
+    return p.parse_args(argv)
+
+
+#--------------------------------------- scenarios ----------------------------------------
+# name -> fn(rng, tickers, args) -> (method, url, httpx request kwargs)
+Scenario = Callable[[random.Random, List[str], argparse.Namespace], Tuple[str, str, Dict[str, Any]]]
+
+
+def _advice(rng, tickers, args):
+    body = {"tickers": rng.sample(tickers, rng.randint(2, 5)), "risk": rng.randint(1, 5), "no_cache": args.no_cache}
+    return "POST", "/advice/v1", {"json": body}
+
+
+def _advice_batch(rng, tickers, args):
+    # 20 model portfolios drawn from a shared 30-ticker list, so they overlap heavily
+    pool = tickers[:30]
+    portfolios = [{"tickers": rng.sample(pool, rng.randint(2, 5)), "risk": rng.randint(1, 5)} for _ in range(20)]
+    return "POST", "/advice/batch", {"json": {"portfolios": portfolios, "no_cache": args.no_cache}}
+
+
+def _ingest(rng, tickers, args):
+    return "GET", "/ingest/finnhub", {"params": {"tickers": rng.sample(tickers, 10), "include": "metrics"}}
+
+
+def _search(rng, tickers, args):
+    t = rng.choice(tickers)
+    return "GET", "/search", {"params": {"q": t[: rng.randint(1, len(t))], "limit": 20}}
+
+
+def _street(rng, tickers, args):
+    return "GET", "/analyze/street", {"params": {"ticker": rng.choice(tickers)}}
+
+
+def _news(rng, tickers, args):
+    return "GET", "/analyze/news", {"params": {"ticker": rng.choice(tickers), "days": 14, "limit": 5}}
+
+
+def _screen(rng, tickers, args):
+    body = {"filters": [{"metric": "pe", "min": 0, "max": rng.choice((15, 25, 40))}], "top_k": 25}
+    return "POST", "/screen", {"json": body}
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "advice": _advice,
+    "advice_batch": _advice_batch,
+    "ingest": _ingest,
+    "search": _search,
+    "street": _street,
+    "news": _news,
+    "screen": _screen,
+}
+
+
+def _parse_mix(raw: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in raw.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+#--------------------------------------- app setup ----------------------------------------
+def _configure_env(args: argparse.Namespace) -> None:
+    """Settings main reads at import time; must run before `import main`."""
+    os.environ.setdefault("FINNHUB_API_KEY", "bench")
+    rate = args.finnhub_rate or 1e9
+    os.environ["FINNHUB_RATE_PER_MIN"] = str(rate)
+    os.environ["FINNHUB_RATE_BURST"] = str(rate if not args.finnhub_rate else max(1.0, rate / 6))
+    os.environ.pop("FINNHUB_RATE_FILE", None)
+    os.environ.pop("LLM_CACHE_DB", None)
+    os.environ.pop("GROQ_API_KEY", None)
+    scratch = tempfile.mkdtemp(prefix="bench-")
+    os.environ["JOBS_DB"] = os.path.join(scratch, "jobs.sqlite3")
+    os.environ["PRICE_STORE_DIR"] = os.path.join(scratch, "prices")
+    os.environ["REFRESH_CALLS_PER_MIN"] = "0"
+    os.environ["SEARCH_INDEX_REFRESH_S"] = "0"
+
+
+def _build_app(args: argparse.Namespace):
+    _configure_env(args)
+    import main
+    from bench import fakes
+
+    fixtures = None
+    if args.fixtures:
+        with open(args.fixtures, "r", encoding="utf-8") as fh:
+            fixtures = json.load(fh)
+    data = fakes.MarketData(fixtures)
+    injectors = {
+        "finnhub": fakes.Injector("finnhub", args.finnhub_ms, args.finnhub_errors, args.jitter, args.seed),
+        "neo4j": fakes.Injector("neo4j", args.neo4j_ms, args.neo4j_errors, args.jitter, args.seed + 1),
+        "llm": fakes.Injector("llm", args.llm_ms, args.llm_errors, args.jitter, args.seed + 2),
+    }
+    graph = fakes.FakeGraph(main, injectors["neo4j"])
+    tickers = fakes.universe(args.universe, fixtures, args.seed)
+    graph.seed(data, tickers)
+    llm = None if args.no_llm else fakes.FakeLLM(injectors["llm"], (fixtures or {}).get("llm"))
+    fakes.install(
+        main,
+        graph=graph,
+        finnhub=fakes.FakeFinnhubClient(data, injectors["finnhub"]),
+        transport=fakes.finnhub_transport(data, injectors["finnhub"]),
+        llm=llm,
+    )
+    # startup hooks (DDL, background threads) are skipped; only the search index is warmed
+    main._refresh_search_index()
+    if args.price_days:
+        now = int(time.time())
+        for t in tickers:
+            c = data.candles(t, now - args.price_days * 86400, now)
+            if c.get("s") == "ok":
+                main._prices.append(t, [ts // 86400 for ts in c["t"]], {
+                    "open": c["o"], "high": c["h"], "low": c["l"], "close": c["c"], "volume": c["v"]})
+    return main, tickers, injectors
+
+
+#--------------------------------------- load ----------------------------------------
+def _server_timing(header: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for part in header.split(","):
+        name, *attrs = [a.strip() for a in part.split(";")]
+        for a in attrs:
+            if a.startswith("dur="):
+                out[name] = float(a[4:])
+    return out
+
+
+async def _drive(app, tickers: List[str], mix: Dict[str, float], args: argparse.Namespace):
+    rng = random.Random(args.seed)
+    names, weights = list(mix), list(mix.values())
+    samples: List[Dict[str, Any]] = []
+    sent = 0
+    deadline = None
+
+    def next_request():
+        nonlocal sent
+        if deadline is not None:
+            if time.perf_counter() >= deadline:
+                return None
+        elif sent >= args.requests:
+            return None
+        sent += 1
+        name = rng.choices(names, weights)[0]
+        return name, SCENARIOS[name](rng, tickers, args)
+
+    async def one(client: httpx.AsyncClient, name: str, req) -> Dict[str, Any]:
+        method, url, kwargs = req
+        started = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+            status = resp.status_code
+            timing = _server_timing(resp.headers.get("server-timing", ""))
+        except Exception as e:
+            print(f"[bench] ERROR: {name}", type(e).__name__, str(e))
+            status, timing = 0, {}
+        return {"endpoint": name, "status": status, "ms": (time.perf_counter() - started) * 1000, "timing": timing}
+
+    async def worker(client: httpx.AsyncClient):
+        while (job := next_request()) is not None:
+            samples.append(await one(client, *job))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for _ in range(args.warmup):
+            name = rng.choices(names, weights)[0]
+            await one(client, name, SCENARIOS[name](rng, tickers, args))
+
+        if args.duration:
+            deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(max(1, args.concurrency))))
+        wall = time.perf_counter() - started
+    return samples, wall
+
+
+#--------------------------------------- report ----------------------------------------
+def summarize(samples: List[Dict[str, Any]], wall_s: float) -> Dict[str, Dict[str, Any]]:
+    """Per-endpoint latency percentiles (all completed requests), error count and throughput."""
+    out: Dict[str, Dict[str, Any]] = {}
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for s in samples:
+        groups.setdefault(s["endpoint"], []).append(s)
+    groups["all"] = samples
+    for name, group in groups.items():
+        if not group:
+            continue
+        ms = np.array([s["ms"] for s in group])
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        deps: Dict[str, float] = {}
+        for s in group:
+            for k, v in s["timing"].items():
+                if k != "app":
+                    deps[k] = deps.get(k, 0.0) + v
+        out[name] = {
+            "requests": len(group),
+            "errors": sum(1 for s in group if not 200 <= s["status"] < 300),
+            "rps": round(len(group) / wall_s, 2) if wall_s else None,
+            "mean_ms": round(float(ms.mean()), 2),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "max_ms": round(float(ms.max()), 2),
+            "dependency_ms": {k: round(v / len(group), 2) for k, v in sorted(deps.items())},
+        }
+    return out
+
+
+def _print_report(results: Dict[str, Dict[str, Any]], wall_s: float, injectors) -> None:
+    head = f"{'endpoint':<10} {'reqs':>6} {'errs':>5} {'rps':>8} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  dependency time (summed ms per request)"
+    print(head)
+    print("-" * len(head))
+    for name, r in results.items():
+        deps = " ".join(f"{k}={v:g}" for k, v in r["dependency_ms"].items())
+        print(f"{name:<10} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} {r['mean_ms']:>9.1f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}  {deps}")
+    print(f"\nwall {wall_s:.2f}s; fake calls: "
+          + ", ".join(f"{k} {i.calls} ({i.errors} failed)" for k, i in injectors.items()))
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], max_regression: float) -> List[str]:
+    """Endpoints whose p95 grew more than max_regression over the baseline."""
+    worse = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("p95_ms"):
+            continue
+        growth = r["p95_ms"] / base["p95_ms"] - 1
+        if growth > max_regression:
+            worse.append(f"{name}: p95 {base['p95_ms']:.1f}ms -> {r['p95_ms']:.1f}ms (+{growth:.0%})")
+    return worse
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = _parse_args(argv)
+    mix = _parse_mix(args.mix)
+    app_module, tickers, injectors = _build_app(args)
+
+    samples, wall = asyncio.run(_drive(app_module.app, tickers, mix, args))
+    app_module._advice_pool.shutdown(wait=False, cancel_futures=True)
+    results = summarize(samples, wall)
+    _print_report(results, wall, injectors)
+
+    if args.json_out:
+        config = {k: v for k, v in vars(args).items() if k not in ("json_out", "baseline")}
+        with open(args.json_out, "w", encoding="utf-8") as fh:
+            json.dump({"config": config, "wall_s": round(wall, 3), "endpoints": results}, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)["endpoints"]
+        worse = compare(results, baseline, args.max_regression)
+        for line in worse:
+            print("[bench] REGRESSION:", line)
+        if worse:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import codecs
+import csv
+import json
+import math
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+# columns that map onto IngestAsset fields; every other CSV column goes into props
+BASE_FIELDS = ("ticker", "name", "sector")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Split a byte stream into (line_no, text) without ever holding more than one partial line."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buf = ""
+    line_no = 0
+    async for chunk in chunks:
+        buf += decoder.decode(chunk)
+        *lines, buf = buf.split("\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line.rstrip("\r")
+    buf += decoder.decode(b"", final=True)
+    if buf:
+        yield line_no + 1, buf.rstrip("\r")
+
+
+def _value(raw: str) -> Any:
+    """Numeric cells become floats; nan/inf become None (dropped) so they never reach a metric."""
+    try:
+        f = float(raw)
+    except ValueError:
+        return raw
+    return f if math.isfinite(f) else None
+
+
+async def parse_ndjson(lines: AsyncIterator[Tuple[int, str]]) -> AsyncIterator[Tuple[int, Dict[str, Any] | None, str | None]]:
+    """Yield (line_no, row, error) for each non-blank line holding one JSON object."""
+    async for line_no, line in lines:
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(obj, dict):
+            yield line_no, None, "expected a JSON object"
+            continue
+        yield line_no, obj, None
+
+
+async def parse_csv(lines: AsyncIterator[Tuple[int, str]]) -> AsyncIterator[Tuple[int, Dict[str, Any] | None, str | None]]:
+    """
+    Yield (line_no, row, error) for each data line. The first line is the header; it must have a
+    `ticker` column, `name`/`sector` are optional and any other column becomes a property, numeric
+    when it parses. Quoted fields may not span lines.
+    """
+    header: List[str] | None = None
+    async for line_no, line in lines:
+        if not line.strip():
+            continue
+        cells = next(csv.reader([line]))
+        if header is None:
+            header = [c.strip() for c in cells]
+            if "ticker" not in header:
+                yield line_no, None, "CSV header needs a 'ticker' column"
+                return
+            continue
+        if len(cells) > len(header):
+            yield line_no, None, f"expected {len(header)} columns, got {len(cells)}"
+            continue
+        row: Dict[str, Any] = {"props": {}}
+        for col, raw in zip(header, cells):
+            raw = raw.strip()
+            if not raw:
+                continue
+            if col in BASE_FIELDS:
+                row[col] = raw
+            elif (value := _value(raw)) is not None:
+                row["props"][col] = value
+        yield line_no, row, None
+
+
+# price CSV columns; header names are matched case-insensitively, 'symbol' works for 'ticker'
+PRICE_COLUMNS = ("ticker", "date", "open", "high", "low", "close", "volume")
+
+
+async def parse_price_csv(lines: AsyncIterator[Tuple[int, str]], ticker: str | None = None
+                          ) -> AsyncIterator[Tuple[int, Dict[str, Any] | None, str | None]]:
+    """
+    Yield (line_no, row, error) for daily price lines: `date` and `close` are required, open/high/
+    low/volume optional, other columns ignored. Without a `ticker` column every row belongs to
+    `ticker`. Dates are left as text; the caller parses them.
+    """
+    header: List[str] | None = None
+    async for line_no, line in lines:
+        if not line.strip():
+            continue
+        cells = next(csv.reader([line]))
+        if header is None:
+            header = [c.strip().lower().replace("symbol", "ticker") for c in cells]
+            missing = [c for c in ("date", "close") if c not in header]
+            if "ticker" not in header and not ticker:
+                missing.append("ticker (or ?ticker=)")
+            if missing:
+                yield line_no, None, f"CSV header needs: {', '.join(missing)}"
+                return
+            continue
+        row: Dict[str, Any] = {"ticker": ticker}
+        error = None
+        for col, raw in zip(header, cells):
+            raw = raw.strip()
+            if col not in PRICE_COLUMNS or not raw:
+                continue
+            if col in ("ticker", "date"):
+                row[col] = raw
+                continue
+            value = _value(raw)
+            if not isinstance(value, float):
+                error = f"{col}: not a number"
+                break
+            row[col] = value
+        if error is None and (not row.get("ticker") or not row.get("date") or row.get("close") is None):
+            error = "needs ticker, date and close"
+        yield line_no, None if error else row, error
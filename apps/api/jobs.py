@@ -0,0 +1,282 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+# A job is a list of items (tickers) split into chunks; chunks are the unit of work, retry and
+# progress. State lives in SQLite so queued and half-done jobs survive a restart. Chunks that
+# were running when the process died are queued again on start(), which assumes one API
+# process per database file.
+
+CHUNK_STATUSES = ("queued", "running", "done", "error", "cancelled")
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+      id TEXT PRIMARY KEY,
+      kind TEXT NOT NULL,
+      status TEXT NOT NULL,
+      params TEXT NOT NULL,
+      total INTEGER NOT NULL,
+      created_at REAL NOT NULL,
+      started_at REAL,
+      finished_at REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS job_chunks (
+      job_id TEXT NOT NULL,
+      idx INTEGER NOT NULL,
+      round INTEGER NOT NULL DEFAULT 0,
+      items TEXT NOT NULL,
+      status TEXT NOT NULL,
+      not_before REAL NOT NULL DEFAULT 0,
+      result TEXT,
+      error TEXT,
+      started_at REAL,
+      finished_at REAL,
+      PRIMARY KEY (job_id, idx)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS job_chunks_queue ON job_chunks (status, not_before)",
+    "CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at)",
+)
+
+
+class JobStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            for stmt in _SCHEMA:
+                db.execute(stmt)
+
+    @contextmanager
+    def _connect(self):
+        # autocommit connection per operation, closed afterwards: the store holds no open handle
+        db = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # --- writes ---
+    def create(self, kind: str, items: List[str], chunk_size: int, params: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        with self._lock, self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("INSERT INTO jobs (id, kind, status, params, total, created_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                       (job_id, kind, json.dumps(params), len(items), now))
+            db.executemany("INSERT INTO job_chunks (job_id, idx, items, status) VALUES (?, ?, ?, 'queued')",
+                           [(job_id, i, json.dumps(c)) for i, c in enumerate(chunks)])
+            db.execute("COMMIT")
+        return job_id
+
+    def claim(self) -> Dict[str, Any] | None:
+        """Atomically take the oldest runnable chunk (across all jobs, FIFO by job creation)."""
+        now = time.time()
+        with self._lock, self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("""
+                SELECT c.job_id, c.idx, c.round, c.items, j.kind, j.params
+                FROM job_chunks c JOIN jobs j ON j.id = c.job_id
+                WHERE c.status = 'queued' AND c.not_before <= ?
+                ORDER BY j.created_at, c.idx LIMIT 1
+            """, (now,)).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute("UPDATE job_chunks SET status = 'running', started_at = ? WHERE job_id = ? AND idx = ?",
+                       (now, row["job_id"], row["idx"]))
+            db.execute("UPDATE jobs SET status = 'running', started_at = coalesce(started_at, ?) WHERE id = ? AND status = 'queued'",
+                       (now, row["job_id"]))
+            db.execute("COMMIT")
+        return {
+            "job_id": row["job_id"], "idx": row["idx"], "round": row["round"], "kind": row["kind"],
+            "items": json.loads(row["items"]), "params": json.loads(row["params"]),
+        }
+
+    def finish(self, chunk: Dict[str, Any], *, result: Dict[str, Any] | None = None, error: str | None = None,
+               retry_items: List[str] | None = None, retry_at: float = 0.0) -> None:
+        """Record a chunk's outcome, optionally queue `retry_items` as a follow-up chunk, and close the job when nothing is left."""
+        now = time.time()
+        job_id = chunk["job_id"]
+        with self._lock, self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("UPDATE job_chunks SET status = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ? AND idx = ?",
+                       ("error" if error else "done", json.dumps(result) if result is not None else None, error,
+                        now, job_id, chunk["idx"]))
+            cancelled = db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()["status"] == "cancelled"
+            if retry_items and not cancelled:
+                nxt = db.execute("SELECT max(idx) + 1 FROM job_chunks WHERE job_id = ?", (job_id,)).fetchone()[0]
+                db.execute("INSERT INTO job_chunks (job_id, idx, round, items, status, not_before) VALUES (?, ?, ?, ?, 'queued', ?)",
+                           (job_id, nxt, chunk["round"] + 1, json.dumps(retry_items), retry_at))
+            open_chunks = db.execute("SELECT count(*) FROM job_chunks WHERE job_id = ? AND status IN ('queued', 'running')",
+                                     (job_id,)).fetchone()[0]
+            if not open_chunks and not cancelled:
+                ok = db.execute("SELECT count(*) FROM job_chunks WHERE job_id = ? AND status = 'done'", (job_id,)).fetchone()[0]
+                db.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?",
+                           ("done" if ok else "failed", now, job_id))
+            db.execute("COMMIT")
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock, self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            cur = db.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                             (time.time(), job_id))
+            if cur.rowcount:
+                db.execute("UPDATE job_chunks SET status = 'cancelled' WHERE job_id = ? AND status = 'queued'", (job_id,))
+            db.execute("COMMIT")
+            return bool(cur.rowcount)
+
+    def requeue_running(self) -> int:
+        """Put chunks interrupted by a restart back in the queue."""
+        with self._lock, self._connect() as db:
+            return db.execute("UPDATE job_chunks SET status = 'queued', started_at = NULL WHERE status = 'running'").rowcount
+
+    # --- reads ---
+    def get(self, job_id: str) -> Dict[str, Any] | None:
+        with self._lock, self._connect() as db:
+            job = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            chunks = db.execute("SELECT * FROM job_chunks WHERE job_id = ? ORDER BY idx", (job_id,)).fetchall()
+        return _summarize(job, chunks)
+
+    def list(self, status: str | None = None, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock, self._connect() as db:
+            if status:
+                jobs = db.execute("SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)).fetchall()
+            else:
+                jobs = db.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+            out = []
+            for job in jobs:
+                chunks = db.execute("SELECT * FROM job_chunks WHERE job_id = ? ORDER BY idx", (job["id"],)).fetchall()
+                out.append(_summarize(job, chunks, detail=False))
+        return out
+
+
+def _summarize(job: sqlite3.Row, chunks: List[sqlite3.Row], detail: bool = True) -> Dict[str, Any]:
+    """Fold chunk results into one job view: numeric result fields are summed, list fields concatenated."""
+    counts = {s: 0 for s in CHUNK_STATUSES}
+    totals: Dict[str, int] = {"written": 0}
+    lists: Dict[str, List[str]] = {"failed": [], "deferred": []}
+    errors: List[Dict[str, Any]] = []
+    for c in chunks:
+        counts[c["status"]] += 1
+        if c["result"]:
+            for k, v in json.loads(c["result"]).items():
+                if isinstance(v, list):
+                    lists.setdefault(k, []).extend(v)
+                elif isinstance(v, (int, float)):
+                    totals[k] = totals.get(k, 0) + v
+        if c["error"]:
+            lists["failed"] += json.loads(c["items"])
+            errors.append({"chunk": c["idx"], "error": c["error"]})
+
+    failed, deferred = lists["failed"], lists["deferred"]
+    processed = totals["written"] + len(failed) + len(deferred)
+    end = job["finished_at"] or time.time()
+    elapsed = (end - job["started_at"]) if job["started_at"] else 0.0
+    rate = processed / elapsed * 60.0 if elapsed > 0 else None
+    remaining = max(job["total"] - processed, 0)
+
+    out = {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "params": json.loads(job["params"]),
+        "total": job["total"],
+        "processed": processed,
+        "progress": round(processed / job["total"], 4) if job["total"] else 1.0,
+        **totals,
+        **{f"{k}_count": len(v) for k, v in lists.items()},
+        "chunks": counts,
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "elapsed_s": round(elapsed, 1),
+        "per_minute": round(rate, 1) if rate else None,
+        "eta_s": round(remaining / rate * 60.0, 1) if rate and job["status"] in ("queued", "running") else None,
+    }
+    if detail:
+        out.update({k: sorted(set(v)) for k, v in lists.items()})
+        out["errors"] = errors
+    return out
+
+
+class JobQueue:
+    """
+    Bounded pool of worker threads draining a JobStore. `handlers[kind](items, params)` runs one
+    chunk and returns a result dict; items listed in its "retry" key are queued again as a new
+    chunk after `retry_delay_s`, up to `max_rounds` times, then reported as deferred.
+    """
+
+    def __init__(self, store: JobStore, handlers: Dict[str, Callable[[List[str], Dict[str, Any]], Dict[str, Any]]], *,
+                 workers: int = 2, retry_delay_s: float = 60.0, max_rounds: int = 3, poll_s: float = 2.0):
+        self.store = store
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.retry_delay_s = retry_delay_s
+        self.max_rounds = max_rounds
+        self.poll_s = poll_s
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        n = self.store.requeue_running()
+        if n:
+            print(f"[jobs] requeued {n} interrupted chunks")
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._threads = []
+
+    def submit(self, kind: str, items: List[str], *, chunk_size: int, params: Dict[str, Any]) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"unknown job kind {kind!r}")
+        job_id = self.store.create(kind, items, chunk_size, params)
+        self._wake.set()
+        return job_id
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                chunk = self.store.claim()
+            except sqlite3.Error as e:
+                print("[jobs] ERROR:", type(e).__name__, str(e))
+                chunk = None
+            if chunk is None:
+                self._wake.wait(self.poll_s)
+                self._wake.clear()
+                continue
+            self._run_chunk(chunk)
+
+    def _run_chunk(self, chunk: Dict[str, Any]) -> None:
+        try:
+            result = self.handlers[chunk["kind"]](chunk["items"], chunk["params"])
+        except Exception as e:
+            print(f"[jobs] ERROR in {chunk['job_id']}#{chunk['idx']}:", type(e).__name__, str(e))
+            self.store.finish(chunk, error=f"{type(e).__name__}: {e}")
+            return
+        retry = list(result.pop("retry", None) or [])
+        if retry and chunk["round"] + 1 < self.max_rounds:
+            self.store.finish(chunk, result=result, retry_items=retry, retry_at=time.time() + self.retry_delay_s)
+        else:
+            result["deferred"] = (result.get("deferred") or []) + retry
+            self.store.finish(chunk, result=result)
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from providers.cache import TTLCache
+
+
+def fingerprint(model: str, params: Dict[str, Any], messages: List[Dict[str, Any]]) -> str:
+    """Stable key for one chat completion: same model, parameters and messages -> same hash."""
+    raw = json.dumps({"model": model, "params": params, "messages": messages},
+                     sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier cache for completion texts: an in-memory LRU (with single-flight, so identical
+    concurrent prompts make one LLM call) in front of an optional SQLite file that survives
+    restarts and is shared by all workers on the host.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, db_path: str | None = None):
+        self.ttl = float(ttl)
+        self.memory = TTLCache("llm", maxsize, ttl)
+        self.db_path = db_path
+        self._db_lock = threading.Lock()
+        self.disk_hits = 0
+        if db_path:
+            with self._connect() as db:
+                db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+                db.execute("DELETE FROM llm_cache WHERE expires < ?", (time.time(),))
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _disk_get(self, key: str) -> str | None:
+        if not self.db_path:
+            return None
+        try:
+            with self._db_lock, self._connect() as db:
+                row = db.execute("SELECT value FROM llm_cache WHERE key = ? AND expires >= ?", (key, time.time())).fetchone()
+        except sqlite3.Error as e:
+            print("[llm-cache] ERROR:", type(e).__name__, str(e))
+            return None
+        if row:
+            self.disk_hits += 1
+            return row[0]
+        return None
+
+    def _disk_set(self, key: str, value: str) -> None:
+        if not self.db_path:
+            return
+        try:
+            with self._db_lock, self._connect() as db:
+                db.execute("INSERT OR REPLACE INTO llm_cache (key, value, expires) VALUES (?, ?, ?)",
+                           (key, value, time.time() + self.ttl))
+        except sqlite3.Error as e:
+            print("[llm-cache] ERROR:", type(e).__name__, str(e))
+
+    def get_or_create(self, key: str, create: Callable[[], str | None], *, use_cache: bool = True) -> str | None:
+        """
+        Return the cached text for `key`, or call `create()` and cache a non-empty result.
+        With use_cache=False the lookup is skipped but the fresh answer still replaces the entry.
+        """
+        def load():
+            if use_cache:
+                cached = self._disk_get(key)
+                if cached:
+                    return cached
+            text = create()
+            if text:
+                self._disk_set(key, text)
+            return text
+
+        if not use_cache:
+            text = load()
+            self.memory.set(key, text)
+            return text
+        return self.memory.get_or_load(key, load)
+
+    def get(self, key: str) -> str | None:
+        text = self.memory.get(key)
+        if text is None:
+            text = self._disk_get(key)
+            if text:
+                self.memory.set(key, text)
+        return text
+
+    def set(self, key: str, text: str | None) -> None:
+        if text:
+            self.memory.set(key, text)
+            self._disk_set(key, text)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.memory.stats(), "disk": self.db_path, "disk_hits": self.disk_hits}
@@ -1,12 +1,45 @@
 from typing import Dict, List, Optional, Any
 import os
 import re
-from fastapi import FastAPI, Body, Query, Path
-from pydantic import BaseModel, Field
+import sys
+import time
+import hashlib
+import threading
+import json
+import contextvars
+import numpy as np
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed, wait
+from fastapi import FastAPI, Body, Query, Path, Request
+from pydantic import BaseModel, Field, ValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from neo4j import GraphDatabase, Driver
+from neo4j import AsyncDriver, AsyncGraphDatabase, GraphDatabase, Driver
 from fastapi import HTTPException
-from providers.finnhub import fetch_profiles
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.datastructures import MutableHeaders
+from providers import metrics, ratelimit
+from providers.finnhub import cache_stats, fetch_basic_financials, fetch_candles, fetch_finnhub_recommendation, fetch_profiles
+from search_index import PrefixIndex
+from ingest_stream import iter_lines, parse_csv, parse_ndjson, parse_price_csv
+from jobs import JobQueue, JobStore
+from neo4j_pool import PoolGauge
+from llm_cache import LLMCache, fingerprint
+from news_summary import batch_messages, parse_batch
+from sentiment import score_news, scorer as sentiment_scorer
+from scoring import METRIC_KEYS, RULES_VERSION, extract_metrics, fmt_money, materialize
+from screening import SCREEN_FIELDS, ScreenFrame
+from portfolio import describe as describe_portfolio, optimize as optimize_portfolio, sample_cov
+from pricestore import PriceStore, from_day, to_day
+from backtest import fixed_targets, period_starts, rolling_targets, simulate, summarize
+from providers.cache import TTLCache
+from providers.finnhub_async import (
+    afetch_basic_financials,
+    afetch_company_news,
+    afetch_finnhub_recommendation,
+    afetch_profiles,
+    close_async_client,
+)
 
 APP_NAME = "advisor-api"
 DISCLAIMER_LINK = "Educational (@https://github.com/macantomato)"
@@ -19,8 +52,7 @@ app = FastAPI(title="AI-Driven Investment Advisor (Educational)")
 
 @app.on_event("startup")
 def _startup_check_and_constraints():
-    drv = get_driver()
-    with drv.session() as s:
+    with db_session() as s:
         # connectivity check
         s.run("RETURN 1")
         s.run("""
@@ -37,6 +69,81 @@ def _startup_check_and_constraints():
         CREATE CONSTRAINT sector_name_unique IF NOT EXISTS
         FOR (s:Sector) REQUIRE s.name IS UNIQUE
         """)
+        # snapshots of Finnhub recommendation trends / headlines, linked to their Asset
+        s.run("""
+        CREATE CONSTRAINT news_key_unique IF NOT EXISTS
+        FOR (n:NewsItem) REQUIRE n.key IS UNIQUE
+        """)
+        s.run("""
+        CREATE INDEX news_datetime_idx IF NOT EXISTS
+        FOR (n:NewsItem) ON (n.datetime)
+        """)
+        # normalized (uppercased) lookup keys, so case-insensitive equality/prefix reads can seek an index
+        s.run("""
+        CREATE INDEX asset_ticker_key_idx IF NOT EXISTS
+        FOR (a:Asset) ON (a.tickerKey)
+        """)
+        s.run("""
+        CREATE INDEX asset_name_key_idx IF NOT EXISTS
+        FOR (a:Asset) ON (a.nameKey)
+        """)
+        s.run("""
+        CREATE TEXT INDEX asset_name_key_text_idx IF NOT EXISTS
+        FOR (a:Asset) ON (a.nameKey)
+        """)
+        s.run("""
+        CREATE INDEX sector_name_key_idx IF NOT EXISTS
+        FOR (s:Sector) ON (s.nameKey)
+        """)
+        # "assets not refreshed since X" (ingest jobs)
+        s.run("""
+        CREATE INDEX asset_updated_at_idx IF NOT EXISTS
+        FOR (a:Asset) ON (a.updatedAtMs)
+        """)
+        # per-kind fetch stamps, scanned stalest-first by the refresh scheduler
+        for kind, prop in REFRESH_STAMPS.items():
+            s.run(f"""
+            CREATE INDEX asset_{kind}_fetched_idx IF NOT EXISTS
+            FOR (a:Asset) ON (a.{prop})
+            """)
+        # materialized fundamentals score, for ranking queries
+        s.run("""
+        CREATE INDEX asset_score_idx IF NOT EXISTS
+        FOR (a:Asset) ON (a.score)
+        """)
+        # backfill keys on nodes written before they existed (no-op once done)
+        s.run("""
+        MATCH (a:Asset) WHERE a.tickerKey IS NULL OR a.nameKey IS NULL
+        CALL {
+          WITH a
+          SET a.tickerKey = toUpper(a.ticker), a.nameKey = toUpper(coalesce(a.name, a.ticker))
+        } IN TRANSACTIONS OF 1000 ROWS
+        """)
+        s.run("""
+        MATCH (s:Sector) WHERE s.nameKey IS NULL
+        SET s.nameKey = toUpper(s.name)
+        """)
+        # never-fetched is stamp 0 (not null) so the stamp indexes cover it; same for
+        # updatedAtMs on assets written before it was stamped, for the stale_hours range scan
+        s.run("""
+        MATCH (a:Asset)
+        WHERE a.profileFetchedAtMs IS NULL OR a.metricsFetchedAtMs IS NULL OR a.recsFetchedAtMs IS NULL
+           OR a.updatedAtMs IS NULL
+        CALL {
+          WITH a
+          SET a.profileFetchedAtMs = coalesce(a.profileFetchedAtMs, 0),
+              a.metricsFetchedAtMs = coalesce(a.metricsFetchedAtMs, 0),
+              a.recsFetchedAtMs = coalesce(a.recsFetchedAtMs, 0),
+              a.updatedAtMs = coalesce(a.updatedAtMs, 0)
+        } IN TRANSACTIONS OF 1000 ROWS
+        """)
+    # warm the /search index in the background; /search uses Neo4j until it is ready
+    threading.Thread(target=_search_index_loop, name="search-index", daemon=True).start()
+    # score assets written before scores were materialized (or under older rules)
+    threading.Thread(target=_backfill_scores_quietly, name="score-backfill", daemon=True).start()
+    get_jobs().start()
+    # Finnhub refreshes only run with REFRESH_CALLS_PER_MIN > 0; sector aggregation always does
+    threading.Thread(target=_refresh_loop, name="refresh-scheduler", daemon=True).start()
     
 
 
@@ -58,28 +165,163 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+
+class TimingMiddleware:
+    """
+    Per-request latency: observes http_request_duration_seconds by route template and adds a
+    Server-Timing header (total plus time spent in Finnhub, Neo4j and the LLM). For streamed
+    responses the header is sent with the first bytes, so it only covers work done until then.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        timing, token = metrics.start_request()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", metrics.server_timing(timing, time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            metrics.REQUESTS.observe(time.perf_counter() - started, scope["method"], route, str(status))
+            metrics.end_request(token)
+
+
+app.add_middleware(TimingMiddleware)
+
 # --- Minimal Neo4j driver (lazy init) ---
+# Pool settings go straight to the driver. With a neo4j:// or neo4j+s:// URI, execute_read
+# routes to followers / read replicas of a cluster; bolt:// talks to the one server.
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE") or None
+NEO4J_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_ACQUIRE_TIMEOUT_S = float(os.getenv("NEO4J_ACQUIRE_TIMEOUT_S", "30"))
+NEO4J_DRIVER_CONFIG: Dict[str, Any] = {
+    "max_connection_pool_size": NEO4J_POOL_SIZE,
+    "connection_acquisition_timeout": NEO4J_ACQUIRE_TIMEOUT_S,
+    "max_connection_lifetime": float(os.getenv("NEO4J_MAX_CONN_LIFETIME_S", "3600")),
+    "connection_timeout": float(os.getenv("NEO4J_CONNECT_TIMEOUT_S", "15")),
+    "keep_alive": os.getenv("NEO4J_KEEP_ALIVE", "true").strip().lower() not in ("0", "false", "no"),
+    "max_transaction_retry_time": float(os.getenv("NEO4J_TX_RETRY_S", "15")),
+}
+if os.getenv("NEO4J_LIVENESS_CHECK_S"):
+    # ping connections idle longer than this before reuse (managed clouds drop idle sockets)
+    NEO4J_DRIVER_CONFIG["liveness_check_timeout"] = float(os.getenv("NEO4J_LIVENESS_CHECK_S"))
+
 _driver: Driver | None = None
+_adriver: AsyncDriver | None = None
+_pool_gauge = PoolGauge("sync", NEO4J_POOL_SIZE, NEO4J_ACQUIRE_TIMEOUT_S)
+_apool_gauge = PoolGauge("async", NEO4J_POOL_SIZE, NEO4J_ACQUIRE_TIMEOUT_S)
+
+
+def _neo4j_auth() -> tuple[str, tuple[str, str]]:
+    uri = os.getenv("NEO4J_URI")
+    user = os.getenv("NEO4J_USER")
+    pw = os.getenv("NEO4J_PASS")
+    if not all([uri, user, pw]):
+        raise RuntimeError("Missing NEO4J_URI/NEO4J_USER/NEO4J_PASS env vars.")
+    return uri, (user, pw)
+
 
 def get_driver() -> Driver:
     global _driver
     if _driver is None:
-        uri = os.getenv("NEO4J_URI")
-        user = os.getenv("NEO4J_USER")
-        pw = os.getenv("NEO4J_PASS")
-        if not all([uri, user, pw]):
-            raise RuntimeError("Missing NEO4J_URI/NEO4J_USER/NEO4J_PASS env vars.")
-        _driver = GraphDatabase.driver(uri, auth=(user, pw))
+        uri, auth = _neo4j_auth()
+        _driver = GraphDatabase.driver(uri, auth=auth, **NEO4J_DRIVER_CONFIG)
     return _driver
 
+
+def get_async_driver() -> AsyncDriver:
+    """Driver for async endpoints; separate pool, same settings."""
+    global _adriver
+    if _adriver is None:
+        uri, auth = _neo4j_auth()
+        _adriver = AsyncGraphDatabase.driver(uri, auth=auth, **NEO4J_DRIVER_CONFIG)
+    return _adriver
+
+
+@contextmanager
+def db_session():
+    with _pool_gauge.slot():
+        with get_driver().session(database=NEO4J_DATABASE) as s:
+            yield s
+
+
+def _records(tx, cypher: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [dict(r) for r in tx.run(cypher, params)]
+
+
+def _caller() -> str:
+    # the calling function names the query in the latency metrics
+    return sys._getframe(2).f_code.co_name
+
+
+def _read(cypher: str, **params) -> List[Dict[str, Any]]:
+    """Managed read transaction (retried on transient errors, routed to readers in a cluster)."""
+    with metrics.timed("neo4j", _caller()), db_session() as s:
+        return s.execute_read(_records, cypher, params)
+
+
+def _write(cypher: str, **params) -> List[Dict[str, Any]]:
+    with metrics.timed("neo4j", _caller()), db_session() as s:
+        return s.execute_write(_records, cypher, params)
+
+
+async def _arecords(tx, cypher: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    result = await tx.run(cypher, params)
+    return [dict(r) async for r in result]
+
+
+async def _aread(cypher: str, **params) -> List[Dict[str, Any]]:
+    with metrics.timed("neo4j", _caller()):
+        return await _aread_timed(cypher, params)
+
+
+async def _aread_timed(cypher: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async with _apool_gauge.aslot():
+        async with get_async_driver().session(database=NEO4J_DATABASE) as s:
+            return await s.execute_read(_arecords, cypher, params)
+
+
 @app.on_event("shutdown")
 def _close_driver():
     global _driver
     if _driver is not None:
         _driver.close()
 
+
+@app.on_event("shutdown")
+async def _close_async_driver():
+    if _adriver is not None:
+        await _adriver.close()
+
+@app.on_event("shutdown")
+async def _close_finnhub_client():
+    await close_async_client()
+
+
+@app.on_event("shutdown")
+def _stop_jobs():
+    global _jobs
+    if _jobs is not None:
+        _jobs.stop()
+        _jobs = None
+
 class AdviceRequest(BaseModel):
     risk: int = Field(ge=1, le=5, description="Risk level 1–5 (low→high)")
     universe: List[str] = Field(min_length=1, description="List of tickers/assets")
@@ -97,11 +339,61 @@ def health():
 
 @app.get("/db/ping")
 def db_ping():
-    drv = get_driver()
-    with drv.session() as s:
-        value = s.run("RETURN 1 AS value").single()["value"]
+    value = _read("RETURN 1 AS value")[0]["value"]
     return {"neo4j": "ok", "value": value}
 
+@app.get("/db/pool")
+def db_pool():
+    return {
+        "config": {k: v for k, v in NEO4J_DRIVER_CONFIG.items()},
+        "database": NEO4J_DATABASE,
+        "sync": _pool_gauge.stats(_driver),
+        "async": _apool_gauge.stats(_adriver),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def _cache_metric_lines():
+    caches = cache_stats() + [{**_llm_cache.stats(), "name": "llm"}, sentiment_scorer.cache.stats(), _backtest_cache.stats()]
+    yield from metrics.gauge_lines("cache_hit_ratio", "Hits (incl. coalesced waiters) / lookups per cache.",
+                                   [({"cache": c["name"]}, c["hit_ratio"]) for c in caches])
+    yield from metrics.gauge_lines("cache_lookups_total", "Cache lookups by result.", [
+        ({"cache": c["name"], "result": result}, c[result]) for c in caches for result in ("hits", "misses", "coalesced")
+    ], kind="counter")
+    yield from metrics.gauge_lines("cache_entries", "Entries currently cached.", [({"cache": c["name"]}, c["size"]) for c in caches])
+
+
+def _pool_metric_lines():
+    pools = [("sync", _pool_gauge.stats(_driver)), ("async", _apool_gauge.stats(_adriver))]
+    for key, help in (("in_use", "Neo4j sessions in use."), ("peak", "Most Neo4j sessions in use at once."),
+                      ("idle_connections", "Idle connections in the driver pool.")):
+        yield from metrics.gauge_lines(f"neo4j_pool_{key}", help, [({"driver": name}, st.get(key)) for name, st in pools])
+    yield from metrics.gauge_lines("neo4j_pool_wait_seconds_total", "Time spent waiting for a session slot.",
+                                   [({"driver": name}, g.wait_s) for name, g in (("sync", _pool_gauge), ("async", _apool_gauge))],
+                                   kind="counter")
+    yield from metrics.gauge_lines("neo4j_pool_timeouts_total", "Session slot acquisition timeouts.",
+                                   [({"driver": name}, st["timeouts"]) for name, st in pools], kind="counter")
+
+
+def _ratelimit_metric_lines():
+    st = ratelimit.bucket.stats()
+    yield from metrics.gauge_lines("finnhub_ratelimit_granted_total", "Finnhub call tokens granted by lane.",
+                                   [({"lane": k}, v) for k, v in st["granted"].items()], kind="counter")
+    yield from metrics.gauge_lines("finnhub_ratelimit_timeouts_total", "Callers deferred waiting for a token, by lane.",
+                                   [({"lane": k}, v) for k, v in st["timeouts"].items()], kind="counter")
+
+
+for _collector in (_cache_metric_lines, _pool_metric_lines, _ratelimit_metric_lines):
+    metrics.register_collector(_collector)
+
+@app.get("/cache/stats")
+def finnhub_cache_stats():
+    return {"finnhub": cache_stats(), "rate_limit": ratelimit.bucket.stats(), "llm": _llm_cache.stats(),
+            "sentiment": sentiment_scorer.cache.stats(), "backtest": _backtest_cache.stats()}
+
 @app.get("/")
 def root():
     return {"ok": True, "hint": "Use /health, /db/ping, /docs"}
@@ -124,46 +416,56 @@ def search(
                    description="Search ticker or name (case-insensitive prefix)"),
     limit: int = Query(default=20, ge=1, le=100, description="Max rows to return")
 ):
+    if _search_index.warm:
+        rows = _search_index.search(q, int(limit))
+        return {"count": len(rows), "items": rows, "disclaimer": DISCLAIMER_LINK}
     try:
-        drv = get_driver()
-        with drv.session() as s:
-            cypher = """
-            MATCH (a:Asset)-[:IN_SECTOR]->(s:Sector)
-            WHERE toUpper(a.ticker) STARTS WITH toUpper($q)
-            OR toUpper(coalesce(a.name, '')) STARTS WITH toUpper($q)
-            RETURN a.ticker AS ticker,
-                   coalesce(a.name, a.ticker) AS name,
-                   coalesce(s.name, 'Unknown') AS sector
-            ORDER BY ticker
-            LIMIT $limit
-            """
-            result = s.run(cypher, q=q, limit=int(limit))
-            rows = [dict(r) for r in result]
+        # each UNION branch is an index seek on a normalized key instead of a label scan
+        cypher = """
+        CALL {
+          MATCH (a:Asset) WHERE a.tickerKey STARTS WITH $key RETURN a
+          UNION
+          MATCH (a:Asset) WHERE a.nameKey STARTS WITH $key RETURN a
+        }
+        MATCH (a)-[:IN_SECTOR]->(s:Sector)
+        RETURN a.ticker AS ticker,
+               coalesce(a.name, a.ticker) AS name,
+               coalesce(s.name, 'Unknown') AS sector
+        ORDER BY ticker
+        LIMIT $limit
+        """
+        rows = _read(cypher, key=q.strip().upper(), limit=int(limit))
         return {"count": len(rows), "items": rows, "disclaimer": DISCLAIMER_LINK}
     except Exception as e:
         print("[/search] ERROR:", type(e).__name__, str(e))
         raise HTTPException(status_code=500, detail="Database read failed")
 
 
+@app.post("/search/refresh")
+def search_refresh():
+    try:
+        count = _refresh_search_index()
+    except Exception as e:
+        print("[/search/refresh] ERROR:", type(e).__name__, str(e))
+        raise HTTPException(status_code=500, detail="Database read failed")
+    return {"assets": count, **_search_index.stats()}
+
+
+@app.get("/search/stats")
+def search_stats():
+    return _search_index.stats()
+
+
 @app.get("/asset/{ticker}")
 def asset_details(
     ticker: str = Path(..., description="Ticker symbol, example AAGL, MSFT,")
 ):
     try:
-        drv = get_driver()
         #Added to return all props from asset node
-        cypher = """
-        MATCH (a:Asset)
-        WHERE toUpper(a.ticker) = toUpper($ticker)
-        OPTIONAL MATCH (a)-[:IN_SECTOR]->(s:Sector)
-        WITH a, collect(DISTINCT s.name) AS sectors
-        RETURN a{ .*, sectors: sectors } AS item
-        """
-        with drv.session() as s:
-            record = s.run(cypher, ticker=ticker).single()
-        if not record:
+        item = _get_asset_item(ticker)
+        if not item:
             raise HTTPException(status_code=404, detail="Asset not found")
-        return {"item": dict(record), "disclaimer": DISCLAIMER_LINK}
+        return {"item": {"item": item}, "disclaimer": DISCLAIMER_LINK}
     except HTTPException:
         raise
     except Exception as e:
@@ -171,28 +473,32 @@ def asset_details(
         raise HTTPException(status_code=500, detail="Database read failed")
 
 @app.get("/ingest/finnhub")
-def ingest_finnhub(
+async def ingest_finnhub(
     tickers: List[str] = Query(..., min_items=1, max_items=50, description="Repeat ?tickers=AAPL&tickers=MSFT"),
     include: Optional[str] = Query(None, description="comma list: metrics")
 ):
     if len(tickers) > 50:
         raise HTTPException(status_code=400, detail="Max 50 tickers allowed")
     try:
-        from providers.finnhub import fetch_basic_financials
-        rows = fetch_profiles(tickers)
+        # bulk lane: interactive /analyze/* calls get the Finnhub budget first
+        deferred: List[str] = []
+        metrics_deferred: List[str] = []
+        with ratelimit.lane("bulk"):
+            rows = await afetch_profiles(tickers, deferred=deferred)
+            include_set = {s.strip().lower() for s in (include.split(",") if include else [])}
+            fetched_metrics = None
+            if rows and "metrics" in include_set:
+                fetched_metrics = await afetch_basic_financials([r["ticker"] for r in rows], deferred=metrics_deferred)
+            _merge_fetched(rows, fetched_metrics)
+
+        # profile not fetched -> not written; metrics not fetched -> written without metrics
+        deferred_info = {"deferred_tickers": sorted(deferred), "metrics_deferred_tickers": sorted(metrics_deferred)}
         if not rows:
             return {"received": 0, "created_count": 0, "updated_count": 0,
-                    "created_tickers": [], "updated_tickers": [], "disclaimer": DISCLAIMER_LINK}
-
-        include_set = {s.strip().lower() for s in (include.split(",") if include else [])}
+                    "created_tickers": [], "updated_tickers": [], **deferred_info, "disclaimer": DISCLAIMER_LINK}
 
-        if "metrics" in include_set:
-            metrics = fetch_basic_financials([r["ticker"] for r in rows])
-            for r in rows:
-                r["props"].update(metrics.get(r["ticker"], {}))
-
-        summary = upsert_assets(rows)
-        return {"received": len(rows), **summary, "disclaimer": DISCLAIMER_LINK}
+        summary = await run_in_threadpool(upsert_assets, rows)
+        return {"received": len(rows), **summary, **deferred_info, "disclaimer": DISCLAIMER_LINK}
     except RuntimeError as e:
         raise HTTPException(status_code=501, detail=str(e))
     except Exception as e:
@@ -202,21 +508,10 @@ def ingest_finnhub(
 
 @app.get("/analyze/fundamentals")
 def analyze_fundamentals(ticker: str = Query(..., min_length=1)):
-    cypher = """
-    MATCH (a:Asset)
-    WHERE toUpper(a.ticker) = toUpper($ticker)
-    OPTIONAL MATCH (a)-[:IN_SECTOR]->(s:Sector)
-    WITH a, collect(DISTINCT s.name) AS sectors
-    RETURN a{ .*, sectors: sectors } AS item
-    """
-    drv = get_driver()
-    with drv.session() as s:
-        record = s.run(cypher, ticker=ticker).single()
-    if not record:
+    item = _get_asset_item(ticker)
+    if not item:
         raise HTTPException(status_code=404, detail="Asset not found")
 
-    item = record["item"]
-
     pe = item.get("pe")
     mcap = item.get("marketCap") or item.get("marketcap")
     sector = (item.get("sectors") or ["Unknown"])[0]
@@ -254,35 +549,45 @@ def analyze_fundamentals(ticker: str = Query(..., min_length=1)):
         "disclaimer": DISCLAIMER_LINK,
     }
 
+def _raise_if_deferred(deferred: List[str]) -> None:
+    """503 + Retry-After when the rate limiter deferred the call, so an empty result isn't read as 'no data'."""
+    if deferred:
+        retry_after = max(1, round(60 / max(ratelimit.FINNHUB_RATE_PER_MIN, 1e-6)))
+        raise HTTPException(status_code=503, detail="Finnhub rate limit budget exhausted, retry later",
+                            headers={"Retry-After": str(retry_after)})
+
+
 @app.get("/finnhub/recommendation/{ticker}")
-def finnhub_recommendation(ticker: str = Path(..., min_length=1, description="Ticker symbol, AAPL")):
-    from providers.finnhub import fetch_finnhub_recommendation
+async def finnhub_recommendation(ticker: str = Path(..., min_length=1, description="Ticker symbol, AAPL")):
     symbol = ticker.strip().upper()
+    deferred: List[str] = []
     try:
-        record = fetch_finnhub_recommendation(symbol)
+        record = await afetch_finnhub_recommendation(symbol, deferred=deferred)
     except HTTPException:
         raise
     except Exception as e:
         print("[/finnhub/recommendation] ERROR:", type(e).__name__, str(e))
         raise HTTPException(status_code=500, detail="Fetch failed") from e
+    _raise_if_deferred(deferred)
     if not record:
         raise HTTPException(status_code=404, detail="No recommendation, or invalid ticker")
 
     return {"ticker": symbol, "recommendations": record}
     
 @app.get("/finnhub/news/{ticker}")
-def finnhub_news(
+async def finnhub_news(
     ticker: str = Path(..., min_length=1, description="Ticker (e.g., AAPL)"),
     days: int = Query(30, ge=1, le=365),
     limit: int = Query(20, ge=1, le=200)
 ):
+    deferred: List[str] = []
     try:
-        from providers.finnhub import fetch_company_news
-        items = fetch_company_news(ticker, days=days, limit=limit)
-        return {"ticker": ticker.upper(), "count": len(items), "items": items}
+        items = await afetch_company_news(ticker, days=days, limit=limit, deferred=deferred)
     except Exception as e:
         print("[/finnhub/news] ERROR:", type(e).__name__, str(e))
         raise HTTPException(status_code=500, detail="Fetch failed")
+    _raise_if_deferred(deferred)
+    return {"ticker": ticker.upper(), "count": len(items), "items": items}
     
 # wrapper for single ticker ingest with finnhub
 # @app.get("/ingest/ticker/{ticker}")
@@ -313,7 +618,7 @@ def explain(payload: dict | None = Body(None)):
         tickers = [t.strip().upper() for t in universe if t and t.strip()]
         tickers = list(dict.fromkeys(tickers))[:8]
 
-    text = llm_explain(tickers, risk)
+    text = llm_explain(tickers, risk, use_cache=not bool(payload and payload.get("no_cache")))
     rationale = text or (
         f"Stub rationale for risk={risk} and tickers={tickers}. "
         f"{DISCLAIMER_LINK}"
@@ -352,6 +657,561 @@ def ingest_assets(payload: List[IngestAsset] = Body(...)):
         raise HTTPException(status_code=500, detail="Ingest failed")
 
 
+# Large universes: the body is parsed as it arrives and written one transaction per batch,
+# so memory stays at one batch regardless of upload size.
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_MAX_ERRORS = 50  # rejected lines listed in the response; the rest are only counted
+
+
+def _ingest_row(row: Dict[str, Any]) -> tuple[Dict[str, Any] | None, str | None]:
+    """Validate one parsed line against IngestAsset. Returns (row, None) or (None, error)."""
+    try:
+        asset = IngestAsset(**row)
+    except ValidationError as e:
+        err = e.errors()[0]
+        return None, f"{'.'.join(str(p) for p in err['loc']) or 'row'}: {err['msg']}"
+    asset.ticker = asset.ticker.strip()
+    if not asset.ticker:
+        return None, "ticker: empty"
+    return asset.model_dump(), None
+
+
+@app.post("/ingest/stream")
+async def ingest_stream(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$", description="Default: from Content-Type (text/csv -> csv, else ndjson)"),
+    batch_size: int = Query(INGEST_BATCH_SIZE, ge=1, le=5000),
+):
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    parse = parse_csv if fmt == "csv" else parse_ndjson
+
+    started = time.perf_counter()
+    batches: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    totals = {"received": 0, "rejected": 0, "created_count": 0, "updated_count": 0}
+    pending: List[Dict[str, Any]] = []
+
+    async def flush() -> None:
+        t0 = time.perf_counter()
+        try:
+            summary = await run_in_threadpool(upsert_assets, pending)
+        except Exception as e:
+            print("[/ingest/stream] ERROR:", type(e).__name__, str(e))
+            raise HTTPException(status_code=500, detail={
+                "error": "Ingest failed",
+                "failed_batch": len(batches) + 1,
+                "committed_batches": len(batches),
+                **totals,
+            })
+        totals["created_count"] += summary["created_count"]
+        totals["updated_count"] += summary["updated_count"]
+        batches.append({
+            "batch": len(batches) + 1,
+            "rows": len(pending),
+            "created": summary["created_count"],
+            "updated": summary["updated_count"],
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+        })
+        print(f"[/ingest/stream] batch {len(batches)}: {len(pending)} rows, "
+              f"{totals['created_count'] + totals['updated_count']} written so far")
+        pending.clear()
+
+    async for line_no, row, error in parse(iter_lines(request.stream())):
+        if error is None:
+            row, error = _ingest_row(row)
+        if error is not None:
+            totals["rejected"] += 1
+            if len(errors) < INGEST_MAX_ERRORS:
+                errors.append({"line": line_no, "error": error})
+            continue
+        totals["received"] += 1
+        pending.append(row)
+        if len(pending) >= batch_size:
+            await flush()
+    if pending:
+        await flush()
+
+    return {
+        "format": fmt,
+        "batch_size": batch_size,
+        **totals,
+        "batches": batches,
+        "errors": errors,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "disclaimer": DISCLAIMER_LINK,
+    }
+
+
+#--------------------------------------- Price history ----------------------------------------
+# Daily OHLCV in a local memory-mapped column store (pricestore.py), filled from Finnhub candles
+# by the "prices" job (each ticker resumes from its last stored day) or from CSV via
+# /prices/import. Advice and screening read volatility, drawdown and return matrices from it
+# instead of calling out per request.
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR", "prices")
+PRICE_HISTORY_DAYS = int(os.getenv("PRICE_HISTORY_DAYS", "730"))    # first fetch for a new ticker
+PRICE_LOOKBACK_DAYS = int(os.getenv("PRICE_LOOKBACK_DAYS", "365"))  # window for risk stats/covariance
+PRICE_IMPORT_BATCH = 50_000  # buffered CSV rows before they are written
+PRICE_STORE_MAX_OPEN = int(os.getenv("PRICE_STORE_MAX_OPEN", "512"))  # tickers kept memory-mapped
+
+_prices = PriceStore(PRICE_STORE_DIR, max_open=PRICE_STORE_MAX_OPEN)
+
+
+def _run_price_chunk(tickers: List[str], params: Dict[str, Any]) -> Dict[str, Any]:
+    deferred: List[str] = []
+    failed: List[str] = []
+    written = rows = 0
+    now = int(time.time())
+    history = int(params.get("days") or PRICE_HISTORY_DAYS)
+    with ratelimit.lane("bulk"):
+        for raw in tickers:
+            try:
+                sym = _prices.key(raw)
+            except ValueError:
+                failed.append(raw)
+                continue
+            last = _prices.last_day(sym)
+            # re-fetch the last stored day: unchanged rows are skipped, a revised close rewrites
+            start = last * 86400 if last is not None else now - history * 86400
+            candles = fetch_candles(sym, start, now, deferred=deferred)
+            if not candles:
+                # deferred tickers are reported only through "retry"; otherwise no new candles
+                # is up to date for a stored ticker and a failure for a new one
+                if sym in deferred:
+                    continue
+                if last is None:
+                    failed.append(sym)
+                else:
+                    written += 1
+                continue
+            result = _prices.append(sym, [to_day(t) for t in candles["t"]], {
+                "open": candles["o"], "high": candles["h"], "low": candles["l"],
+                "close": candles["c"], "volume": candles["v"],
+            })
+            written += 1
+            rows += result["appended"]
+    return {"written": written, "rows": rows, "failed": failed, "retry": sorted(deferred)}
+
+
+def _price_stats_quietly(tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+    try:
+        with metrics.timed("pricestore", "stats"):
+            return _prices.stats(tickers, PRICE_LOOKBACK_DAYS)
+    except Exception as e:
+        print("[prices] ERROR: stats", type(e).__name__, str(e))
+        return {}
+
+
+def _price_returns_quietly(tickers: List[str]) -> np.ndarray | None:
+    try:
+        with metrics.timed("pricestore", "returns"):
+            _, returns = _prices.returns_matrix(tickers, PRICE_LOOKBACK_DAYS)
+    except Exception as e:
+        print("[prices] ERROR: returns", type(e).__name__, str(e))
+        return None
+    return returns if returns.size else None
+
+
+def _correlation(returns: np.ndarray) -> np.ndarray:
+    cov, _ = sample_cov(returns, min_obs=2)
+    sd = np.sqrt(np.diag(cov))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return cov / np.outer(sd, sd)
+
+
+@app.post("/prices/import")
+async def import_prices(
+    request: Request,
+    ticker: Optional[str] = Query(None, description="Ticker for every row when the CSV has no ticker column"),
+):
+    """CSV body: date,open,high,low,close,volume (+ ticker column for several tickers); streamed, appended per ticker."""
+    started = time.perf_counter()
+    errors: List[Dict[str, Any]] = []
+    totals = {"received": 0, "rejected": 0, "appended": 0, "rewritten": 0}
+    pending: Dict[str, tuple[List[int], Dict[str, List[Any]]]] = {}
+    buffered = 0
+    tickers: set[str] = set()
+
+    def flush() -> None:
+        for t, (days, cols) in pending.items():
+            result = _prices.append(t, days, cols)
+            totals["appended"] += result["appended"]
+            totals["rewritten"] += int(result["rewritten"])
+            tickers.add(result["ticker"])
+        pending.clear()
+
+    async for line_no, row, error in parse_price_csv(iter_lines(request.stream()), ticker=ticker):
+        if error is None:
+            try:
+                key, day = _prices.key(row["ticker"]), to_day(row["date"])
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            totals["rejected"] += 1
+            if len(errors) < INGEST_MAX_ERRORS:
+                errors.append({"line": line_no, "error": error})
+            continue
+        totals["received"] += 1
+        days, cols = pending.setdefault(key, ([], {"open": [], "high": [], "low": [], "close": [], "volume": []}))
+        days.append(day)
+        for k, values in cols.items():
+            values.append(row.get(k, row["close"] if k != "volume" else None))
+        buffered += 1
+        if buffered >= PRICE_IMPORT_BATCH:
+            await run_in_threadpool(flush)
+            buffered = 0
+    if pending:
+        await run_in_threadpool(flush)
+
+    return {
+        **totals,
+        "tickers": sorted(tickers),
+        "errors": errors,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "disclaimer": DISCLAIMER_LINK,
+    }
+
+
+@app.get("/prices/stats")
+def price_stats(
+    tickers: str = Query(..., min_length=1, description="Comma-separated, e.g. AAPL,MSFT"),
+    lookback_days: int = Query(PRICE_LOOKBACK_DAYS, ge=5, le=3650),
+):
+    """Volatility, max drawdown and return per ticker plus their correlation matrix, all from the local store."""
+    keys = _ticker_keys(tickers.split(","))
+    stats = _prices.stats(keys, lookback_days)
+    known = [t for t in keys if t in stats]
+    corr: Dict[str, Dict[str, float | None]] = {}
+    if len(known) > 1:
+        days, returns = _prices.returns_matrix(known, lookback_days)
+        matrix = _correlation(returns)
+        corr = {a: {b: (round(float(matrix[i, j]), 4) if np.isfinite(matrix[i, j]) else None)
+                    for j, b in enumerate(known)} for i, a in enumerate(known)}
+    return {
+        "lookback_days": lookback_days,
+        "stats": stats,
+        "missing": [t for t in keys if t not in stats],
+        "correlation": corr,
+        "disclaimer": DISCLAIMER_LINK,
+    }
+
+
+@app.get("/prices/store")
+def price_store_info():
+    return _prices.info()
+
+
+#--------------------------------------- Background jobs ----------------------------------------
+# Finnhub ingest for universes too big for one request: chunks run on a small worker pool in
+# the bulk rate-limit lane, rate-limited symbols are retried in a later chunk, and job state is
+# kept in SQLite (JOBS_DB) so it survives restarts.
+JOBS_DB = os.getenv("JOBS_DB", "jobs.sqlite3")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_RETRY_DELAY_S = float(os.getenv("JOBS_RETRY_DELAY_S", "60"))
+
+
+def _run_ingest_chunk(tickers: List[str], params: Dict[str, Any]) -> Dict[str, Any]:
+    deferred: List[str] = []
+    metrics_deferred: List[str] = []
+    with ratelimit.lane("bulk"):
+        rows = fetch_profiles(tickers, deferred=deferred)
+        fetched_metrics = None
+        if rows and params.get("include_metrics"):
+            fetched_metrics = fetch_basic_financials([r["ticker"] for r in rows], deferred=metrics_deferred)
+        _merge_fetched(rows, fetched_metrics)
+    summary = upsert_assets(rows) if rows else {"created_count": 0, "updated_count": 0}
+    written = {r["ticker"] for r in rows}
+    return {
+        "written": len(rows),
+        "created": summary["created_count"],
+        "updated": summary["updated_count"],
+        "failed": sorted({t.strip().upper() for t in tickers} - written - set(deferred)),
+        # written without metrics; the next stale_hours job picks them up again
+        "metrics_deferred": sorted(metrics_deferred),
+        "retry": sorted(deferred),
+    }
+
+
+_jobs: JobQueue | None = None
+_jobs_lock = threading.Lock()
+
+
+def get_jobs() -> JobQueue:
+    """The job queue over JOBS_DB, created on first use (startup starts its workers)."""
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = JobQueue(
+                JobStore(JOBS_DB),
+                {"ingest": _run_ingest_chunk, "prices": _run_price_chunk},
+                workers=JOBS_WORKERS,
+                retry_delay_s=JOBS_RETRY_DELAY_S,
+            )
+        return _jobs
+
+
+class IngestJobRequest(BaseModel):
+    tickers: List[str] = Field(default_factory=list, description="Explicit universe; or use stale_hours")
+    stale_hours: Optional[float] = Field(default=None, gt=0, description="All assets not updated in this many hours")
+    include_metrics: bool = True
+    chunk_size: int = Field(25, ge=1, le=200)
+
+
+def _stale_tickers(hours: float) -> List[str]:
+    cypher = """
+    MATCH (a:Asset)
+    WHERE a.updatedAtMs < $cutoff
+    RETURN a.ticker AS ticker
+    ORDER BY a.updatedAtMs
+    """
+    cutoff = _now_ms() - int(hours * 3_600_000)
+    return [r["ticker"] for r in _read(cypher, cutoff=cutoff)]
+
+
+@app.post("/jobs/ingest", status_code=202)
+def submit_ingest_job(body: IngestJobRequest):
+    if body.stale_hours is not None:
+        try:
+            tickers = _stale_tickers(body.stale_hours)
+        except Exception as e:
+            print("[/jobs/ingest] ERROR:", type(e).__name__, str(e))
+            raise HTTPException(status_code=500, detail="Database read failed")
+    else:
+        tickers = _ticker_keys(body.tickers)
+    if not tickers:
+        raise HTTPException(status_code=400, detail="No tickers to ingest")
+
+    params = {"include_metrics": body.include_metrics, "stale_hours": body.stale_hours}
+    job_id = get_jobs().submit("ingest", tickers, chunk_size=body.chunk_size, params=params)
+    return {"job_id": job_id, "status": "queued", "total": len(tickers), "disclaimer": DISCLAIMER_LINK}
+
+
+class PriceJobRequest(BaseModel):
+    tickers: List[str] = Field(default_factory=list, description="Explicit universe; or use all_assets")
+    all_assets: bool = Field(False, description="Every Asset in the graph")
+    days: Optional[int] = Field(default=None, ge=5, le=3650, description="History for tickers not yet stored (default PRICE_HISTORY_DAYS)")
+    chunk_size: int = Field(25, ge=1, le=200)
+
+
+@app.post("/jobs/prices", status_code=202)
+def submit_price_job(body: PriceJobRequest):
+    """Queue a Finnhub candle download into the price store; stored tickers only fetch new days."""
+    if body.all_assets:
+        try:
+            tickers = [r["ticker"] for r in _read("MATCH (a:Asset) RETURN a.ticker AS ticker ORDER BY ticker")]
+        except Exception as e:
+            print("[/jobs/prices] ERROR:", type(e).__name__, str(e))
+            raise HTTPException(status_code=500, detail="Database read failed")
+    else:
+        tickers = _ticker_keys(body.tickers)
+    if not tickers:
+        raise HTTPException(status_code=400, detail="No tickers to fetch")
+
+    job_id = get_jobs().submit("prices", tickers, chunk_size=body.chunk_size, params={"days": body.days})
+    return {"job_id": job_id, "status": "queued", "total": len(tickers), "disclaimer": DISCLAIMER_LINK}
+
+
+@app.get("/jobs")
+def list_jobs(
+    status: Optional[str] = Query(None, pattern="^(queued|running|done|failed|cancelled)$"),
+    limit: int = Query(20, ge=1, le=200),
+):
+    items = get_jobs().store.list(status=status, limit=limit)
+    return {"count": len(items), "items": items}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str = Path(..., min_length=1)):
+    job = get_jobs().store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str = Path(..., min_length=1)):
+    if get_jobs().store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not get_jobs().store.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job already finished")
+    return get_jobs().store.get(job_id)
+
+
+#--------------------------------------- Refresh scheduler ----------------------------------------
+# Keeps stored Finnhub data fresh a little at a time instead of re-pulling the universe in bursts.
+# Each data kind has its own fetch stamp on the Asset (0 = never) and refresh interval; every tick
+# the stalest due assets, most overdue first, are refreshed within REFRESH_CALLS_PER_MIN
+# (one Finnhub call per asset and kind) on the bulk rate-limit lane. 0 disables the scheduler.
+REFRESH_CALLS_PER_MIN = float(os.getenv("REFRESH_CALLS_PER_MIN", "20"))
+REFRESH_TICK_S = float(os.getenv("REFRESH_TICK_S", "60"))
+REFRESH_STAMPS = {
+    "profile": "profileFetchedAtMs",
+    "metrics": "metricsFetchedAtMs",
+    "recs": "recsFetchedAtMs",
+}
+REFRESH_INTERVAL_MS = {
+    "profile": int(float(os.getenv("REFRESH_PROFILE_DAYS", "30")) * 86_400_000),
+    "metrics": int(float(os.getenv("REFRESH_METRICS_H", "24")) * 3_600_000),
+    "recs": int(float(os.getenv("REFRESH_RECS_DAYS", "7")) * 86_400_000),
+}
+
+_refresh_stats: Dict[str, Any] = {
+    "ticks": 0,
+    "last_tick_at": None,
+    "last_tick_ms": None,
+    "last_plan": {},
+    "refreshed": {k: 0 for k in REFRESH_STAMPS},
+    "deferred": {k: 0 for k in REFRESH_STAMPS},
+    "sectors_aggregated": 0,
+    "errors": 0,
+}
+
+
+def _merge_fetched(rows: List[Dict[str, Any]], fetched_metrics: Dict[str, dict] | None = None) -> None:
+    """Fold fetched metrics into profile rows and stamp what was fetched, so the scheduler skips it."""
+    now = _now_ms()
+    for r in rows:
+        r["props"][REFRESH_STAMPS["profile"]] = now
+        if fetched_metrics is not None and r["ticker"] in fetched_metrics:
+            r["props"].update(fetched_metrics[r["ticker"]])
+            r["props"][REFRESH_STAMPS["metrics"]] = now
+
+
+def _due_assets(kind: str, limit: int) -> List[Dict[str, Any]]:
+    """Stalest-first assets whose `kind` stamp is older than its interval (index-backed range + order)."""
+    prop = REFRESH_STAMPS[kind]
+    cypher = f"""
+    MATCH (a:Asset) WHERE a.{prop} < $cutoff
+    RETURN a.tickerKey AS ticker, a.{prop} AS stamp
+    ORDER BY a.{prop}
+    LIMIT $limit
+    """
+    return _read(cypher, cutoff=_now_ms() - REFRESH_INTERVAL_MS[kind], limit=limit)
+
+
+def _plan_refresh(budget: int) -> Dict[str, List[str]]:
+    """Pick up to `budget` (kind, ticker) refreshes, most overdue relative to each kind's interval first."""
+    now = _now_ms()
+    candidates = []
+    for kind in REFRESH_STAMPS:
+        for r in _due_assets(kind, budget):
+            overdue = (now - (r["stamp"] or 0)) / REFRESH_INTERVAL_MS[kind]
+            candidates.append((-overdue, kind, r["ticker"]))
+    plan: Dict[str, List[str]] = {kind: [] for kind in REFRESH_STAMPS}
+    for _, kind, ticker in sorted(candidates)[:budget]:
+        plan[kind].append(ticker)
+    return plan
+
+
+def _touch_fetched(kind: str, tickers: List[str]) -> None:
+    """Stamp assets whose fetch returned nothing, so they wait a full interval before the next try."""
+    if not tickers:
+        return
+    cypher = f"""
+    UNWIND $tickers AS t
+    MATCH (a:Asset) WHERE a.tickerKey = t
+    SET a.{REFRESH_STAMPS[kind]} = $now
+    """
+    _write(cypher, tickers=tickers, now=_now_ms())
+
+
+def _refresh_profiles(tickers: List[str]) -> List[str]:
+    deferred: List[str] = []
+    rows = fetch_profiles(tickers, deferred=deferred)
+    _merge_fetched(rows)
+    if rows:
+        upsert_assets(rows)
+    _touch_fetched("profile", sorted(set(tickers) - {r["ticker"] for r in rows} - set(deferred)))
+    return deferred
+
+
+def _refresh_metrics(tickers: List[str]) -> List[str]:
+    deferred: List[str] = []
+    fetched_metrics = fetch_basic_financials(tickers, deferred=deferred)
+    now = _now_ms()
+    rows = [{"ticker": t, "props": {**fetched_metrics.get(t, {}), REFRESH_STAMPS["metrics"]: now}}
+            for t in tickers if t not in deferred]
+    update_asset_props(rows)
+    return deferred
+
+
+def _refresh_recs(tickers: List[str]) -> List[str]:
+    deferred: List[str] = []
+    empty: List[str] = []
+    for t in tickers:
+        rows = fetch_finnhub_recommendation(t, deferred=deferred)
+        if rows:
+            _store_recommendations(t, rows)
+        elif t not in deferred:
+            empty.append(t)
+    _touch_fetched("recs", empty)
+    return deferred
+
+
+_REFRESHERS = {"profile": _refresh_profiles, "metrics": _refresh_metrics, "recs": _refresh_recs}
+
+
+def _refresh_tick() -> Dict[str, List[str]]:
+    budget = max(1, int(REFRESH_CALLS_PER_MIN * REFRESH_TICK_S / 60.0))
+    plan = _plan_refresh(budget)
+    with ratelimit.lane("bulk"):
+        for kind, tickers in plan.items():
+            if not tickers:
+                continue
+            try:
+                deferred = _REFRESHERS[kind](tickers)
+            except Exception as e:
+                _refresh_stats["errors"] += 1
+                print(f"[refresh] ERROR {kind}:", type(e).__name__, str(e))
+                continue
+            # deferred assets keep their old stamp and stay at the front of the next tick
+            _refresh_stats["refreshed"][kind] += len(tickers) - len(deferred)
+            _refresh_stats["deferred"][kind] += len(deferred)
+    return plan
+
+
+def _refresh_loop() -> None:
+    while True:
+        started = time.monotonic()
+        if REFRESH_CALLS_PER_MIN > 0:
+            try:
+                plan = _refresh_tick()
+                _refresh_stats["last_plan"] = {k: len(v) for k, v in plan.items()}
+            except Exception as e:
+                _refresh_stats["errors"] += 1
+                print("[refresh] ERROR:", type(e).__name__, str(e))
+        # sector aggregates written since the last tick (needs no Finnhub budget)
+        try:
+            _refresh_stats["sectors_aggregated"] += _refresh_all_sector_stats(stale_only=True)
+        except Exception as e:
+            _refresh_stats["errors"] += 1
+            print("[sectors] ERROR:", type(e).__name__, str(e))
+        _refresh_stats["ticks"] += 1
+        _refresh_stats["last_tick_at"] = time.time()
+        _refresh_stats["last_tick_ms"] = round((time.monotonic() - started) * 1000, 1)
+        time.sleep(max(1.0, REFRESH_TICK_S - (time.monotonic() - started)))
+
+
+@app.get("/refresh/status")
+def refresh_status():
+    due: Dict[str, int] = {}
+    try:
+        for kind, prop in REFRESH_STAMPS.items():
+            rows = _read(f"MATCH (a:Asset) WHERE a.{prop} < $cutoff RETURN count(a) AS n",
+                         cutoff=_now_ms() - REFRESH_INTERVAL_MS[kind])
+            due[kind] = int(rows[0]["n"]) if rows else 0
+    except Exception as e:
+        print("[/refresh/status] ERROR:", type(e).__name__, str(e))
+        raise HTTPException(status_code=500, detail="Database read failed")
+    return {
+        "enabled": REFRESH_CALLS_PER_MIN > 0,
+        "calls_per_min": REFRESH_CALLS_PER_MIN,
+        "tick_s": REFRESH_TICK_S,
+        "interval_h": {k: round(v / 3_600_000, 2) for k, v in REFRESH_INTERVAL_MS.items()},
+        "due": due,
+        **_refresh_stats,
+    }
+
+
 #--------------------------------------- Query/Cypher funcs ----------------------------------------
 
 # def list_assets_with_sectors() -> list[dict]:
@@ -365,20 +1225,17 @@ def ingest_assets(payload: List[IngestAsset] = Body(...)):
 #         return [dict(r) for r in s.run(cypher)]
 
 def list_assets_with_sectors(sector: Optional[str] = None, limit: int = 100) -> list[dict]:
-    drv = get_driver()
     cypher = """
     MATCH (a:Asset)-[:IN_SECTOR]->(s:Sector)
     {where}
     RETURN a.ticker AS ticker, coalesce(s.name, 'Unknown') AS sector
     ORDER BY ticker
     LIMIT $limit
-    """.replace("{where}", "WHERE toUpper(s.name) = toUpper($sector)" if sector else "")
-    params = {"sector": sector, "limit": int(limit)}
-    with drv.session() as s:
-        return [dict(r) for r in s.run(cypher, **params)]
+    """.replace("{where}", "WHERE s.nameKey = $sectorKey" if sector else "")
+    params = {"sectorKey": (sector or "").strip().upper(), "limit": int(limit)}
+    return _read(cypher, **params)
 
 def upsert_assets(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
-    drv = get_driver()
     cypher = """
     UNWIND $rows AS row
     WITH row
@@ -389,172 +1246,567 @@ def upsert_assets(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
       ON MATCH  SET a.name = coalesce(row.name, a.name)
 
     MERGE (s:Sector {name: coalesce(row.sector, 'Unknown')})
+      ON CREATE SET s.nameKey = toUpper(s.name)
     MERGE (a)-[:IN_SECTOR]->(s)
 
-    WITH a, coalesce(row.props, {}) AS p, (a._new IS NOT NULL) AS isNew
+    WITH a, s, coalesce(row.props, {}) AS p, (a._new IS NOT NULL) AS isNew
     SET a += p
+    SET a.tickerKey = a.ticker, a.nameKey = toUpper(coalesce(a.name, a.ticker))
+    SET a.profileFetchedAtMs = coalesce(a.profileFetchedAtMs, 0),
+        a.metricsFetchedAtMs = coalesce(a.metricsFetchedAtMs, 0),
+        a.recsFetchedAtMs = coalesce(a.recsFetchedAtMs, 0)
     SET a.updatedAt = datetime(), a.updatedAtMs = timestamp()
     REMOVE a._new
 
     RETURN
       count(a) AS total_touched,
       sum(CASE WHEN isNew THEN 1 ELSE 0 END) AS created_count,
-      collect({ticker: a.ticker, created: isNew}) AS results
+      collect({ticker: a.ticker, created: isNew, name: a.name, sector: s.name, props: properties(a)}) AS results
     """
-    with drv.session() as s:
-        rec = s.run(cypher, rows=rows).single()
+
+    def work(tx):
+        # sectors the assets belong to before the write (any they leave) and after it
+        _mark_sectors_dirty_tx(tx, _ticker_keys([r.get("ticker") or "" for r in rows]))
+        rec = tx.run(cypher, rows=rows).single()
         results = rec["results"] or []
-        created = [r["ticker"] for r in results if r["created"]]
-        updated = [r["ticker"] for r in results if not r["created"]]
-        return {
-            "total_touched": int(rec["total_touched"]),
-            "created_count": int(rec["created_count"]),
-            "updated_count": len(updated),
-            "created_tickers": created,
-            "updated_tickers": updated,
-        }
+        _rescore_tx(tx, results)
+        _mark_sectors_dirty_tx(tx, [r["ticker"] for r in results])
+        return int(rec["total_touched"]), int(rec["created_count"]), results
+
+    with metrics.timed("neo4j", "upsert_assets"), db_session() as s:
+        total_touched, created_count, results = s.execute_write(work)
+    if _search_index.warm:
+        _search_index.upsert(results)
+    _invalidate_screen_frame()
+    created = [r["ticker"] for r in results if r["created"]]
+    updated = [r["ticker"] for r in results if not r["created"]]
+    return {
+        "total_touched": total_touched,
+        "created_count": created_count,
+        "updated_count": len(updated),
+        "created_tickers": created,
+        "updated_tickers": updated,
+    }
 
-    
-#--------------------------------------- Groq LLM funcs ----------------------------------------
-_llm_client = None
 
-def get_llm():
-    global _llm_client
-    if _llm_client is not None:
-        return _llm_client
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key or OpenAI is None:
-        return None
-    _llm_client = OpenAI(base_url="https://api.groq.com/openai/v1", api_key=api_key)
-    return _llm_client
+#--------------------------------------- Search index ----------------------------------------
+# In-process prefix index behind /search; upsert_assets keeps it current, and a periodic
+# reload picks up writes made by other workers or seed_neo4j.py (0 disables the reload).
+SEARCH_INDEX_REFRESH_S = float(os.getenv("SEARCH_INDEX_REFRESH_S", "600"))
 
-def llm_explain(tickers: list[str], risk: int) -> str | None:
-    client = get_llm()
-    if client is None:
-        return None
-    try:
-        response = client.chat.completions.create(
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-            temperature=0.2,
-            max_tokens=220,
-            messages=[
-                {"role": "system", "content": "You are a professional investment advisor."
-                 "Be brief (80-120 words). Use plain language. "},
-                 {"role": "user", "content":
-                 f"Risk level: {risk} (1–5). Universe tickers: {', '.join(tickers)}. "
-                 "Explain a simple rationale for an equal-weight learning example and note any missing data briefly."},
-            ], timeout=20,
-        )
-        text = (response.choices[0].message.content or "").strip()
-        return text or None
-    except Exception:
-        return None
-    
-   #--------------------------------------- Helpers for analyzers  ----------------------------------------
-def _get_asset_item(ticker: str) -> dict | None:
-    """Return a{ .*, sectors: [...] } from Neo4j or None."""
-    drv = get_driver()
+_search_index = PrefixIndex()
+
+
+def _refresh_search_index() -> int:
     cypher = """
-    MATCH (a:Asset)
-    WHERE toUpper(a.ticker) = toUpper($ticker)
-    OPTIONAL MATCH (a)-[:IN_SECTOR]->(s:Sector)
-    WITH a, collect(DISTINCT s.name) AS sectors
-    RETURN a{ .*, sectors: sectors } AS item
+    MATCH (a:Asset)-[:IN_SECTOR]->(s:Sector)
+    RETURN a.ticker AS ticker, coalesce(a.name, a.ticker) AS name, collect(DISTINCT s.name) AS sectors
     """
-    with drv.session() as s:
-        rec = s.run(cypher, ticker=ticker).single()
-    return rec["item"] if rec else None
+    return _search_index.load(_read(cypher))
 
 
-def _num(v, default=None):
-    try:
-        if v is None:
-            return default
-        f = float(v)
-        return f
-    except Exception:
-        return default
-
-
-def _fmt_money(x: float | None) -> str:
-    if x is None:
-        return "n/a"
-    absx = abs(x)
-    if absx >= 1e12: return f"${x/1e12:.2f}T"
-    if absx >= 1e9:  return f"${x/1e9:.2f}B"
-    if absx >= 1e6:  return f"${x/1e6:.2f}M"
-    if absx >= 1e3:  return f"${x/1e3:.2f}K"
-    return f"${x:,.0f}"
-    
-def _analyze_fundamentals_v1_core(ticker: str) -> dict:
-    item = _get_asset_item(ticker)
-    if not item:
-        raise HTTPException(status_code=404, detail="Asset not found")
+def _search_index_loop() -> None:
+    while True:
+        try:
+            _refresh_search_index()
+        except Exception as e:
+            print("[search-index] ERROR:", type(e).__name__, str(e))
+        if SEARCH_INDEX_REFRESH_S <= 0:
+            return
+        time.sleep(SEARCH_INDEX_REFRESH_S)
 
-    pe   = _num(item.get("pe"))
-    pb   = _num(item.get("pb"))
-    ps   = _num(item.get("ps"))
-    roe  = _num(item.get("roe"))
-    roa  = _num(item.get("roa"))
-    gm   = _num(item.get("grossMarginTTM"))
-    om   = _num(item.get("operatingMarginTTM"))
-    nm   = _num(item.get("netMarginTTM"))
-    dte  = _num(item.get("debtToEquity"))
-    cr   = _num(item.get("currentRatio"))
-    qr   = _num(item.get("quickRatio"))
-    beta = _num(item.get("beta"))
-    dy   = _num(item.get("dividendYieldTTM"))  
-    mcap = _num(item.get("marketCap"))
-
-    score = 50
-    notes = []
 
-    if pe is not None:
-        if pe < 12:  score += 6;  notes.append(f"P/E {pe:.1f} looks inexpensive.")
-        elif pe > 30: score -= 6; notes.append(f"P/E {pe:.1f} looks rich.")
-        else: notes.append(f"P/E {pe:.1f} is moderate.")
+#--------------------------------------- Graph snapshots (street/news) ----------------------------------------
+# how old a stored snapshot may be before the analyzers go back to Finnhub
+STREET_MAX_AGE_MS = int(float(os.getenv("STREET_MAX_AGE_H", "24")) * 3_600_000)
+NEWS_MAX_AGE_MS = int(float(os.getenv("NEWS_MAX_AGE_MIN", "60")) * 60_000)
+NEWS_RETENTION_DAYS = int(os.getenv("NEWS_RETENTION_DAYS", "30"))
+
+REC_FIELDS = ("period", "strongBuy", "buy", "hold", "sell", "strongSell", "symbol")
+NEWS_FIELDS = ("datetime", "date", "headline", "source", "url", "summary")
 
-    if pb is not None and pb > 6: score -= 3
-    if ps is not None and ps > 12: score -= 3
 
-    if roe is not None:
-        if roe >= 15: score += 6; notes.append(f"ROE {roe:.1f}% is strong.")
-        elif roe < 5: score -= 4; notes.append(f"ROE {roe:.1f}% is low.")
+def _now_ms() -> int:
+    return int(time.time() * 1000)
 
-    if gm is not None and gm >= 50: score += 3
-    if om is not None and om >= 20: score += 2
-    if nm is not None and nm >= 15: score += 2
 
-    if dte is not None:
-        if dte > 2.0: score -= 5; notes.append(f"Debt/Equity {dte:.2f} is high.")
-        elif dte < 0.5: score += 3
+def _is_fresh(fetched_at_ms: Any, max_age_ms: int) -> bool:
+    return isinstance(fetched_at_ms, int) and _now_ms() - fetched_at_ms <= max_age_ms
 
-    if cr is not None and cr < 1.0: score -= 3
-    if qr is not None and qr < 0.8: score -= 2
 
-    if beta is not None:
-        if beta > 1.4: score -= 3
-        elif beta < 0.8: score += 2
+# sector benchmark stored on each Sector node (see Sector aggregates)
+SECTOR_STAT_PROPS = ("assetCount", "medianPe", "medianRoe", "medianBeta", "totalMarketCap", "avgScore", "statsUpdatedAtMs")
 
-    if dy is not None and dy >= 0.02: score += 2  # ≥2% div yield
+ASSET_ITEMS_CYPHER = """
+    UNWIND $tickers AS t
+    MATCH (a:Asset) WHERE a.tickerKey = t
+    OPTIONAL MATCH (a)-[:IN_SECTOR]->(s:Sector)
+    WITH t, a, collect(DISTINCT s{ .name, %s }) AS sectorNodes
+    WITH t, a, [x IN sectorNodes | x.name] AS sectors, sectorNodes[0] AS sectorStats
+""" % ", ".join(f".{p}" for p in SECTOR_STAT_PROPS)
 
-    score = max(0, min(100, score))
 
-    return {
-        "ticker": item.get("ticker"),
-        "name": item.get("name"),
-        "sector": (item.get("sectors") or ["Unknown"])[0],
-        "metrics": {
-            "pe": pe, "pb": pb, "ps": ps,
-            "roe": roe, "roa": roa,
-            "grossMarginTTM": gm, "operatingMarginTTM": om, "netMarginTTM": nm,
-            "debtToEquity": dte, "currentRatio": cr, "quickRatio": qr,
-            "beta": beta, "dividendYieldTTM": dy,
-            "marketCap": mcap, "marketCapPretty": _fmt_money(mcap),
-        },
-        "score": score,
-        "notes": notes,
-        "disclaimer": DISCLAIMER_LINK,
+SNAPSHOTS_CYPHER = ASSET_ITEMS_CYPHER + """
+    CALL {
+      WITH a
+      OPTIONAL MATCH (a)-[:HAS_RECOMMENDATION]->(r:Recommendation)
+      WITH r ORDER BY r.period DESC
+      RETURN collect(r{.period, .strongBuy, .buy, .hold, .sell, .strongSell, .symbol}) AS recs
+    }
+    CALL {
+      WITH a
+      OPTIONAL MATCH (a)-[:HAS_NEWS]->(n:NewsItem)
+      WHERE n.datetime >= $since
+      WITH n ORDER BY n.datetime DESC LIMIT $limit
+      RETURN collect(n{.datetime, .date, .headline, .source, .url, .summary}) AS news
+    }
+    RETURN t AS ticker, a{ .*, sectors: sectors, sectorStats: sectorStats } AS item, recs, news
+"""
+
+
+def _snapshot_params(tickers: List[str], news_days: int, news_limit: int) -> Dict[str, Any]:
+    since = int(time.time()) - max(1, news_days) * 86400
+    return {"tickers": _ticker_keys(tickers), "since": since, "limit": int(news_limit)}
+
+
+def _load_snapshots(tickers: List[str], *, news_days: int = 30, news_limit: int = 10) -> Dict[str, Dict[str, Any]]:
+    """
+    One round trip for everything the analyzers need per ticker:
+    { 'AAPL': {item, recommendations, recsFetchedAtMs, news, newsFetchedAtMs, ...}, ... }
+    Tickers without an Asset node are missing from the result.
+    """
+    return _shape_snapshots(_read(SNAPSHOTS_CYPHER, **_snapshot_params(tickers, news_days, news_limit)))
+
+
+async def _aload_snapshots(tickers: List[str], *, news_days: int = 30, news_limit: int = 10) -> Dict[str, Dict[str, Any]]:
+    """_load_snapshots on the async driver, for async endpoints."""
+    return _shape_snapshots(await _aread(SNAPSHOTS_CYPHER, **_snapshot_params(tickers, news_days, news_limit)))
+
+
+def _shape_snapshots(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    out: Dict[str, Dict[str, Any]] = {}
+    for rec in records:
+        item = rec["item"]
+        out[rec["ticker"]] = {
+            "item": item,
+            "recommendations": rec["recs"],
+            "recsFetchedAtMs": item.get("recsFetchedAtMs"),
+            "news": rec["news"],
+            "newsFetchedAtMs": item.get("newsFetchedAtMs"),
+            "newsFetchedDays": item.get("newsFetchedDays") or 0,
+            "newsFetchedLimit": item.get("newsFetchedLimit") or 0,
+        }
+    return out
+
+
+def _snapshot_or_none(ticker: str, **kwargs) -> Dict[str, Any] | None:
+    """Single-ticker snapshot; a graph failure just means 'go live'."""
+    try:
+        return _load_snapshots([ticker], **kwargs).get(ticker.strip().upper())
+    except Exception as e:
+        print("[snapshot] ERROR:", type(e).__name__, str(e))
+        return None
+
+
+async def _asnapshot_or_none(ticker: str, **kwargs) -> Dict[str, Any] | None:
+    try:
+        return (await _aload_snapshots([ticker], **kwargs)).get(ticker.strip().upper())
+    except Exception as e:
+        print("[snapshot] ERROR:", type(e).__name__, str(e))
+        return None
+
+
+def _street_snapshot_rows(snap: Dict[str, Any] | None) -> List[Dict[str, Any]] | None:
+    if snap and snap["recommendations"] and _is_fresh(snap["recsFetchedAtMs"], STREET_MAX_AGE_MS):
+        return snap["recommendations"]
+    return None
+
+
+def _news_snapshot_items(snap: Dict[str, Any] | None, *, days: int, limit: int) -> List[Dict[str, Any]] | None:
+    if (snap and _is_fresh(snap["newsFetchedAtMs"], NEWS_MAX_AGE_MS)
+            and snap["newsFetchedDays"] >= days and snap["newsFetchedLimit"] >= limit):
+        return snap["news"][:limit]
+    return None
+
+
+def _store_recommendations(ticker: str, rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    cypher = """
+    MATCH (a:Asset) WHERE a.tickerKey = $ticker
+    SET a.recsFetchedAtMs = $now
+    WITH a
+    UNWIND $rows AS row
+    MERGE (a)-[:HAS_RECOMMENDATION]->(r:Recommendation {period: row.period})
+    SET r += row, r.fetchedAtMs = $now
+    """
+    clean = [{k: row.get(k) for k in REC_FIELDS if row.get(k) is not None} for row in rows if row.get("period")]
+    _write(cypher, ticker=ticker.strip().upper(), rows=clean, now=_now_ms())
+
+
+def _news_key(item: Dict[str, Any]) -> str:
+    raw = item.get("url") or f"{item.get('headline')}|{item.get('datetime')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _store_news(ticker: str, items: List[Dict[str, Any]], *, days: int, limit: int) -> None:
+    if not items:
+        return
+    cypher = """
+    MATCH (a:Asset) WHERE a.tickerKey = $ticker
+    SET a.newsFetchedAtMs = $now, a.newsFetchedDays = $days, a.newsFetchedLimit = $limit
+    WITH a
+    CALL {
+      WITH a
+      OPTIONAL MATCH (a)-[:HAS_NEWS]->(old:NewsItem)
+      WHERE old.datetime < $cutoff
+      DETACH DELETE old
+    }
+    WITH a
+    UNWIND $rows AS row
+    MERGE (n:NewsItem {key: row.key})
+    SET n += row, n.fetchedAtMs = $now
+    MERGE (a)-[:HAS_NEWS]->(n)
+    """
+    rows = []
+    for it in items:
+        row = {k: it.get(k) for k in NEWS_FIELDS if it.get(k) is not None}
+        row["key"] = _news_key(it)
+        rows.append(row)
+    cutoff = int(time.time()) - NEWS_RETENTION_DAYS * 86400
+    _write(cypher, ticker=ticker.strip().upper(), rows=rows, now=_now_ms(),
+           days=int(days), limit=int(limit), cutoff=cutoff)
+
+
+def _store_snapshot_quietly(store, ticker: str, *args, **kwargs) -> None:
+    """Persisting a snapshot is an optimisation; never fail an analyzer over it."""
+    try:
+        store(ticker, *args, **kwargs)
+    except Exception as e:
+        print(f"[snapshot] ERROR storing {ticker}:", type(e).__name__, str(e))
+
+    
+#--------------------------------------- Groq LLM funcs ----------------------------------------
+_llm_client = None
+
+def get_llm():
+    global _llm_client
+    if _llm_client is not None:
+        return _llm_client
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key or OpenAI is None:
+        return None
+    _llm_client = OpenAI(base_url="https://api.groq.com/openai/v1", api_key=api_key)
+    return _llm_client
+
+
+LLM_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+# prompts are deterministic (same tickers/headlines -> same messages), so completions are cached
+# by fingerprint; LLM_CACHE_DB adds an on-disk SQLite tier shared across restarts and workers
+_llm_cache = LLMCache(
+    maxsize=int(os.getenv("LLM_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("LLM_CACHE_TTL_S", str(6 * 3600))),
+    db_path=os.getenv("LLM_CACHE_DB") or None,
+)
+
+
+def _chat_complete(client, messages: List[Dict[str, str]], *, max_tokens: int, timeout: float,
+                   temperature: float = 0.2, use_cache: bool = True) -> str:
+    """One chat completion through the LLM cache. Returns stripped text ('' if empty); raises on API errors."""
+    key = fingerprint(LLM_MODEL, {"temperature": temperature, "max_tokens": max_tokens}, messages)
+
+    def create() -> str:
+        with metrics.timed("llm", "chat"):
+            resp = client.chat.completions.create(
+                model=LLM_MODEL,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout,
+                messages=messages,
+            )
+        return (resp.choices[0].message.content or "").strip()
+
+    return _llm_cache.get_or_create(key, create, use_cache=use_cache) or ""
+
+
+def _chat_stream(client, messages: List[Dict[str, str]], *, max_tokens: int, timeout: float,
+                 temperature: float = 0.2, use_cache: bool = True):
+    """Streaming twin of _chat_complete: yields text pieces; a cached answer arrives as one piece."""
+    key = fingerprint(LLM_MODEL, {"temperature": temperature, "max_tokens": max_tokens}, messages)
+    if use_cache:
+        cached = _llm_cache.get(key)
+        if cached:
+            yield cached
+            return
+
+    parts: List[str] = []
+    with metrics.timed("llm", "chat_stream"):
+        stream = client.chat.completions.create(
+            model=LLM_MODEL,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            messages=messages,
+            stream=True,
+        )
+        for chunk in stream:
+            piece = chunk.choices[0].delta.content if chunk.choices else None
+            if piece:
+                parts.append(piece)
+                yield piece
+    _llm_cache.set(key, "".join(parts).strip())
+
+
+def llm_explain(tickers: list[str], risk: int, use_cache: bool = True) -> str | None:
+    client = get_llm()
+    if client is None:
+        return None
+    try:
+        text = _chat_complete(
+            client,
+            [
+                {"role": "system", "content": "You are a professional investment advisor."
+                 "Be brief (80-120 words). Use plain language. "},
+                 {"role": "user", "content":
+                 f"Risk level: {risk} (1–5). Universe tickers: {', '.join(tickers)}. "
+                 "Explain a simple rationale for an equal-weight learning example and note any missing data briefly."},
+            ],
+            max_tokens=220, timeout=20, use_cache=use_cache,
+        )
+        return text or None
+    except Exception:
+        return None
+    
+   #--------------------------------------- Helpers for analyzers  ----------------------------------------
+# Shared head of every asset read: UNWIND the uppercased keys and seek each one through the
+# asset_ticker_key_idx index on the normalized tickerKey, one round trip for N tickers.
+STORE_SCORES_CYPHER = """
+    UNWIND $rows AS row
+    MATCH (a:Asset) WHERE a.tickerKey = row.ticker
+    SET a += row.props
+"""
+
+def _ticker_keys(tickers: List[str]) -> List[str]:
+    return list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+
+
+def _get_asset_items(tickers: List[str]) -> Dict[str, dict]:
+    """Return { 'AAPL': a{ .*, sectors: [...] }, ... } for every ticker that exists."""
+    keys = _ticker_keys(tickers)
+    if not keys:
+        return {}
+    cypher = ASSET_ITEMS_CYPHER + """
+    RETURN t AS ticker, a{ .*, sectors: sectors, sectorStats: sectorStats } AS item
+    """
+    return {rec["ticker"]: rec["item"] for rec in _read(cypher, tickers=keys)}
+
+
+def _get_asset_item(ticker: str) -> dict | None:
+    """Return a{ .*, sectors: [...] } from Neo4j or None."""
+    return _get_asset_items([ticker]).get((ticker or "").strip().upper())
+
+
+def _rescore_tx(tx, results: List[Dict[str, Any]]) -> None:
+    """
+    results: [{ticker, props}] with the node properties after a write. Score, notes and
+    marketCapPretty derive from the merged properties, so they are written in the same
+    transaction as the metrics they come from.
+    """
+    rows = [{"ticker": r["ticker"], "props": materialize(r["props"])} for r in results]
+    if rows:
+        tx.run(STORE_SCORES_CYPHER, rows=rows).consume()
+
+
+def update_asset_props(rows: List[Dict[str, Any]]) -> int:
+    """Merge props into existing assets (no sector or name changes). rows: [{ticker, props}]."""
+    cypher = """
+    UNWIND $rows AS row
+    MATCH (a:Asset) WHERE a.tickerKey = row.ticker
+    SET a += row.props
+    SET a.updatedAt = datetime(), a.updatedAtMs = timestamp()
+    RETURN a.tickerKey AS ticker, properties(a) AS props
+    """
+    if not rows:
+        return 0
+
+    def work(tx):
+        results = [dict(r) for r in tx.run(cypher, rows=rows)]
+        _rescore_tx(tx, results)
+        _mark_sectors_dirty_tx(tx, [r["ticker"] for r in results])
+        return results
+
+    with metrics.timed("neo4j", "update_asset_props"), db_session() as s:
+        results = s.execute_write(work)
+    _invalidate_screen_frame()
+    return len(results)
+
+
+def _store_scores(rows: List[Dict[str, Any]]) -> None:
+    """rows: [{ticker, props}] where props come from scoring.materialize."""
+    if rows:
+        _write(STORE_SCORES_CYPHER, rows=rows)
+
+
+def _backfill_scores(batch: int = 500) -> int:
+    """Materialize scores on assets that have none or an outdated rule version."""
+    cypher = """
+    MATCH (a:Asset)
+    WHERE a.tickerKey IS NOT NULL
+      AND (a.scoreRulesVersion IS NULL OR a.scoreRulesVersion <> $version)
+    RETURN a.tickerKey AS ticker, properties(a) AS props
+    LIMIT $batch
+    """
+    done = 0
+    while True:
+        rows = _read(cypher, version=RULES_VERSION, batch=batch)
+        if not rows:
+            return done
+        _store_scores([{"ticker": r["ticker"], "props": materialize(r["props"])} for r in rows])
+        done += len(rows)
+
+
+def _scored(item: dict) -> dict:
+    """Item with current materialized score fields; stale ones are recomputed and written back."""
+    if item.get("scoreRulesVersion") == RULES_VERSION and item.get("score") is not None:
+        return item
+    derived = materialize(item)
+    try:
+        _store_scores([{"ticker": item.get("tickerKey") or item.get("ticker"), "props": derived}])
+    except Exception as e:
+        print(f"[scores] ERROR storing {item.get('ticker')}:", type(e).__name__, str(e))
+    return {**item, **derived}
+
+
+def _backfill_scores_quietly() -> None:
+    n = 0
+    try:
+        n = _backfill_scores()
+        if n:
+            print(f"[scores] backfilled {n} assets (rules v{RULES_VERSION})")
+    except Exception as e:
+        print("[scores] ERROR:", type(e).__name__, str(e))
+    # sector aggregates average the score, so they follow the score backfill (all of them when
+    # scores changed, else just sectors never aggregated or written while the API was down)
+    try:
+        done = _refresh_all_sector_stats(stale_only=not n)
+        if done:
+            print(f"[sectors] aggregated {done} sectors")
+    except Exception as e:
+        print("[sectors] ERROR:", type(e).__name__, str(e))
+
+
+#--------------------------------------- Sector aggregates ----------------------------------------
+# Count, median P/E (positive only), ROE and beta, total market cap and average fundamentals
+# score per Sector node. Asset writes only bump the writeVersion of the sectors they touch (a
+# cheap index seek inside the write transaction); the refresh scheduler re-aggregates sectors
+# whose writeVersion is ahead of their statsVersion once per tick, one sector per transaction,
+# so a burst of ingest batches costs one pass over each touched sector rather than one per batch.
+# Medians can't be updated by delta, so that pass reads the sector's members.
+def _mark_sectors_dirty_tx(tx, tickers: List[str]) -> None:
+    if tickers:
+        tx.run("""
+        MATCH (x:Asset)-[:IN_SECTOR]->(s:Sector) WHERE x.tickerKey IN $tickers
+        WITH DISTINCT s
+        SET s.writeVersion = coalesce(s.writeVersion, 0) + 1
+        """, tickers=tickers).consume()
+
+
+def _aggregate_sector(name: str) -> None:
+    # the version is read before the members: a write that lands meanwhile leaves the sector dirty
+    _write("""
+    MATCH (s:Sector {name: $name})
+    WITH s, coalesce(s.writeVersion, 0) AS version
+    OPTIONAL MATCH (a:Asset)-[:IN_SECTOR]->(s)
+    WITH s, version, count(a) AS n,
+         percentileCont(CASE WHEN a.pe > 0 THEN a.pe END, 0.5) AS pe,
+         percentileCont(a.roe, 0.5) AS roe,
+         percentileCont(a.beta, 0.5) AS beta,
+         sum(coalesce(a.marketCap, 0)) AS mcap,
+         avg(a.score) AS score
+    SET s.assetCount = n, s.medianPe = pe, s.medianRoe = roe, s.medianBeta = beta,
+        s.totalMarketCap = mcap, s.avgScore = score, s.statsVersion = version,
+        s.statsUpdatedAtMs = timestamp()
+    """, name=name)
+
+
+def _refresh_all_sector_stats(stale_only: bool = False) -> int:
+    """Aggregate all sectors (or only those written since their last aggregation) -> number aggregated."""
+    rows = _read("""
+    MATCH (s:Sector)
+    WHERE NOT $staleOnly OR coalesce(s.writeVersion, 0) > coalesce(s.statsVersion, -1)
+    RETURN s.name AS name
+    """, staleOnly=stale_only)
+    for r in rows:
+        _aggregate_sector(r["name"])
+    return len(rows)
+
+
+def list_sectors() -> List[Dict[str, Any]]:
+    cypher = """
+    MATCH (s:Sector)
+    RETURN s{ .name, %s } AS sector
+    ORDER BY s.name
+    """ % ", ".join(f".{p}" for p in SECTOR_STAT_PROPS)
+    return [r["sector"] for r in _read(cypher)]
+
+
+def _sector_benchmark(item: Dict[str, Any], m: Dict[str, Any], score: int) -> Dict[str, Any] | None:
+    """The asset's sector aggregates plus where it sits against them (P/E as a ratio, ROE/beta/score as differences)."""
+    stats = item.get("sectorStats") or {}
+    if not stats.get("assetCount"):
+        return None
+    pe, med_pe = m.get("pe"), stats.get("medianPe")
+    relative = {
+        "pe_vs_median": round(pe / med_pe, 2) if isinstance(pe, (int, float)) and pe > 0 and med_pe else None,
+        "roe_vs_median": _diff(m.get("roe"), stats.get("medianRoe")),
+        "beta_vs_median": _diff(m.get("beta"), stats.get("medianBeta")),
+        "score_vs_avg": _diff(score, stats.get("avgScore")),
+    }
+    return {**{k: stats.get(k) for k in SECTOR_STAT_PROPS if k != "statsUpdatedAtMs"}, "relative": relative}
+
+
+def _diff(value: Any, benchmark: Any) -> float | None:
+    if isinstance(value, (int, float)) and isinstance(benchmark, (int, float)):
+        return round(float(value) - float(benchmark), 2)
+    return None
+
+
+@app.get("/sectors")
+def sectors(
+    sort: str = Query("name", pattern="^(name|assetCount|totalMarketCap|avgScore|medianPe)$"),
+    refresh: bool = Query(False, description="Re-aggregate every sector first"),
+):
+    """Per-sector aggregates on the Sector nodes, re-aggregated by the refresh scheduler after asset writes."""
+    try:
+        if refresh:
+            _refresh_all_sector_stats()
+        rows = list_sectors()
+    except Exception as e:
+        print("[/sectors] ERROR:", type(e).__name__, str(e))
+        raise HTTPException(status_code=500, detail="Database read failed")
+    if sort != "name":
+        # missing values last
+        rows.sort(key=lambda r: (r.get(sort) is None, -(r.get(sort) or 0)))
+    return {"count": len(rows), "items": rows, "disclaimer": DISCLAIMER_LINK}
+
+
+def _analyze_fundamentals_v1_core(ticker: str, item: dict | None = None) -> dict:
+    item = item or _get_asset_item(ticker)
+    if not item:
+        raise HTTPException(status_code=404, detail="Asset not found")
+
+    item = _scored(item)
+    m = extract_metrics(item)
+
+    return {
+        "ticker": item.get("ticker"),
+        "name": item.get("name"),
+        "sector": (item.get("sectors") or ["Unknown"])[0],
+        "metrics": {**m, "marketCapPretty": item["marketCapPretty"]},
+        "score": int(item["score"]),
+        "notes": list(item.get("scoreNotes") or []),
+        "sector_benchmark": _sector_benchmark(item, m, int(item["score"])),
+        "disclaimer": DISCLAIMER_LINK,
     }
 
 
@@ -562,54 +1814,304 @@ def _analyze_fundamentals_v1_core(ticker: str) -> dict:
 def analyze_fundamentals_v1(ticker: str = Query(..., min_length=1)):
     return _analyze_fundamentals_v1_core(ticker)
 
-def _analyze_news_core(ticker: str, *, days: int, limit: int) -> Dict[str, Any]:
+
+#--------------------------------------- Screening ----------------------------------------
+# The whole universe is held as NumPy columns and scored with the same rules as
+# _analyze_fundamentals_v1_core, vectorized. upsert_assets drops the frame; the TTL covers
+# writes made by other workers.
+SCREEN_FRAME_TTL_S = float(os.getenv("SCREEN_FRAME_TTL_S", "300"))
+
+_screen_frame: ScreenFrame | None = None
+_screen_lock = threading.Lock()
+
+
+def _load_screen_frame() -> ScreenFrame:
+    props = ", ".join(f".{k}" for k in METRIC_KEYS)
+    cypher = f"""
+    MATCH (a:Asset)
+    OPTIONAL MATCH (a)-[:IN_SECTOR]->(s:Sector)
+    WITH a, collect(DISTINCT s.name) AS sectors
+    RETURN a{{ .ticker, .name, {props}, sector: coalesce(sectors[0], 'Unknown') }} AS item
+    """
+    rows = [rec["item"] for rec in _read(cypher)]
+    return ScreenFrame(rows)
+
+
+def _get_screen_frame(refresh: bool = False) -> ScreenFrame:
+    global _screen_frame
+    with _screen_lock:
+        frame = _screen_frame
+        if refresh or frame is None or time.time() - frame.loaded_at > SCREEN_FRAME_TTL_S:
+            frame = _load_screen_frame()
+            frame.set_prices(_price_stats_quietly(frame.tickers))
+            _screen_frame = frame
+        return frame
+
+
+def _invalidate_screen_frame() -> None:
+    global _screen_frame
+    _screen_frame = None
+
+
+class ScreenFilter(BaseModel):
+    metric: str = Field(description="One of: " + ", ".join(SCREEN_FIELDS))
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class ScreenRequest(BaseModel):
+    filters: List[ScreenFilter] = Field(default_factory=list)
+    sector: Optional[str] = Field(default=None, description="Exact sector name (case-insensitive)")
+    sort: str = "score"
+    descending: bool = True
+    top_k: int = Field(50, ge=1, le=1000)
+    refresh: bool = Field(False, description="Reload the universe from Neo4j first")
+
+
+@app.post("/screen")
+def screen(body: ScreenRequest):
+    unknown = sorted({f.metric for f in body.filters if f.metric not in SCREEN_FIELDS}
+                     | ({body.sort} - set(SCREEN_FIELDS)))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown metric(s): {', '.join(unknown)}")
+    try:
+        frame = _get_screen_frame(refresh=body.refresh)
+    except Exception as e:
+        print("[/screen] ERROR:", type(e).__name__, str(e))
+        raise HTTPException(status_code=500, detail="Database read failed")
+
+    started = time.perf_counter()
+    matched, items = frame.screen(
+        filters=[f.model_dump() for f in body.filters],
+        sector=body.sector, sort=body.sort, descending=body.descending, top_k=body.top_k,
+    )
+    return {
+        "universe": len(frame),
+        "matched": matched,
+        "count": len(items),
+        "items": items,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        "disclaimer": DISCLAIMER_LINK,
+    }
+
+def _news_items_core(ticker: str, *, days: int, limit: int,
+                     snapshot: Dict[str, Any] | None = None) -> tuple[List[Dict[str, Any]], str]:
+    """Headlines from the graph snapshot when fresh, else from Finnhub (and stored for next time)."""
     from providers.finnhub import fetch_company_news
-    items = fetch_company_news(ticker, days=days, limit=limit)
+    if snapshot is None:
+        snapshot = _snapshot_or_none(ticker, news_days=days, news_limit=limit)
+    items = _news_snapshot_items(snapshot, days=days, limit=limit)
+    source = "graph"
+    if items is None:
+        deferred: List[str] = []
+        items = fetch_company_news(ticker, days=days, limit=limit, deferred=deferred)
+        if deferred:
+            # not "no headlines": the advice fan-out turns this into a placeholder marked Deferred
+            raise ratelimit.Deferred("news fetch deferred by the rate limiter")
+        source = "finnhub"
+        if snapshot:
+            _store_snapshot_quietly(_store_news, ticker, items, days=days, limit=limit)
+    return items, source
+
+
+def _news_from_items(ticker: str, items: List[Dict[str, Any]], limit: int, use_cache: bool = True,
+                     timeout: float = 20) -> Dict[str, Any]:
     headlines = [f"- {it.get('headline','')}" for it in items][:limit]
 
     client = get_llm()
     summary = ""
-    sentiment = 0.0
-    bullets = []
-    risks = []
-    if client and headlines:
+    if client and headlines and timeout >= 1:
         try:
+            # prose only; the sentiment number comes from the local scorer
             prompt = (
                 "Summarize these recent headlines in 3-5 sentences, "
-                "then provide 3 bullet positives and 3 bullet risks. "
-                "Finally, return an overall sentiment from -1 (bearish) to +1 (bullish).\n\n"
+                "then provide 3 bullet positives and 3 bullet risks.\n\n"
                 + "\n".join(headlines)
             )
-            resp = client.chat.completions.create(
-                model="meta-llama/llama-4-scout-17b-16e-instruct",
-                temperature=0.2, max_tokens=350, timeout=20,
-                messages=[
+            text = _chat_complete(
+                client,
+                [
                     {"role":"system","content":"Be concise, neutral and factual."},
                     {"role":"user","content":prompt}
-                ]
+                ],
+                max_tokens=350, timeout=timeout, use_cache=use_cache,
             )
-            text = (resp.choices[0].message.content or "").strip()
             summary = text
         except Exception:
             pass
 
+    return _news_block(ticker, items, summary)
+
+
+def _news_block(ticker: str, items: List[Dict[str, Any]], summary: str) -> Dict[str, Any]:
+    """News result with lexicon sentiment: per headline and recency-weighted overall."""
+    sentiment, scores = score_news(items)
     return {
         "ticker": ticker.upper(),
         "count": len(items),
-        "headlines": items,   
+        "headlines": [{**it, "sentiment": s} for it, s in zip(items, scores)],
         "summary": summary or "No LLM summary available.",
         "sentiment": sentiment,
         "disclaimer": DISCLAIMER_LINK,
     }
 
 
+#--------------------------------------- Batched news summaries ----------------------------------------
+# /advice/v1 summarizes every ticker's headlines in one structured-output call (per
+# NEWS_BATCH_SIZE tickers) instead of one call each. Results are cached per ticker and
+# headline set, so overlapping ticker lists reuse them; tickers the reply misses fall back
+# to the single-ticker prompt. A chunk is summarized as soon as its headlines are in, up to
+# NEWS_BATCH_WORKERS chunks at once, and every LLM call only gets the time left before the
+# tickers' news deadline: past it, the block keeps its headlines and local sentiment without prose.
+NEWS_BATCH_SIZE = max(1, int(os.getenv("NEWS_BATCH_SIZE", "10")))
+NEWS_BATCH_WORKERS = max(1, int(os.getenv("NEWS_BATCH_WORKERS", "4")))
+NEWS_SETTLE_MARGIN_S = 0.5  # settle blocks this long before the deadline the advice request waits for
+
+_news_llm_pool = ThreadPoolExecutor(max_workers=NEWS_BATCH_WORKERS, thread_name_prefix="news-llm")
+
+
+def _news_batch_key(ticker: str, headlines: List[str]) -> str:
+    return fingerprint(LLM_MODEL, {"prompt": "news_summary_batch", "ticker": ticker},
+                       [{"role": "user", "content": "\n".join(headlines)}])
+
+
+def _summarize_news_batch(groups: Dict[str, List[Dict[str, Any]]], limit: int,
+                          use_cache: bool = True, deadline: float | None = None) -> Dict[str, str]:
+    """
+    groups: {ticker: headline items} -> {ticker: summary} for the tickers the batched reply
+    (or the cache) covers. Tickers without headlines or an LLM are left out, and so are chunks
+    that would start with less than a second left before `deadline` (time.monotonic()).
+    """
+    client = get_llm()
+    if client is None:
+        return {}
+    out: Dict[str, str] = {}
+    todo: Dict[str, tuple[str, List[str]]] = {}
+    for ticker, items in groups.items():
+        headlines = [h for h in (it.get("headline") for it in items[:limit]) if h]
+        if not headlines:
+            continue
+        key = _news_batch_key(ticker, headlines)
+        cached = _llm_cache.get(key) if use_cache else None
+        if cached:
+            out[ticker] = cached
+        else:
+            todo[ticker] = (key, headlines)
+
+    pending = list(todo)
+    for i in range(0, len(pending), NEWS_BATCH_SIZE):
+        chunk = {t: todo[t][1] for t in pending[i:i + NEWS_BATCH_SIZE]}
+        timeout = 30.0 if deadline is None else deadline - time.monotonic()
+        if timeout < 1:
+            print(f"[news-batch] deadline passed, {len(pending) - i} tickers left unsummarized")
+            break
+        try:
+            with metrics.timed("llm", "chat_batch"):
+                resp = client.chat.completions.create(
+                    model=LLM_MODEL,
+                    temperature=0.2,
+                    max_tokens=120 * len(chunk) + 60,
+                    timeout=timeout,
+                    messages=batch_messages(chunk),
+                    response_format={"type": "json_object"},
+                )
+            parsed = parse_batch(resp.choices[0].message.content or "", list(chunk))
+        except Exception as e:
+            print("[news-batch] ERROR:", type(e).__name__, str(e))
+            parsed = {}
+        if len(parsed) < len(chunk):
+            print(f"[news-batch] {len(chunk) - len(parsed)} of {len(chunk)} tickers missing from reply")
+        for ticker, summary in parsed.items():
+            _llm_cache.set(todo[ticker][0], summary)
+            out[ticker] = summary
+    return out
+
+
+def _settle(fut: Future, result: Any = None, error: BaseException | None = None) -> None:
+    if not fut.set_running_or_notify_cancel():
+        return  # the caller already gave up on it
+    if error is not None:
+        fut.set_exception(error)
+    else:
+        fut.set_result(result)
+
+
+def _run_news_batch(fetches: Dict[str, Future], blocks: Dict[str, Future], limit: int, use_cache: bool) -> None:
+    """Collect headlines as the fetches finish and hand each full chunk to the summary pool."""
+    by_future = {fut: t for t, fut in fetches.items()}
+    chunk: Dict[str, tuple[List[Dict[str, Any]], str]] = {}
+    for fut in as_completed(by_future):
+        ticker = by_future[fut]
+        try:
+            chunk[ticker] = fut.result()
+        except Exception as e:
+            _settle(blocks[ticker], error=e)
+            continue
+        if len(chunk) == NEWS_BATCH_SIZE:
+            _news_llm_pool.submit(contextvars.copy_context().run, _summarize_news_chunk, chunk, blocks, limit, use_cache)
+            chunk = {}
+    if chunk:
+        _news_llm_pool.submit(contextvars.copy_context().run, _summarize_news_chunk, chunk, blocks, limit, use_cache)
+
+
+def _summarize_news_chunk(fetched: Dict[str, tuple[List[Dict[str, Any]], str]], blocks: Dict[str, Future],
+                          limit: int, use_cache: bool) -> None:
+    """Summarize one chunk within its earliest news deadline, then resolve each ticker's block."""
+    deadline = min(blocks[t].started[0] for t in fetched) + ADVICE_TIMEOUTS["news"] - NEWS_SETTLE_MARGIN_S
+    try:
+        summaries = _summarize_news_batch({t: items for t, (items, _) in fetched.items()}, limit, use_cache,
+                                          deadline=deadline)
+    except Exception as e:
+        print("[news-batch] ERROR:", type(e).__name__, str(e))
+        summaries = {}
+    for ticker, (items, source) in fetched.items():
+        try:
+            summary = summaries.get(ticker)
+            if summary is not None:
+                block = _news_block(ticker, items, summary)
+            else:
+                # single-ticker fallback only in the time that is left
+                block = _news_from_items(ticker, items, limit, use_cache=use_cache,
+                                         timeout=deadline - time.monotonic())
+            _settle(blocks[ticker], {**block, "source": source})
+        except Exception as e:
+            _settle(blocks[ticker], error=e)
+
+
+def _submit_news_batch(tickers: List[str], snapshots: Dict[str, Dict[str, Any]], *, days: int, limit: int,
+                       use_cache: bool = True) -> Dict[str, Future]:
+    """Headline fetches run in parallel on the pool; one task then summarizes them all -> {ticker: future}."""
+    fetches = {t: _submit_in_context(_news_items_core, t, days=days, limit=limit, snapshot=snapshots.get(t) or {})
+               for t in tickers}
+    blocks = {t: Future() for t in tickers}
+    for t, block in blocks.items():
+        block.started = fetches[t].started  # a news block's deadline runs from its headline fetch
+    # waits on the fetches and the LLM, so it runs on its own thread rather than holding a pool worker
+    threading.Thread(target=contextvars.copy_context().run, args=(_run_news_batch, fetches, blocks, limit, use_cache),
+                     name="news-batch", daemon=True).start()
+    return blocks
+
+
 @app.get("/analyze/news")
-def analyze_news(
+async def analyze_news(
     ticker: str = Query(..., min_length=1),
     days: int = Query(30, ge=1, le=365),
     limit: int = Query(10, ge=3, le=30),
+    no_cache: bool = Query(False, description="Skip the LLM cache and regenerate the summary"),
 ):
-    return _analyze_news_core(ticker, days=days, limit=limit)
+    snapshot = await _asnapshot_or_none(ticker, news_days=days, news_limit=limit)
+    items = _news_snapshot_items(snapshot, days=days, limit=limit)
+    source = "graph"
+    if items is None:
+        deferred: List[str] = []
+        items = await afetch_company_news(ticker, days=days, limit=limit, deferred=deferred)
+        _raise_if_deferred(deferred)
+        source = "finnhub"
+        if snapshot:
+            await run_in_threadpool(_store_snapshot_quietly, _store_news, ticker, items, days=days, limit=limit)
+    # the LLM client is synchronous, keep it off the event loop
+    result = await run_in_threadpool(_news_from_items, ticker, items, limit, use_cache=not no_cache)
+    return {**result, "source": source}
 
 
 @app.post("/analyze/news_refine")
@@ -630,11 +2132,13 @@ def analyze_news_refine(payload: dict = Body(...)) -> Dict[str, Any]:
         raise HTTPException(status_code=400, detail=error_detail)
 
     ticker = (payload.get("ticker") or "").strip().upper()
+    sentiment, _ = score_news([{"headline": h} for h in cleaned[:20]])
     client = get_llm()
     if not client:
         return {
             "ticker": ticker or None,
             "summary": "LLM not configured.",
+            "sentiment": sentiment,
             "disclaimer": DISCLAIMER_LINK,
         }
 
@@ -642,43 +2146,56 @@ def analyze_news_refine(payload: dict = Body(...)) -> Dict[str, Any]:
     prompt_lines = "\n".join(f"- {line}" for line in cleaned[:20])
     prompt = (
         f"Summarize these headlines for {company_label} in 3-5 sentences. "
-        "Then list 3 positives and 3 risks. "
-        "End with an overall sentiment scalar from -1 (bearish) to +1 (bullish).\n\n"
+        "Then list 3 positives and 3 risks.\n\n"
         f"{prompt_lines}"
     )
 
     try:
-        resp = client.chat.completions.create(
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-            temperature=0.2,
-            max_tokens=350,
-            timeout=25,
-            messages=[
+        text_out = _chat_complete(
+            client,
+            [
                 {"role": "system", "content": "Be concise, neutral, and educational."},
                 {"role": "user", "content": prompt},
             ],
+            max_tokens=350, timeout=25, use_cache=not payload.get("no_cache"),
         )
-        text_out = (resp.choices[0].message.content or "").strip()
         if not text_out:
             text_out = "Summarization failed."
         result = {
             "ticker": ticker or None,
             "summary": text_out,
+            "sentiment": sentiment,
             "disclaimer": DISCLAIMER_LINK,
         }
     except Exception:
         result = {
             "ticker": ticker or None,
             "summary": "Summarization failed.",
+            "sentiment": sentiment,
             "disclaimer": DISCLAIMER_LINK,
         }
     return result
 
 
-def _analyze_street_core(ticker: str) -> dict:
+def _analyze_street_core(ticker: str, snapshot: Dict[str, Any] | None = None) -> dict:
+    """Recommendation trends from the graph snapshot when fresh, else from Finnhub (and stored)."""
     from providers.finnhub import fetch_finnhub_recommendation
-    rows = fetch_finnhub_recommendation(ticker) or []
-
+    if snapshot is None:
+        snapshot = _snapshot_or_none(ticker, news_limit=0)
+    rows = _street_snapshot_rows(snapshot)
+    source = "graph"
+    if rows is None:
+        deferred: List[str] = []
+        rows = fetch_finnhub_recommendation(ticker, deferred=deferred) or []
+        if deferred:
+            raise ratelimit.Deferred("recommendation fetch deferred by the rate limiter")
+        source = "finnhub"
+        if snapshot:
+            _store_snapshot_quietly(_store_recommendations, ticker, rows)
+    return {**_street_from_rows(ticker, rows), "source": source}
+
+
+def _street_from_rows(ticker: str, rows: List[Dict[str, Any]]) -> dict:
     latest = rows[0] if rows else {}
     counts = {
         "strongBuy": int(latest.get("strongBuy", 0) or 0),
@@ -741,55 +2258,40 @@ def _combine_strategy_signals(fundamentals: Dict[str, Any], street: Dict[str, An
     }
 
 
-def _normalize_allocation(weights: List[tuple[str, float]]) -> Dict[str, float]:
-    filtered: list[tuple[str, float]] = []
-    for ticker, value in weights:
-        if value is None:
-            continue
-        try:
-            numeric = float(value)
-        except (TypeError, ValueError):
-            continue
-        if not (numeric == numeric):  # NaN check
-            continue
-        filtered.append((ticker, max(numeric, 0.1)))
-
-    if not filtered:
-        return {}
-
-    total = sum(value for _, value in filtered)
-    if total <= 0:
-        share = round(1 / len(filtered), 4)
-        return {ticker: share for ticker, _ in filtered}
-
-    allocation = {ticker: value / total for ticker, value in filtered}
-    return {ticker: round(weight, 4) for ticker, weight in allocation.items()}
-
-
-def _build_data_rationale(per: List[Dict[str, Any]], allocation: Dict[str, float], risk: int) -> str:
+def _build_data_rationale(per: List[Dict[str, Any]], allocation: Dict[str, float], risk: int,
+                          portfolio: Dict[str, Any] | None = None) -> str:
     sections: List[str] = [f"Risk level {risk} (1=conservative, 5=aggressive)."]
 
     for entry in per:
         ticker = entry["ticker"]
         signals = entry.get("signals") or {}
         fundamentals = entry.get("fundamentals") or {}
-        metrics = fundamentals.get("metrics") or {}
+        metric_values = fundamentals.get("metrics") or {}
         street = entry.get("street") or {}
         news = entry.get("news") or {}
 
+        bench = fundamentals.get("sector_benchmark") or {}
+
         metric_bits: List[str] = []
-        pe = metrics.get("pe")
+        pe = metric_values.get("pe")
         if isinstance(pe, (int, float)):
-            metric_bits.append(f"PE {pe:.1f}")
-        roe = metrics.get("roe")
+            med_pe = bench.get("medianPe")
+            metric_bits.append(f"PE {pe:.1f}" + (f" vs sector median {med_pe:.1f}" if isinstance(med_pe, (int, float)) else ""))
+        roe = metric_values.get("roe")
         if isinstance(roe, (int, float)):
-            metric_bits.append(f"ROE {roe:.1f}%")
-        dte = metrics.get("debtToEquity")
+            med_roe = bench.get("medianRoe")
+            metric_bits.append(f"ROE {roe:.1f}%" + (f" vs {med_roe:.1f}%" if isinstance(med_roe, (int, float)) else ""))
+        dte = metric_values.get("debtToEquity")
         if isinstance(dte, (int, float)):
             metric_bits.append(f"Debt/Equity {dte:.2f}")
-        beta = metrics.get("beta")
+        beta = metric_values.get("beta")
         if isinstance(beta, (int, float)):
             metric_bits.append(f"Beta {beta:.2f}")
+        prices = entry.get("prices") or {}
+        if isinstance(prices.get("volatility"), (int, float)):
+            metric_bits.append(f"volatility {prices['volatility'] * 100:.0f}%")
+        if isinstance(prices.get("max_drawdown"), (int, float)):
+            metric_bits.append(f"max drawdown {prices['max_drawdown'] * 100:.0f}%")
 
         stance = (street.get("stance") or "mixed").lower()
         analysts = int(street.get("total_analysts") or 0)
@@ -815,91 +2317,297 @@ def _build_data_rationale(per: List[Dict[str, Any]], allocation: Dict[str, float
             f"News insight: {news_summary}.{sentiment_text}{weight_text}"
         )
 
-    sections.append("Weights favour stronger fundamentals and supportive sentiment while keeping diversification in mind.")
+    sections.append(describe_portfolio(portfolio or {})
+                    or "Weights favour stronger fundamentals and supportive sentiment while keeping diversification in mind.")
     sections.append(DISCLAIMER_LINK)
 
     return " ".join(part.strip() for part in sections if part)
 
 
 @app.get("/analyze/street")
-def analyze_street(ticker: str = Query(..., min_length=1)):
-    return _analyze_street_core(ticker)
+async def analyze_street(ticker: str = Query(..., min_length=1)):
+    snapshot = await _asnapshot_or_none(ticker, news_limit=0)
+    rows = _street_snapshot_rows(snapshot)
+    source = "graph"
+    if rows is None:
+        deferred: List[str] = []
+        rows = await afetch_finnhub_recommendation(ticker, deferred=deferred) or []
+        _raise_if_deferred(deferred)
+        source = "finnhub"
+        if snapshot:
+            await run_in_threadpool(_store_snapshot_quietly, _store_recommendations, ticker, rows)
+    return {**_street_from_rows(ticker, rows), "source": source}
 
 class AdviceV1Request(BaseModel):
     tickers: List[str] = Field(min_items=1, max_items=10)
     risk: int = Field(3, ge=1, le=5)
+    no_cache: bool = Field(False, description="Skip the LLM cache and regenerate summaries/rationale")
 
-@app.post("/advice/v1")
-def advice_v1(body: AdviceV1Request):
-    tickers = [t.strip().upper() for t in body.tickers if t and t.strip()]
-    tickers = list(dict.fromkeys(tickers))[:10]
 
-    per: List[Dict[str, Any]] = []
-    weight_inputs: List[tuple[str, float]] = []
+#--------------------------------------- Advice fan-out  ----------------------------------------
+# every (ticker, source) pair runs on a bounded pool, so latency follows the slowest call, not the sum
+ADVICE_MAX_WORKERS = int(os.getenv("ADVICE_MAX_WORKERS", "16"))
+# seconds per source, measured from when its task starts running (a big /advice/batch queues
+# hundreds of tasks); a slow source degrades to a placeholder block. A task still queued after
+# ADVICE_QUEUE_TIMEOUT seconds is cancelled the same way.
+ADVICE_TIMEOUTS = {
+    "fundamentals": float(os.getenv("ADVICE_TIMEOUT_FUNDAMENTALS", "8")),
+    "street": float(os.getenv("ADVICE_TIMEOUT_STREET", "10")),
+    "news": float(os.getenv("ADVICE_TIMEOUT_NEWS", "25")),
+}
+ADVICE_QUEUE_TIMEOUT = float(os.getenv("ADVICE_QUEUE_TIMEOUT", "60"))
+ADVICE_POLL_S = 0.25  # re-check interval while tasks are still queued
+
+_advice_pool = ThreadPoolExecutor(max_workers=ADVICE_MAX_WORKERS, thread_name_prefix="advice")
+
+@app.on_event("shutdown")
+def _close_advice_pool():
+    _advice_pool.shutdown(wait=False, cancel_futures=True)
+    _news_llm_pool.shutdown(wait=False, cancel_futures=True)
+    _rationale_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _advice_fallback(source: str, ticker: str, error: str) -> Dict[str, Any]:
+    """Placeholder block for a source that failed or timed out, shaped like the real one."""
+    if source == "fundamentals":
+        return {
+            "ticker": ticker, "name": None, "sector": "Unknown",
+            "metrics": {}, "score": None, "notes": [],
+            "error": error, "disclaimer": DISCLAIMER_LINK,
+        }
+    if source == "street":
+        return {
+            "ticker": ticker,
+            "latest": {"strongBuy": 0, "buy": 0, "hold": 0, "sell": 0, "strongSell": 0, "period": None},
+            "total_analysts": 0, "stance": "mixed", "history": [],
+            "error": error, "disclaimer": DISCLAIMER_LINK,
+        }
+    return {
+        "ticker": ticker, "count": 0, "headlines": [],
+        "summary": "No LLM summary available.", "sentiment": None,
+        "error": error, "disclaimer": DISCLAIMER_LINK,
+    }
+
+
+def _advice_snapshots(tickers: List[str]) -> Dict[str, Dict[str, Any]] | None:
+    # one graph read covers assets, street and news snapshots; only stale tickers go to Finnhub
+    try:
+        return _load_snapshots(tickers, news_days=14, news_limit=5)
+    except Exception as e:
+        print("[/advice/v1] ERROR: snapshot read", type(e).__name__, str(e))
+        return None
+
+
+def _submit_advice_inputs(tickers: List[str], use_cache: bool = True,
+                          snapshots: Dict[str, Dict[str, Any]] | None = None) -> tuple[float, Dict[tuple[str, str], Any]]:
+    """Start fundamentals/street/news for all tickers on the pool -> (submitted, {(ticker, source): future}).
+
+    Without `snapshots` they are read here, and an unknown ticker raises 404 up front.
+    """
+    started = time.monotonic()
+    if snapshots is None:
+        snapshots = _advice_snapshots(tickers)
+        if snapshots is None:
+            snapshots = {}
+        elif any(t not in snapshots for t in tickers):
+            raise HTTPException(status_code=404, detail="Asset not found")
+
+    futures = {}
     for t in tickers:
-        fundamentals = _analyze_fundamentals_v1_core(t)
-        street = _analyze_street_core(t)
-        news = _analyze_news_core(t, days=14, limit=5)
-        signals = _combine_strategy_signals(fundamentals, street, news)
-        per.append({
-            "ticker": t,
-            "fundamentals": fundamentals,
-            "street": street,
-            "news": news,
-            "signals": signals,
-        })
-        weight_inputs.append((t, signals.get("weight_basis")))
+        snap = snapshots.get(t)
+        futures[(t, "fundamentals")] = _submit_in_context(_analyze_fundamentals_v1_core, t, snap["item"] if snap else None)
+        # an empty dict (not None) tells the analyzers the asset is unknown, so they skip re-reading the graph
+        futures[(t, "street")] = _submit_in_context(_analyze_street_core, t, snap or {})
+    # headlines per ticker, summarized for all tickers in one LLM call
+    for t, fut in _submit_news_batch(tickers, snapshots, days=14, limit=5, use_cache=use_cache).items():
+        futures[(t, "news")] = fut
+    return started, futures
+
+
+def _submit_in_context(fn, *args, **kwargs):
+    # pool threads get a copy of the request context, so their Finnhub/Neo4j/LLM time
+    # lands in the caller's Server-Timing
+    started: List[float] = []
+    fut = _advice_pool.submit(contextvars.copy_context().run, _run_started, started, fn, *args, **kwargs)
+    fut.started = started  # filled in when a worker picks the task up
+    return fut
+
+
+def _run_started(started: List[float], fn, *args, **kwargs):
+    started.append(time.monotonic())
+    return fn(*args, **kwargs)
+
+
+def _advice_deadline(fut, source: str, submitted: float) -> float:
+    """Start time + the source's timeout once the task runs; the queue timeout until then."""
+    started = getattr(fut, "started", None)
+    if started:
+        return started[0] + ADVICE_TIMEOUTS[source]
+    return submitted + ADVICE_QUEUE_TIMEOUT
+
+
+def _advice_block(ticker: str, source: str, fut, submitted: float) -> Dict[str, Any]:
+    """Result of one source, waiting at most until its deadline; failures become placeholders."""
+    remaining = max(0.0, _advice_deadline(fut, source, submitted) - time.monotonic())
+    try:
+        return fut.result(timeout=remaining)
+    except HTTPException:
+        raise
+    except FutureTimeout:
+        fut.cancel()
+        if getattr(fut, "started", None):
+            print(f"[/advice/v1] TIMEOUT: {source} {ticker} after {ADVICE_TIMEOUTS[source]:.0f}s")
+        else:
+            print(f"[/advice/v1] TIMEOUT: {source} {ticker} still queued after {ADVICE_QUEUE_TIMEOUT:.0f}s")
+        return _advice_fallback(source, ticker, "timeout")
+    except Exception as e:
+        print(f"[/advice/v1] ERROR: {source} {ticker}", type(e).__name__, str(e))
+        return _advice_fallback(source, ticker, type(e).__name__)
+
+
+def _advice_entry(ticker: str, blocks: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    fundamentals, street, news = blocks["fundamentals"], blocks["street"], blocks["news"]
+    return {
+        "ticker": ticker,
+        "fundamentals": fundamentals,
+        "street": street,
+        "news": news,
+        "signals": _combine_strategy_signals(fundamentals, street, news),
+    }
+
+
+def _iter_advice_entries(submitted: float, futures: Dict[tuple[str, str], Any], missing: set | None = None):
+    """Yield one per-ticker entry as soon as its three sources have finished (or timed out).
+
+    A missing asset (404 from fundamentals) fails the request, or, when a `missing` set is
+    given, is added to it and gets no entry; any other error or timeout only degrades that one block.
+    """
+    pending = dict(futures)
+    blocks: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    while pending:
+        next_deadline = min(_advice_deadline(fut, source, submitted) for (_, source), fut in pending.items())
+        timeout = max(0.0, next_deadline - time.monotonic())
+        if any(not getattr(fut, "started", True) for fut in pending.values()):
+            timeout = min(timeout, ADVICE_POLL_S)  # a task that starts meanwhile brings its deadline forward
+        wait(list(pending.values()), timeout=timeout, return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        for (t, source), fut in list(pending.items()):
+            if not fut.done() and now < _advice_deadline(fut, source, submitted):
+                continue
+            del pending[(t, source)]
+            got = blocks.setdefault(t, {})
+            try:
+                got[source] = _advice_block(t, source, fut, submitted)
+            except HTTPException as e:
+                if missing is None or e.status_code != 404:
+                    raise
+                missing.add(t)
+                got[source] = None
+            if len(got) == 3 and t not in (missing or ()):
+                yield _advice_entry(t, got)
+
+
+class AdvicePrices:
+    """Price-store stats and daily returns for a set of tickers, read once and sliced per portfolio."""
+
+    def __init__(self, tickers: List[str]):
+        self.stats = _price_stats_quietly(tickers)
+        self.returns = _price_returns_quietly(tickers) if self.stats else None
+        self.columns = {t: i for i, t in enumerate(tickers)}
+
+    def slice(self, tickers: List[str]) -> tuple[Dict[str, Dict[str, Any]], np.ndarray | None]:
+        stats = {t: self.stats[t] for t in tickers if t in self.stats}
+        if not stats or self.returns is None:
+            return stats, None
+        returns = self.returns[:, [self.columns[t] for t in tickers]]
+        # days on which only other tickers of the union traded
+        returns = returns[np.isfinite(returns).any(axis=1)]
+        return stats, returns if returns.size else None
+
+
+def _advice_allocation(per: List[Dict[str, Any]], risk: int,
+                       prices: AdvicePrices | None = None) -> tuple[Dict[str, float], Dict[str, Any]]:
+    """
+    Risk-aware weights from each ticker's weight_basis, stored beta and (when the price store has
+    it) daily return history -> (allocation, portfolio info). Attaches per-ticker price stats.
+    `prices` covers a superset of the tickers (a batch's union); without it they are read here.
+    """
+    tickers = [e["ticker"] for e in per]
+    stats, returns = (prices or AdvicePrices(tickers)).slice(tickers)
+    for e in per:
+        e["prices"] = stats.get(e["ticker"])
+    info = optimize_portfolio(
+        tickers,
+        [e["signals"].get("weight_basis") for e in per],
+        [((e.get("fundamentals") or {}).get("metrics") or {}).get("beta") for e in per],
+        risk,
+        returns=returns,
+    )
+    allocation = info.pop("weights")
+    return allocation, info
+
+
+def _advice_rationale_messages(per: List[Dict[str, Any]], allocation: Dict[str, float], risk: int) -> List[Dict[str, str]]:
+    lines = []
+    for entry in per:
+        ticker = entry["ticker"]
+        signals = entry.get("signals") or {}
+        street = entry.get("street") or {}
+        news = entry.get("news") or {}
 
-    allocation = _normalize_allocation(weight_inputs)
-    if not allocation and tickers:
-        share = round(1 / len(tickers), 4)
-        allocation = {t: share for t in tickers}
+        news_summary = (news.get("summary") or "").strip()
+        if len(news_summary) > 220:
+            news_summary = news_summary[:217] + "..."
+
+        lines.append(
+            f"{ticker}: fundamental_score={signals.get('fundamental_score')}, "
+            f"street={street.get('stance')} ({street.get('total_analysts')} analysts), "
+            f"news_sentiment={signals.get('news_sentiment')}, headlines={news.get('count')}, "
+            f"volatility={(entry.get('prices') or {}).get('volatility')}, "
+            f"pe_vs_sector_median={(((entry.get('fundamentals') or {}).get('sector_benchmark') or {}).get('relative') or {}).get('pe_vs_median')}, "
+            f"weight={allocation.get(ticker)}, summary=\"{news_summary or 'n/a'}\""
+        )
+
+    prompt = (
+        "You're an educational investment assistant. Given risk level "
+        f"{risk} (1=conservative, 5=aggressive) and these data-driven summaries,\n"
+        "1) explain the weights given below (already optimized for this risk level; keep them as they are),\n"
+        "2) provide a concise rationale (120-180 words) that cites fundamentals, street outlook, and news,\n"
+        "3) list two monitoring risks.\n"
+        "Stay educational and avoid investment advice.\n\n"
+        + "\n".join(lines)
+    )
+    return [
+        {"role": "system", "content": "Be concise, educational, balanced."},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _advice_tickers(raw: List[str]) -> List[str]:
+    tickers = [t.strip().upper() for t in raw if t and t.strip()]
+    return list(dict.fromkeys(tickers))[:10]
+
+
+@app.post("/advice/v1")
+def advice_v1(body: AdviceV1Request):
+    tickers = _advice_tickers(body.tickers)
 
-    data_rationale = _build_data_rationale(per, allocation, body.risk)
+    started, futures = _submit_advice_inputs(tickers, use_cache=not body.no_cache)
+    by_ticker = {entry["ticker"]: entry for entry in _iter_advice_entries(started, futures)}
+    per: List[Dict[str, Any]] = [by_ticker[t] for t in tickers]
+
+    allocation, portfolio = _advice_allocation(per, body.risk)
+    data_rationale = _build_data_rationale(per, allocation, body.risk, portfolio)
 
     client = get_llm()
     rationale = data_rationale
 
     if client:
         try:
-            lines = []
-            for entry in per:
-                ticker = entry["ticker"]
-                signals = entry.get("signals") or {}
-                street = entry.get("street") or {}
-                news = entry.get("news") or {}
-
-                news_summary = (news.get("summary") or "").strip()
-                if len(news_summary) > 220:
-                    news_summary = news_summary[:217] + "..."
-
-                lines.append(
-                    f"{ticker}: fundamental_score={signals.get('fundamental_score')}, "
-                    f"street={street.get('stance')} ({street.get('total_analysts')} analysts), "
-                    f"news_sentiment={signals.get('news_sentiment')}, headlines={news.get('count')}, "
-                    f"allocation_hint={allocation.get(ticker)}, summary=\"{news_summary or 'n/a'}\""
-                )
-
-            prompt = (
-                "You're an educational investment assistant. Given risk level "
-                f"{body.risk} (1=conservative, 5=aggressive) and these data-driven summaries,\n"
-                "1) suggest diversified allocation weights summing to 100%,\n"
-                "2) provide a concise rationale (120-180 words) that cites fundamentals, street outlook, and news,\n"
-                "3) list two monitoring risks.\n"
-                "Stay educational and avoid investment advice.\n\n"
-                + "\n".join(lines)
+            llm_text = _chat_complete(
+                client, _advice_rationale_messages(per, allocation, body.risk),
+                max_tokens=420, timeout=25, use_cache=not body.no_cache,
             )
-            resp = client.chat.completions.create(
-                model="meta-llama/llama-4-scout-17b-16e-instruct",
-                temperature=0.2,
-                max_tokens=420,
-                timeout=25,
-                messages=[
-                    {"role": "system", "content": "Be concise, educational, balanced."},
-                    {"role": "user", "content": prompt},
-                ],
-            )
-            llm_text = (resp.choices[0].message.content or "").strip()
             if llm_text:
                 rationale = llm_text
         except Exception:
@@ -910,8 +2618,302 @@ def advice_v1(body: AdviceV1Request):
         "tickers": tickers,
         "per_ticker": per,
         "allocation": allocation,
+        "portfolio": portfolio,
         "rationale": rationale,
         "disclaimer": DISCLAIMER_LINK,
     }
 
 
+def _ndjson(event: Dict[str, Any]) -> bytes:
+    return (json.dumps(event, default=str) + "\n").encode("utf-8")
+
+
+@app.post("/advice/v1/stream")
+def advice_v1_stream(body: AdviceV1Request):
+    """
+    Same strategy as /advice/v1, streamed as NDJSON events:
+    start -> ticker (one per ticker, in completion order) -> allocation -> rationale_delta* -> done.
+    The final 'done' event carries the complete /advice/v1 response.
+    """
+    tickers = _advice_tickers(body.tickers)
+    # submit before streaming starts, so an unknown ticker is still a plain 404
+    started, futures = _submit_advice_inputs(tickers, use_cache=not body.no_cache)
+
+    def events():
+        yield _ndjson({"type": "start", "risk": body.risk, "tickers": tickers})
+        by_ticker: Dict[str, Dict[str, Any]] = {}
+        try:
+            for entry in _iter_advice_entries(started, futures):
+                by_ticker[entry["ticker"]] = entry
+                yield _ndjson({"type": "ticker", **entry})
+        except HTTPException as e:
+            yield _ndjson({"type": "error", "status": e.status_code, "detail": e.detail})
+            return
+        per = [by_ticker[t] for t in tickers]
+
+        allocation, portfolio = _advice_allocation(per, body.risk)
+        yield _ndjson({"type": "allocation", "allocation": allocation, "portfolio": portfolio})
+
+        rationale = ""
+        client = get_llm()
+        if client:
+            try:
+                for piece in _chat_stream(client, _advice_rationale_messages(per, allocation, body.risk),
+                                          max_tokens=420, timeout=25, use_cache=not body.no_cache):
+                    rationale += piece
+                    yield _ndjson({"type": "rationale_delta", "text": piece})
+            except Exception as e:
+                print("[/advice/v1/stream] ERROR: rationale", type(e).__name__, str(e))
+        rationale = rationale.strip()
+        if not rationale:
+            rationale = _build_data_rationale(per, allocation, body.risk, portfolio)
+            yield _ndjson({"type": "rationale_delta", "text": rationale})
+
+        yield _ndjson({"type": "done", "result": {
+            "risk": body.risk,
+            "tickers": tickers,
+            "per_ticker": per,
+            "allocation": allocation,
+            "portfolio": portfolio,
+            "rationale": rationale,
+            "disclaimer": DISCLAIMER_LINK,
+        }})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+#--------------------------------------- Batch advice ----------------------------------------
+# Many portfolios in one call: the union of their tickers is fetched once (one snapshot read,
+# one fundamentals/street/news job per ticker, batched news summaries), then each portfolio's
+# allocation and data rationale come from the shared per-ticker entries. With overlapping
+# portfolios upstream calls scale with unique tickers instead of portfolio size x count.
+ADVICE_BATCH_MAX_PORTFOLIOS = int(os.getenv("ADVICE_BATCH_MAX_PORTFOLIOS", "200"))
+ADVICE_BATCH_MAX_TICKERS = int(os.getenv("ADVICE_BATCH_MAX_TICKERS", "500"))
+# llm_rationale calls get their own small pool, so a big batch never queues /advice/v1 work
+# behind them, and one overall deadline; a portfolio whose call misses it keeps its data rationale
+ADVICE_BATCH_LLM_WORKERS = max(1, int(os.getenv("ADVICE_BATCH_LLM_WORKERS", "4")))
+ADVICE_BATCH_LLM_TIMEOUT_S = float(os.getenv("ADVICE_BATCH_LLM_TIMEOUT_S", "60"))
+
+_rationale_pool = ThreadPoolExecutor(max_workers=ADVICE_BATCH_LLM_WORKERS, thread_name_prefix="batch-llm")
+
+
+class AdvicePortfolio(BaseModel):
+    id: Optional[str] = Field(default=None, description="Echoed back; defaults to the portfolio's index")
+    tickers: List[str] = Field(min_items=1, max_items=10)
+    risk: int = Field(3, ge=1, le=5)
+
+
+class AdviceBatchRequest(BaseModel):
+    portfolios: List[AdvicePortfolio] = Field(min_items=1)
+    llm_rationale: bool = Field(False, description="Also ask the LLM for each portfolio's rationale (one call per portfolio)")
+    no_cache: bool = Field(False, description="Skip the LLM cache and regenerate summaries/rationale")
+
+
+def _batch_rationale(per: List[Dict[str, Any]], allocation: Dict[str, float], risk: int, use_cache: bool) -> str | None:
+    client = get_llm()
+    if not client:
+        return None
+    try:
+        return _chat_complete(client, _advice_rationale_messages(per, allocation, risk),
+                              max_tokens=420, timeout=25, use_cache=use_cache)
+    except Exception as e:
+        print("[/advice/batch] ERROR: rationale", type(e).__name__, str(e))
+        return None
+
+
+@app.post("/advice/batch")
+def advice_batch(body: AdviceBatchRequest):
+    """
+    /advice/v1 for a list of {tickers, risk} portfolios. Per-ticker data is returned once under
+    'per_ticker'; each portfolio carries its allocation, portfolio stats and rationale. A
+    portfolio naming an unknown ticker gets an error entry instead of failing the batch.
+    """
+    if len(body.portfolios) > ADVICE_BATCH_MAX_PORTFOLIOS:
+        raise HTTPException(status_code=400, detail=f"At most {ADVICE_BATCH_MAX_PORTFOLIOS} portfolios")
+    requested = [_advice_tickers(p.tickers) for p in body.portfolios]
+    union = list(dict.fromkeys(t for tickers in requested for t in tickers))
+    if len(union) > ADVICE_BATCH_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {ADVICE_BATCH_MAX_TICKERS} distinct tickers")
+
+    started = time.perf_counter()
+    snapshots = _advice_snapshots(union)
+    # without snapshots every ticker is tried, and the unknown ones surface as 404s from fundamentals
+    unknown = set() if snapshots is None else {t for t in union if t not in snapshots}
+    known = [t for t in union if t not in unknown]
+
+    by_ticker: Dict[str, Dict[str, Any]] = {}
+    if known:
+        submitted, futures = _submit_advice_inputs(known, use_cache=not body.no_cache, snapshots=snapshots or {})
+        by_ticker = {entry["ticker"]: entry for entry in _iter_advice_entries(submitted, futures, missing=unknown)}
+
+    # price stats and returns for the union, sliced per portfolio
+    prices = AdvicePrices(list(by_ticker))
+    results: List[Dict[str, Any]] = []
+    pending_llm: Dict[int, Future] = {}
+    for i, (p, tickers) in enumerate(zip(body.portfolios, requested)):
+        pid = p.id if p.id is not None else str(i)
+        missing = [t for t in tickers if t in unknown]
+        if missing:
+            results.append({"id": pid, "tickers": tickers, "risk": p.risk,
+                            "error": "Asset not found", "missing": missing})
+            continue
+        per = [by_ticker[t] for t in tickers]
+        allocation, portfolio = _advice_allocation(per, p.risk, prices)
+        results.append({
+            "id": pid,
+            "tickers": tickers,
+            "risk": p.risk,
+            "allocation": allocation,
+            "portfolio": portfolio,
+            "rationale": _build_data_rationale(per, allocation, p.risk, portfolio),
+        })
+        if body.llm_rationale:
+            pending_llm[len(results) - 1] = _rationale_pool.submit(
+                contextvars.copy_context().run, _batch_rationale, per, allocation, p.risk, not body.no_cache)
+    if pending_llm:
+        wait(list(pending_llm.values()), timeout=ADVICE_BATCH_LLM_TIMEOUT_S)
+    late = 0
+    for idx, fut in pending_llm.items():
+        if not fut.done():
+            fut.cancel()
+            late += 1
+            continue
+        text = fut.result()
+        if text:
+            results[idx]["rationale"] = text
+    if late:
+        print(f"[/advice/batch] TIMEOUT: {late} LLM rationales after {ADVICE_BATCH_LLM_TIMEOUT_S:.0f}s, kept data rationale")
+
+    return {
+        "portfolios": results,
+        "per_ticker": by_ticker,
+        "stats": {
+            "portfolios": len(results),
+            "tickers_requested": sum(len(t) for t in requested),
+            "unique_tickers": len(union),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        },
+        "disclaimer": DISCLAIMER_LINK,
+    }
+
+
+#--------------------------------------- Backtest ----------------------------------------
+# Replays fixed weights (e.g. an /advice/v1 allocation), or the advice optimizer re-run at every
+# rebalance, over the local price store (backtest.py). The re-run only sees returns before each
+# rebalance date for its covariance, but its signals are today's stored fundamentals scores: no
+# point-in-time fundamentals, street or news are kept. Results are cached by the inputs plus each
+# ticker's last stored day, so new prices invalidate them.
+BACKTEST_CACHE_SIZE = int(os.getenv("BACKTEST_CACHE_SIZE", "256"))
+BACKTEST_CACHE_TTL_S = float(os.getenv("BACKTEST_CACHE_TTL_S", "3600"))
+BACKTEST_MAX_TICKERS = 1000
+
+_backtest_cache = TTLCache("backtest", BACKTEST_CACHE_SIZE, BACKTEST_CACHE_TTL_S)
+
+
+class BacktestRequest(BaseModel):
+    tickers: List[str] = Field(default_factory=list, description="Defaults to the keys of weights")
+    weights: Optional[Dict[str, float]] = Field(
+        default=None, description="Fixed target weights, e.g. an /advice/v1 allocation; omit to re-run the advice optimizer at each rebalance")
+    risk: int = Field(3, ge=1, le=5, description="Risk level for the optimizer re-run")
+    start: Optional[str] = Field(default=None, description="YYYY-MM-DD; default one year before end")
+    end: Optional[str] = Field(default=None, description="YYYY-MM-DD; default the newest stored day")
+    rebalance: str = Field("monthly", pattern="^(none|monthly|quarterly|yearly)$")
+    cost_bps: float = Field(0.0, ge=0, le=500, description="Trading cost per unit of one-way turnover, in basis points")
+    no_cache: bool = False
+
+
+def _backtest_signals(tickers: List[str]) -> tuple[List[float], List[Any]]:
+    """weight_basis (fundamentals only) and beta per ticker, from the graph."""
+    items = _get_asset_items(tickers)
+    basis, betas = [], []
+    for t in tickers:
+        item = _scored(items[t]) if t in items else {}
+        basis.append(_combine_strategy_signals({"score": item.get("score")}, {}, {})["weight_basis"])
+        betas.append(extract_metrics(item).get("beta"))
+    return basis, betas
+
+
+def _run_backtest(body: BacktestRequest, tickers: List[str], weights: Dict[str, float],
+                  start: int, end: int) -> Dict[str, Any]:
+    # the optimizer re-run needs a trailing window before the first rebalance
+    lookback = 0 if weights else PRICE_LOOKBACK_DAYS
+    with metrics.timed("pricestore", "returns"):
+        days, returns = _prices.returns_matrix(tickers, lookback_days=end - start + lookback, end=end)
+    first = int(np.searchsorted(days, start, side="right"))
+    observed = np.isfinite(returns[first:]).any(axis=0)
+    kept = [t for t, ok in zip(tickers, observed) if ok]
+    missing = [t for t, ok in zip(tickers, observed) if not ok]
+    if len(days) - first < 2 or not kept:
+        raise HTTPException(status_code=404, detail={"error": "Not enough stored prices in range", "missing": missing})
+    returns = returns[:, observed]
+
+    starts = period_starts(days[first:], body.rebalance)
+    if weights:
+        w = np.array([weights.get(t, 0.0) for t in kept])
+        if w.sum() <= 0:
+            raise HTTPException(status_code=400, detail="Weights of tickers with prices sum to zero")
+        targets = fixed_targets(w, len(starts))
+    else:
+        try:
+            basis, betas = _backtest_signals(kept)
+        except Exception as e:
+            print("[/backtest] ERROR:", type(e).__name__, str(e))
+            raise HTTPException(status_code=500, detail="Database read failed")
+
+        def optimize(history: np.ndarray) -> np.ndarray:
+            info = optimize_portfolio(kept, basis, betas, body.risk, returns=history if len(history) else None)
+            return np.array([info["weights"][t] for t in kept])
+
+        targets = rolling_targets(returns, starts + first, first, optimize)
+
+    result = simulate(returns[first:], starts, targets, body.cost_bps)
+    return {
+        "mode": "fixed" if weights else "advice",
+        "tickers": kept,
+        "missing": missing,
+        "rebalance": body.rebalance,
+        "cost_bps": body.cost_bps,
+        **summarize(days[first:], result["daily"], result["turnover"], from_day),
+        "weights": {t: round(float(x), 4) for t, x in zip(kept, targets[-1])},
+    }
+
+
+@app.post("/backtest")
+def backtest(body: BacktestRequest):
+    """
+    Portfolio return, volatility, Sharpe, max drawdown and turnover over stored daily prices, with
+    the weights reset at every rebalance. Tickers without prices in the range are dropped (listed
+    in 'missing'); days before a ticker's first price count as flat.
+    """
+    weights = {k.strip().upper(): float(v) for k, v in (body.weights or {}).items() if k and k.strip()}
+    if any(v < 0 or not np.isfinite(v) for v in weights.values()):
+        raise HTTPException(status_code=400, detail="Weights must be non-negative numbers")
+    tickers = _ticker_keys(body.tickers or list(weights))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="No tickers")
+    if len(tickers) > BACKTEST_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {BACKTEST_MAX_TICKERS} tickers")
+    try:
+        end = to_day(body.end) if body.end else _prices.latest(tickers)
+        start = to_day(body.start) if body.start else (end - 365 if end is not None else None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    if end is None:
+        raise HTTPException(status_code=404, detail={"error": "No stored prices for these tickers", "missing": tickers})
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    key = hashlib.sha1(json.dumps([
+        tickers, weights, None if weights else body.risk, start, end, body.rebalance, body.cost_bps,
+        [_prices.last_day(t) for t in tickers],
+    ]).encode("utf-8")).hexdigest()
+    if not body.no_cache:
+        hit = _backtest_cache.get(key)
+        if hit is not None:
+            return {**hit, "cached": True, "disclaimer": DISCLAIMER_LINK}
+
+    started = time.perf_counter()
+    result = _run_backtest(body, tickers, weights, start, end)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _backtest_cache.set(key, result)
+    return {**result, "cached": False, "disclaimer": DISCLAIMER_LINK}
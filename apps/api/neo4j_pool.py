@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict
+
+
+class PoolGauge:
+    """
+    Admission gate in front of a Neo4j driver's connection pool. At most `size` sessions are
+    open at once (one connection each), so waiting happens here where it can be measured:
+    in-use, peak, time spent waiting for a slot and acquisition timeouts.
+    """
+
+    def __init__(self, name: str, size: int, timeout: float):
+        self.name = name
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sem = threading.BoundedSemaphore(self.size)
+        self._asem: asyncio.Semaphore | None = None
+        self.in_use = 0
+        self.peak = 0
+        self.sessions = 0
+        self.timeouts = 0
+        self.wait_s = 0.0
+        self.max_wait_s = 0.0
+
+    def _enter(self, waited: float) -> None:
+        with self._lock:
+            self.in_use += 1
+            self.peak = max(self.peak, self.in_use)
+            self.sessions += 1
+            self.wait_s += waited
+            self.max_wait_s = max(self.max_wait_s, waited)
+
+    def _exit(self) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def _timed_out(self) -> TimeoutError:
+        with self._lock:
+            self.timeouts += 1
+        return TimeoutError(f"no {self.name} Neo4j session slot within {self.timeout:g}s")
+
+    @contextmanager
+    def slot(self):
+        started = time.monotonic()
+        if not self._sem.acquire(timeout=self.timeout):
+            raise self._timed_out()
+        self._enter(time.monotonic() - started)
+        try:
+            yield
+        finally:
+            self._exit()
+            self._sem.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        if self._asem is None:
+            self._asem = asyncio.Semaphore(self.size)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._asem.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out() from None
+        self._enter(time.monotonic() - started)
+        try:
+            yield
+        finally:
+            self._exit()
+            self._asem.release()
+
+    def stats(self, driver: Any = None) -> Dict[str, Any]:
+        out = {
+            "size": self.size,
+            "in_use": self.in_use,
+            "peak": self.peak,
+            "sessions": self.sessions,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_s / self.sessions * 1000, 3) if self.sessions else None,
+            "max_wait_ms": round(self.max_wait_s * 1000, 3),
+        }
+        if driver is not None:
+            out.update(driver_connections(driver))
+        return out
+
+
+def driver_connections(driver: Any) -> Dict[str, Any]:
+    """Open/idle connection counts read from the driver's pool. Not public API, so best effort."""
+    try:
+        pools = driver._pool.connections
+        conns = [c for d in list(pools.values()) for c in list(d)]
+        busy = sum(1 for c in conns if getattr(c, "in_use", False))
+        return {"open_connections": len(conns), "idle_connections": len(conns) - busy}
+    except Exception:
+        return {"open_connections": None, "idle_connections": None}
@@ -0,0 +1,65 @@
+import json
+import re
+from typing import Any, Dict, List, Mapping
+
+# Several tickers' headlines in one structured-output prompt; the reply is a JSON object keyed
+# by ticker. Anything that doesn't parse for a ticker is simply missing from parse_batch().
+# Only prose is asked for; sentiment is scored locally (sentiment.py).
+
+BATCH_SYSTEM = "Be concise, neutral and factual. Reply with a single JSON object and nothing else."
+
+
+def batch_messages(groups: Mapping[str, List[str]]) -> List[Dict[str, str]]:
+    """groups: {ticker: [headline, ...]} -> chat messages asking for one summary per ticker."""
+    blocks = []
+    for ticker, headlines in groups.items():
+        blocks.append(f"[{ticker}]\n" + "\n".join(f"- {h}" for h in headlines))
+    example = {t: {"summary": "..."} for t in list(groups)[:2]}
+    prompt = (
+        "For each ticker below, summarize its recent headlines in 2-4 sentences.\n"
+        f"Return a JSON object with exactly these keys: {', '.join(groups)}. "
+        f"Each value is {{\"summary\": string}}, e.g. {json.dumps(example)}\n\n"
+        + "\n\n".join(blocks)
+    )
+    return [
+        {"role": "system", "content": BATCH_SYSTEM},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _json_object(text: str) -> Any:
+    text = (text or "").strip()
+    # tolerate ```json fences or prose around the object
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.S)
+    if fenced:
+        text = fenced.group(1)
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        raise ValueError("no JSON object in reply")
+    return json.loads(text[start:end + 1])
+
+
+def _summary(raw: Any) -> str | None:
+    # {"summary": "..."} as asked, or a bare string
+    if isinstance(raw, dict):
+        raw = raw.get("summary")
+    if not isinstance(raw, str) or not raw.strip():
+        return None
+    return raw.strip()
+
+
+def parse_batch(text: str, tickers: List[str]) -> Dict[str, str]:
+    """{ticker: summary} for every requested ticker the reply covers validly."""
+    try:
+        obj = _json_object(text)
+    except ValueError:
+        return {}
+    if not isinstance(obj, dict):
+        return {}
+    by_key = {str(k).strip().upper(): v for k, v in obj.items()}
+    out: Dict[str, str] = {}
+    for t in tickers:
+        summary = _summary(by_key.get(t.upper()))
+        if summary is not None:
+            out[t] = summary
+    return out
@@ -0,0 +1,198 @@
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+# Allocation engine for /advice/v1: signals -> expected returns, beta (or price history)
+# -> covariance, then mean-variance or risk-parity weights under the risk level's caps.
+# Everything is dense NumPy: ten tickers solve in a few milliseconds, 500 in tens of them.
+
+MARKET_VOL = 0.18          # annualized, for the single-index covariance
+IDIO_VOL = 0.25            # annualized residual volatility per name
+DEFAULT_BETA = 1.0
+MU_SCALE = 0.06            # a ticker with average weight_basis expects 6%/yr
+TRADING_DAYS = 252
+MIN_OBS = 60               # daily returns a name needs before its price history is used
+
+# per risk level: solver and box constraints. max_weight also sets the minimum number of
+# holdings (1 / max_weight); both bounds are relaxed when the ticker count makes them infeasible
+# (or, for min_weight, would force equal weights)
+RISK_PROFILES: Dict[int, Dict[str, Any]] = {
+    1: {"method": "risk_parity", "max_weight": 0.30, "min_weight": 0.05},
+    2: {"method": "mean_variance", "risk_aversion": 8.0, "max_weight": 0.35, "min_weight": 0.03},
+    3: {"method": "mean_variance", "risk_aversion": 4.0, "max_weight": 0.45, "min_weight": 0.02},
+    4: {"method": "mean_variance", "risk_aversion": 2.0, "max_weight": 0.60, "min_weight": 0.0},
+    5: {"method": "mean_variance", "risk_aversion": 1.0, "max_weight": 0.80, "min_weight": 0.0},
+}
+
+
+def _clean(values: Sequence[Any], default: float) -> np.ndarray:
+    out = np.full(len(values), default, dtype=np.float64)
+    for i, v in enumerate(values):
+        try:
+            f = float(v)
+        except (TypeError, ValueError):
+            continue
+        if np.isfinite(f):
+            out[i] = f
+    return out
+
+
+def single_index_cov(betas: np.ndarray) -> np.ndarray:
+    """Σ = σ_m² ββᵀ + diag(σ_ε²): the covariance implied by each name's beta to the market."""
+    cov = MARKET_VOL ** 2 * np.outer(betas, betas)
+    cov[np.diag_indices_from(cov)] += IDIO_VOL ** 2
+    return cov
+
+
+def sample_cov(returns: np.ndarray, min_obs: int = MIN_OBS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Annualized pairwise covariance of daily returns (T x n, NaN = no price that day) and a mask of
+    the columns with at least min_obs observations. Pairs are computed over their common days.
+    """
+    mask = np.isfinite(returns)
+    counts = mask.sum(axis=0)
+    means = np.where(counts > 0, np.nansum(returns, axis=0) / np.maximum(counts, 1), 0.0)
+    x = np.where(mask, returns - means, 0.0)
+    m = mask.astype(np.float64)
+    pairs = m.T @ m
+    cov = (x.T @ x) / np.maximum(pairs - 1, 1) * TRADING_DAYS
+    return cov, counts >= min_obs
+
+
+def covariance(betas: Sequence[Any], returns: np.ndarray | None = None, min_obs: int = MIN_OBS) -> np.ndarray:
+    """
+    Covariance from stored betas, refined by price history where there is enough of it: the
+    sample estimate is shrunk toward the beta model (more history -> less shrinkage), and names
+    without history keep their model rows.
+    """
+    model = single_index_cov(_clean(betas, DEFAULT_BETA))
+    if returns is None or returns.size == 0:
+        return model
+    sample, ok = sample_cov(returns, min_obs)
+    if not ok.any():
+        return model
+    n_obs = int(np.isfinite(returns[:, ok]).sum(axis=0).min())
+    shrink = float(np.clip(ok.sum() / (ok.sum() + n_obs), 0.1, 1.0))
+    both = np.outer(ok, ok)
+    cov = np.where(both, shrink * model + (1 - shrink) * sample, model)
+    return (cov + cov.T) / 2
+
+
+def project_capped_simplex(v: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    """
+    Euclidean projection onto {w : Σw = 1, lo <= w <= hi}: w = clip(v − τ, lo, hi), where
+    f(τ) = Σ clip(v − τ, lo, hi) is piecewise linear. f is evaluated at all 2n breakpoints at
+    once (sorted v + prefix sums), then τ is interpolated on the segment where f crosses 1.
+    """
+    s = np.sort(v)
+    csum = np.concatenate(([0.0], np.cumsum(s)))
+    n = len(s)
+    taus = np.sort(np.concatenate((s - hi, s - lo)))
+    above = n - np.searchsorted(s, taus + hi, side="right")   # clipped to hi
+    below = np.searchsorted(s, taus + lo, side="left")        # clipped to lo
+    free = n - above - below
+    f = hi * above + lo * below + (csum[n - above] - csum[below]) - free * taus
+    k = int(np.clip(np.searchsorted(-f, -1.0, side="right") - 1, 0, len(taus) - 2))
+    span = f[k] - f[k + 1]
+    tau = taus[k] + (f[k] - 1.0) * (taus[k + 1] - taus[k]) / span if span > 0 else taus[k]
+    return np.clip(v - tau, lo, hi)
+
+
+def _top_eigenvalue(cov: np.ndarray, iters: int = 15) -> float:
+    """Largest eigenvalue of Σ for the gradient step: a few power iterations with 10% headroom,
+    never above the max-row-sum bound (which always holds)."""
+    bound = float(np.abs(cov).sum(axis=1).max())
+    x = np.ones(len(cov))
+    for _ in range(iters):
+        x = cov @ x
+        x /= np.linalg.norm(x) or 1.0
+    return min(bound, 1.1 * float(x @ cov @ x))
+
+
+def mean_variance(mu: np.ndarray, cov: np.ndarray, risk_aversion: float, lo: float, hi: float,
+                  iters: int = 2000, tol: float = 1e-7) -> np.ndarray:
+    """max μᵀw − (λ/2) wᵀΣw on the capped simplex, by accelerated projected gradient with restarts."""
+    n = len(mu)
+    step = 1.0 / max(risk_aversion * _top_eigenvalue(cov), 1e-12)
+    w = project_capped_simplex(np.full(n, 1.0 / n), lo, hi)
+    y, t = w, 1.0
+    for _ in range(iters):
+        grad = mu - risk_aversion * (cov @ y)
+        nxt = project_capped_simplex(y + step * grad, lo, hi)
+        if np.abs(nxt - w).max() < tol:
+            return nxt
+        if np.dot(grad, nxt - w) < 0:
+            # momentum is pointing downhill: restart from the last point
+            y, t = w, 1.0
+            continue
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        y = nxt + ((t - 1) / t_next) * (nxt - w)
+        w, t = nxt, t_next
+    return w
+
+
+def risk_parity(cov: np.ndarray, budgets: np.ndarray, lo: float, hi: float,
+                iters: int = 200, tol: float = 1e-8) -> np.ndarray:
+    """Weights whose risk contributions wᵢ(Σw)ᵢ are proportional to budgets, then capped."""
+    b = budgets / budgets.sum()
+    w = b / np.sqrt(np.diag(cov))
+    w /= w.sum()
+    for _ in range(iters):
+        rc = w * (cov @ w)
+        rc /= rc.sum()
+        nxt = w * np.sqrt(b / np.maximum(rc, 1e-18))
+        nxt /= nxt.sum()
+        if np.abs(nxt - w).max() < tol:
+            w = nxt
+            break
+        w = nxt
+    return project_capped_simplex(w, lo, hi)
+
+
+def optimize(tickers: Sequence[str], basis: Sequence[Any], betas: Sequence[Any], risk: int,
+             returns: np.ndarray | None = None) -> Dict[str, Any]:
+    """
+    tickers + weight_basis signals + betas (+ optional T x n daily returns) ->
+    {weights: {ticker: w}, method, max_weight, min_weight, expected_return, volatility, effective_n,
+    price_history (names whose covariance rows came from returns)}
+    """
+    n = len(tickers)
+    profile = RISK_PROFILES.get(int(risk), RISK_PROFILES[3])
+    if n == 0:
+        return {"weights": {}, "method": profile["method"]}
+
+    signal = np.maximum(_clean(basis, 1.0), 0.1)
+    mu = MU_SCALE * signal / signal.mean()
+    cov = covariance(betas, returns)
+    with_history = 0 if returns is None or returns.size == 0 else int((np.isfinite(returns).sum(axis=0) >= MIN_OBS).sum())
+    hi = max(profile["max_weight"], 1.0 / n)
+    lo = min(profile["min_weight"], 0.5 / n)
+
+    if profile["method"] == "risk_parity":
+        w = risk_parity(cov, signal, lo, hi)
+    else:
+        w = mean_variance(mu, cov, profile["risk_aversion"], lo, hi)
+
+    w = np.where(w < 1e-4, 0.0, w)
+    w /= w.sum()
+    return {
+        "weights": {t: round(float(x), 4) for t, x in zip(tickers, w)},
+        "method": profile["method"],
+        "max_weight": round(hi, 4),
+        "min_weight": round(lo, 4),
+        "expected_return": round(float(mu @ w), 4),
+        "volatility": round(float(np.sqrt(w @ cov @ w)), 4),
+        "effective_n": round(float(1.0 / np.sum(w * w)), 2),
+        "price_history": with_history,
+    }
+
+
+def describe(info: Dict[str, Any]) -> str:
+    """One sentence for the data rationale (info = optimize() output, with or without weights)."""
+    if "volatility" not in info:
+        return ""
+    model = "price-history" if info.get("price_history") else "beta-implied"
+    how = ("risk parity (each name contributes risk in proportion to its signal)"
+           if info["method"] == "risk_parity" else f"mean-variance (signal strength traded off against {model} risk)")
+    return (f"Weights use {how}, capped at {info['max_weight'] * 100:.0f}% per name; "
+            f"expected volatility about {info['volatility'] * 100:.0f}%/yr across {info['effective_n']:.1f} effective holdings.")
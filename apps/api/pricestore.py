@@ -0,0 +1,279 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Sequence
+
+import numpy as np
+
+# Daily OHLCV per ticker as append-only column files under <root>/<TICKER>/: day.i4 (days since
+# 1970-01-01, strictly increasing) and open/high/low/close/volume as raw float64. Readers
+# np.memmap the columns, so a window is a view onto the page cache rather than a copy.
+# Writers append the value columns first and the day column last: the day column's length is
+# the row count, so a reader never sees a half-written row, and leftovers of an interrupted
+# append are truncated on the next write. Rows older than the last stored day (a backfill or a
+# correction) rewrite the ticker's files. One writing process per store, like JOBS_DB.
+# Each mapped ticker holds one mapping (and file descriptor) per column, so only the
+# `max_open` most recently read tickers stay mapped; an evicted ticker's maps are released once
+# no caller still holds a view of them.
+
+FIELDS = ("open", "high", "low", "close", "volume")
+DAY = "day"
+DTYPES = {DAY: np.dtype("<i4"), **{f: np.dtype("<f8") for f in FIELDS}}
+TRADING_DAYS = 252
+
+EPOCH = date(1970, 1, 1)
+_TICKER = re.compile(r"^[A-Z0-9][A-Z0-9.\-]{0,19}$")
+
+
+def to_day(value: Any) -> int:
+    """'YYYY-MM-DD' (or a datetime prefix of it), a date, or unix seconds -> days since 1970-01-01."""
+    if isinstance(value, datetime):
+        return (value.date() - EPOCH).days
+    if isinstance(value, date):
+        return (value - EPOCH).days
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value // 86400)
+    text = str(value).strip()
+    if re.fullmatch(r"\d{9,}(\.\d*)?", text):
+        return int(float(text) // 86400)
+    return (date.fromisoformat(text[:10]) - EPOCH).days
+
+
+def from_day(day: int) -> str:
+    return (EPOCH + timedelta(days=int(day))).isoformat()
+
+
+def today() -> int:
+    return (datetime.now(timezone.utc).date() - EPOCH).days
+
+
+def _empty() -> Dict[str, np.ndarray]:
+    return {name: np.empty(0, dtype=dt) for name, dt in DTYPES.items()}
+
+
+class PriceStore:
+    def __init__(self, root: str, max_open: int = 512):
+        self.root = root
+        self.max_open = max(1, max_open)
+        self._lock = threading.Lock()
+        # ticker -> ((inode, size) of its day column, memmapped columns), least recently read first
+        self._maps: OrderedDict[str, tuple[tuple[int, int], Dict[str, np.ndarray]]] = OrderedDict()
+
+    @staticmethod
+    def key(ticker: str) -> str:
+        t = (ticker or "").strip().upper()
+        if not _TICKER.match(t):
+            raise ValueError(f"invalid ticker: {ticker!r}")
+        return t
+
+    def _path(self, ticker: str, name: str) -> str:
+        return os.path.join(self.root, ticker, f"{name}.{DTYPES[name].str[1:]}")
+
+    # --- reads ---
+    def columns(self, ticker: str) -> Dict[str, np.ndarray]:
+        """Read-only memmapped columns (day + FIELDS) for one ticker; empty arrays when none are stored."""
+        try:
+            t = self.key(ticker)
+            st = os.stat(self._path(t, DAY))
+        except (ValueError, FileNotFoundError):
+            return _empty()
+        with self._lock:  # also keeps reads from mapping files a rewrite is halfway through replacing
+            hit = self._maps.get(t)
+            if hit and hit[0] == (st.st_ino, st.st_size):
+                self._maps.move_to_end(t)
+                return hit[1]
+            try:
+                st = os.stat(self._path(t, DAY))
+            except FileNotFoundError:
+                return _empty()
+            cols = self._read_locked(t)
+            self._maps[t] = ((st.st_ino, st.st_size), cols)
+            self._maps.move_to_end(t)
+            while len(self._maps) > self.max_open:
+                # dropping the arrays unmaps them (and closes their descriptors) once unreferenced;
+                # an explicit close would break views callers still hold
+                self._maps.popitem(last=False)
+            return cols
+
+    def _map(self, ticker: str, name: str, n: int) -> np.ndarray:
+        if n == 0:
+            return np.empty(0, dtype=DTYPES[name])
+        return np.memmap(self._path(ticker, name), dtype=DTYPES[name], mode="r", shape=(n,))
+
+    def last_day(self, ticker: str) -> int | None:
+        days = self.columns(ticker)[DAY]
+        return int(days[-1]) if len(days) else None
+
+    def window(self, ticker: str, start: int, end: int) -> Dict[str, np.ndarray]:
+        """Views of the rows with start <= day <= end."""
+        cols = self.columns(ticker)
+        lo = np.searchsorted(cols[DAY], start, side="left")
+        hi = np.searchsorted(cols[DAY], end, side="right")
+        return {name: col[lo:hi] for name, col in cols.items()}
+
+    def tickers(self) -> List[str]:
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(n for n in names if _TICKER.match(n) and os.path.exists(self._path(n, DAY)))
+
+    def latest(self, tickers: Sequence[str]) -> int | None:
+        """Newest stored day across tickers, None when none of them has prices."""
+        lasts = [d for d in (self.last_day(t) for t in tickers) if d is not None]
+        return max(lasts) if lasts else None
+
+    def _end(self, tickers: Sequence[str], end: int | None) -> int:
+        if end is not None:
+            return end
+        # default to the newest stored day, so a store that is a few days stale still has a window
+        latest = self.latest(tickers)
+        return today() if latest is None else latest
+
+    def returns_matrix(self, tickers: Sequence[str], lookback_days: int = 365,
+                       end: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (days, R): daily log close-to-close returns, one column per ticker, on the union of their
+        trading days in (end - lookback_days, end]; NaN where a ticker has no return that day.
+        Per-ticker windows are memmap views; the aligned T x n output is the only copy.
+        """
+        end = self._end(tickers, end)
+        series = []
+        for t in tickers:
+            cols = self.columns(t)
+            lo = np.searchsorted(cols[DAY], end - lookback_days, side="right")
+            hi = np.searchsorted(cols[DAY], end, side="right")
+            lo = max(lo - 1, 0)  # one earlier close, so the first day in the window has a return
+            close = cols["close"][lo:hi]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rets = np.diff(np.log(close))
+            series.append((cols[DAY][lo + 1:hi], np.where(np.isfinite(rets), rets, np.nan)))
+
+        stacked = [d for d, _ in series if len(d)]
+        axis = np.unique(np.concatenate(stacked)) if stacked else np.empty(0, dtype=DTYPES[DAY])
+        out = np.full((len(axis), len(tickers)), np.nan)
+        for j, (days, rets) in enumerate(series):
+            if len(days):
+                out[np.searchsorted(axis, days), j] = rets
+        return axis, out
+
+    def stats(self, tickers: Sequence[str], lookback_days: int = 365, end: int | None = None) -> Dict[str, Dict[str, Any]]:
+        """Per ticker over the window: observations, first/last date, last close, total return,
+        annualized volatility and max drawdown. Tickers without prices are left out."""
+        end = self._end(tickers, end)
+        out: Dict[str, Dict[str, Any]] = {}
+        for t in tickers:
+            win = self.window(t, end - lookback_days + 1, end)
+            close = np.asarray(win["close"])
+            close = close[np.isfinite(close) & (close > 0)]
+            if len(close) == 0:
+                continue
+            rets = np.diff(np.log(close))
+            peak = np.maximum.accumulate(close)
+            out[t] = {
+                "observations": int(len(close)),
+                "first": from_day(win[DAY][0]),
+                "last": from_day(win[DAY][-1]),
+                "close": round(float(close[-1]), 4),
+                "return": round(float(close[-1] / close[0] - 1), 4),
+                "volatility": round(float(rets.std(ddof=1) * np.sqrt(TRADING_DAYS)), 4) if len(rets) > 1 else None,
+                "max_drawdown": round(float((close / peak - 1).min()), 4),
+            }
+        return out
+
+    def info(self) -> Dict[str, Any]:
+        names = self.tickers()
+        rows = sum(len(self.columns(t)[DAY]) for t in names)
+        size = 0
+        for t in names:
+            for name in DTYPES:
+                try:
+                    size += os.path.getsize(self._path(t, name))
+                except OSError:
+                    pass
+        return {"root": self.root, "tickers": len(names), "rows": rows, "bytes": size}
+
+    # --- writes ---
+    def append(self, ticker: str, days: Sequence[int], values: Mapping[str, Sequence[Any]]) -> Dict[str, Any]:
+        """
+        Store daily rows: days (days since epoch) plus equal-length value lists; `close` is required,
+        open/high/low default to close and volume to NaN. A day given twice keeps the last row.
+        Rows after the last stored day are appended; anything else that changes stored data
+        rewrites the ticker's files.
+        """
+        t = self.key(ticker)
+        days = np.asarray(days, dtype=np.int64)
+        close = np.asarray(values["close"], dtype=np.float64)
+        new = {f: np.asarray(values[f], dtype=np.float64) if values.get(f) is not None else None for f in FIELDS}
+        new["close"] = close
+        for f in ("open", "high", "low"):
+            if new[f] is None:
+                new[f] = close
+        if new["volume"] is None:
+            new["volume"] = np.full(len(days), np.nan)
+
+        keep = np.isfinite(close)
+        days, new = days[keep], {f: v[keep] for f, v in new.items()}
+        if len(days) == 0:
+            return {"ticker": t, "appended": 0, "rewritten": False, "rows": len(self.columns(t)[DAY])}
+        days, new = _dedupe(days, new)
+
+        with self._lock:
+            stored = self._read_locked(t)
+            n = len(stored[DAY])
+            tail = days > int(stored[DAY][-1]) if n else np.ones(len(days), dtype=bool)
+            if tail.all() or _matches(stored, days[~tail], {f: v[~tail] for f, v in new.items()}):
+                self._append_files(t, n, days[tail], {f: v[tail] for f, v in new.items()})
+                return {"ticker": t, "appended": int(tail.sum()), "rewritten": False, "rows": n + int(tail.sum())}
+            merged_days, merged = _dedupe(np.concatenate([stored[DAY], days]),
+                                          {f: np.concatenate([stored[f], new[f]]) for f in FIELDS})
+            self._rewrite_files(t, merged_days, merged)
+        return {"ticker": t, "appended": int(len(merged_days) - n), "rewritten": True, "rows": int(len(merged_days))}
+
+    def _read_locked(self, t: str) -> Dict[str, np.ndarray]:
+        path = self._path(t, DAY)
+        if not os.path.exists(path):
+            return _empty()
+        n = os.path.getsize(path) // DTYPES[DAY].itemsize
+        return {name: self._map(t, name, n) for name in DTYPES}
+
+    def _append_files(self, t: str, n: int, days: np.ndarray, values: Dict[str, np.ndarray]) -> None:
+        if len(days) == 0:
+            return
+        os.makedirs(os.path.join(self.root, t), exist_ok=True)
+        # value columns first; the day column commits the rows
+        for name in FIELDS + (DAY,):
+            arr = (days if name == DAY else values[name]).astype(DTYPES[name])
+            with open(self._path(t, name), "ab") as fh:
+                fh.truncate(n * DTYPES[name].itemsize)
+                fh.write(arr.tobytes())
+
+    def _rewrite_files(self, t: str, days: np.ndarray, values: Dict[str, np.ndarray]) -> None:
+        os.makedirs(os.path.join(self.root, t), exist_ok=True)
+        for name in FIELDS + (DAY,):
+            arr = (days if name == DAY else values[name]).astype(DTYPES[name])
+            tmp = self._path(t, name) + ".tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(arr.tobytes())
+            # existing memmaps keep the old inode, so open views stay valid
+            os.replace(tmp, self._path(t, name))
+
+
+def _dedupe(days: np.ndarray, values: Dict[str, np.ndarray]) -> tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Sort by day; for repeated days the last row given wins."""
+    order = np.argsort(days, kind="stable")
+    days = days[order]
+    last = np.r_[days[1:] != days[:-1], True]
+    return days[last], {f: v[order][last] for f, v in values.items()}
+
+
+def _matches(stored: Dict[str, np.ndarray], days: np.ndarray, values: Dict[str, np.ndarray]) -> bool:
+    """True when every (day, values) row is already stored unchanged (the usual overlap of an incremental fetch)."""
+    if len(days) == 0:
+        return True
+    idx = np.searchsorted(stored[DAY], days)
+    if (idx >= len(stored[DAY])).any() or (stored[DAY][idx] != days).any():
+        return False
+    return all(np.allclose(stored[f][idx], values[f], equal_nan=True) for f in FIELDS)
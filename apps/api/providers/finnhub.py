@@ -2,6 +2,9 @@ import os
 import finnhub
 from datetime import datetime, timedelta, timezone
 import math
+from providers import ratelimit
+from providers.cache import TTLCache
+from providers.ratelimit import Deferred
 
 API_BASE = "https://finnhub.io/api/v1"
 FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
@@ -10,27 +13,89 @@ if not FINNHUB_API_KEY:
 
 finnhub_client = finnhub.Client(api_key=FINNHUB_API_KEY)
 
+# Response caches, one per endpoint. TTLs follow how often Finnhub actually changes the data:
+# profiles almost never, metrics daily-ish, recommendation trends monthly, news continuously.
+FINNHUB_CACHE_SIZE = int(os.getenv("FINNHUB_CACHE_SIZE", "2048"))
+profile_cache = TTLCache("profile", FINNHUB_CACHE_SIZE, float(os.getenv("FINNHUB_TTL_PROFILE", str(7 * 86400))))
+metrics_cache = TTLCache("metrics", FINNHUB_CACHE_SIZE, float(os.getenv("FINNHUB_TTL_METRICS", str(6 * 3600))))
+recommendation_cache = TTLCache("recommendation", FINNHUB_CACHE_SIZE, float(os.getenv("FINNHUB_TTL_RECOMMENDATION", str(24 * 3600))))
+news_cache = TTLCache("news", FINNHUB_CACHE_SIZE, float(os.getenv("FINNHUB_TTL_NEWS", "900")))
 
-def fetch_finnhub_recommendation(ticker: str):
+CACHES = (profile_cache, metrics_cache, recommendation_cache, news_cache)
+
+
+def cache_stats() -> list[dict]:
+    return [c.stats() for c in CACHES]
+
+
+def fetch_finnhub_recommendation(ticker: str, deferred: list[str] | None = None):
     symbol = (ticker or "").strip().upper()
     if not symbol:
         return {}
     try:
-        records = finnhub_client.recommendation_trends(symbol=symbol) or []
+        records = recommendation_cache.get_or_load(
+            symbol, lambda: ratelimit.call(lambda: finnhub_client.recommendation_trends(symbol=symbol), op="/stock/recommendation") or [])
         return records
-    except Exception:
+    except Deferred as e:
+        print("[finnhub] DEFERRED: recommendation", symbol, str(e))
+        if deferred is not None:
+            deferred.append(symbol)
+        return []
+    except Exception as e:
+        print("[finnhub] ERROR: recommendation", symbol, type(e).__name__, str(e))
         return []
     
-def fetch_company_news(ticker: str, days: int = 30, limit: int = 365, ) -> list[dict]:
+def fetch_company_news(ticker: str, days: int = 30, limit: int = 365, deferred: list[str] | None = None) -> list[dict]:
     symbol = (ticker or "").strip().upper()
     if not symbol:
         return []
-    now = datetime.now(timezone.utc).date()  
-    start = now - timedelta(days=max(1, min(days, 365)))
+    def load():
+        start, now = _news_window(days)
+        news = ratelimit.call(lambda: finnhub_client.company_news(symbol, _from=start, to=now), op="/company-news") or []
+        return _normalize_news(news, limit)
+
     try:
-        news = finnhub_client.company_news(symbol, _from=start.isoformat(), to=now.isoformat()) or []
-    except Exception:
+        return news_cache.get_or_load((symbol, days, limit), load)
+    except Deferred as e:
+        print("[finnhub] DEFERRED: news", symbol, str(e))
+        if deferred is not None:
+            deferred.append(symbol)
+        return []
+    except Exception as e:
+        print("[finnhub] ERROR: news", symbol, type(e).__name__, str(e))
         return []
+
+
+def fetch_candles(ticker: str, start: int, end: int, deferred: list[str] | None = None) -> dict:
+    """
+    Daily candles between unix seconds start..end: {'t': [...], 'o', 'h', 'l', 'c', 'v'}, {} when
+    there are none. Not cached: the price store keeps them. Rate-limited symbols go to `deferred`.
+    """
+    symbol = (ticker or "").strip().upper()
+    if not symbol:
+        return {}
+    try:
+        payload = ratelimit.call(lambda: finnhub_client.stock_candles(symbol, "D", int(start), int(end)), op="/stock/candle") or {}
+    except Deferred as e:
+        print("[finnhub] DEFERRED: candles", symbol, str(e))
+        if deferred is not None:
+            deferred.append(symbol)
+        return {}
+    except Exception as e:
+        print("[finnhub] ERROR: candles", symbol, type(e).__name__, str(e))
+        return {}
+    if payload.get("s") != "ok" or not payload.get("t"):
+        return {}
+    return {k: payload.get(k) or [] for k in ("t", "o", "h", "l", "c", "v")}
+
+
+def _news_window(days: int) -> tuple[str, str]:
+    now = datetime.now(timezone.utc).date()  
+    start = now - timedelta(days=max(1, min(days, 365)))
+    return start.isoformat(), now.isoformat()
+
+
+def _normalize_news(news: list[dict], limit: int) -> list[dict]:
     # most recent first
     news.sort(key=lambda x: x.get("datetime", 0), reverse=True)
 
@@ -47,7 +112,8 @@ def fetch_company_news(ticker: str, days: int = 30, limit: int = 365, ) -> list[
         })
     return out     
 
-def fetch_profiles(tickers: list[str]) -> list[dict]:
+def fetch_profiles(tickers: list[str], deferred: list[str] | None = None) -> list[dict]:
+    """Symbols that hit the rate limit or kept failing upstream are appended to `deferred`."""
     if not tickers:
         return []
     rows: list[dict] = []
@@ -60,36 +126,47 @@ def fetch_profiles(tickers: list[str]) -> list[dict]:
         seen.add(sym)
 
         try:
-            profile = finnhub_client.company_profile2(symbol=sym) or {}
-        except Exception:
+            profile = profile_cache.get_or_load(
+                sym, lambda: ratelimit.call(lambda: finnhub_client.company_profile2(symbol=sym), op="/stock/profile2") or {})
+        except Deferred as e:
+            print("[finnhub] DEFERRED: profile", sym, str(e))
+            if deferred is not None:
+                deferred.append(sym)
+            continue
+        except Exception as e:
+            print("[finnhub] ERROR: profile", sym, type(e).__name__, str(e))
             continue
 
-        # get basic props 
-        name = (profile.get("name") or sym).strip()
-        sector = (profile.get("finnhubIndustry") or "Unknown").strip()
-
-        # finnhub returns marketcap and shareout in millions, convert to real numbers in props
-        raw_mcap = _num(profile.get("marketCapitalization"))
-        raw_so = _num(profile.get("shareOutstanding"))
-        # extra props from profile
-        props = {
-            "exchange": profile.get("exchange"),
-            "country": profile.get("country"),
-            "currency": profile.get("currency"),
-            "ipo": profile.get("ipo"),
-            "marketCap": raw_mcap * 1_000_000 if raw_mcap is not None else None,
-            "sharesOutstanding": raw_so * 1_000_000 if raw_so is not None else None,
-            "weburl": profile.get("weburl"),
-        }
-
-        #clean props of empty values
-        props = {k: v for k, v in props.items() if v not in (None, "", 0, [])}
-
-        rows.append({"ticker": sym, "name": name, "sector": sector, "props": props})
+        rows.append(_normalize_profile(sym, profile))
 
     return rows
 
 
+def _normalize_profile(sym: str, profile: dict) -> dict:
+    # get basic props 
+    name = (profile.get("name") or sym).strip()
+    sector = (profile.get("finnhubIndustry") or "Unknown").strip()
+
+    # finnhub returns marketcap and shareout in millions, convert to real numbers in props
+    raw_mcap = _num(profile.get("marketCapitalization"))
+    raw_so = _num(profile.get("shareOutstanding"))
+    # extra props from profile
+    props = {
+        "exchange": profile.get("exchange"),
+        "country": profile.get("country"),
+        "currency": profile.get("currency"),
+        "ipo": profile.get("ipo"),
+        "marketCap": raw_mcap * 1_000_000 if raw_mcap is not None else None,
+        "sharesOutstanding": raw_so * 1_000_000 if raw_so is not None else None,
+        "weburl": profile.get("weburl"),
+    }
+
+    #clean props of empty values
+    props = {k: v for k, v in props.items() if v not in (None, "", 0, [])}
+
+    return {"ticker": sym, "name": name, "sector": sector, "props": props}
+
+
 def _num(x):
     try:
         if x is None: 
@@ -100,10 +177,11 @@ def _num(x):
         return None
 
 #from chatgpt - aswell same regarding the numeric cleaner above
-def fetch_basic_financials(tickers: list[str]) -> dict[str, dict]:
+def fetch_basic_financials(tickers: list[str], deferred: list[str] | None = None) -> dict[str, dict]:
     """
     Return { 'AAPL': {'pe':..., 'pb':..., 'ps':..., 'roe':..., ...}, ... }
     Pulls Finnhub 'company_basic_financials' (metric='all') and maps to our normalized keys.
+    Symbols that hit the rate limit or kept failing upstream are appended to `deferred`.
     """
     out: dict[str, dict] = {}
     if not tickers:
@@ -116,62 +194,76 @@ def fetch_basic_financials(tickers: list[str]) -> dict[str, dict]:
             continue
         seen.add(sym)
 
+        def load():
+            payload = ratelimit.call(lambda: finnhub_client.company_basic_financials(symbol=sym, metric="all"), op="/stock/metric") or {}
+            return _normalize_metrics(payload.get("metric") or {})
+
         try:
-            payload = finnhub_client.company_basic_financials(symbol=sym, metric="all") or {}
-        except Exception:
+            m = metrics_cache.get_or_load(sym, load)
+        except Deferred as e:
+            print("[finnhub] DEFERRED: metrics", sym, str(e))
+            if deferred is not None:
+                deferred.append(sym)
+            continue
+        except Exception as e:
+            print("[finnhub] ERROR: metrics", sym, type(e).__name__, str(e))
             continue
-
-        metric = payload.get("metric") or {}
-        # map: choose the first available key in each list
-        def pick(keys: list[str]):
-            for k in keys:
-                if k in metric:
-                    return _num(metric.get(k))
-            return None
-
-        m: dict[str, float] = {}
-        # valuation
-        v = pick(["peInclExtraTTM", "peTTM", "peBasicExclExtraTTM"])
-        if v is not None: m["pe"] = v
-        v = pick(["pbAnnual", "pbTTM"])
-        if v is not None: m["pb"] = v
-        v = pick(["psTTM"])
-        if v is not None: m["ps"] = v
-        # quality / margins
-        v = pick(["roeTTM"])
-        if v is not None: m["roe"] = v
-        v = pick(["roaTTM"])
-        if v is not None: m["roa"] = v
-        v = pick(["grossMarginTTM"])
-        if v is not None: m["grossMarginTTM"] = v
-        v = pick(["operatingMarginTTM"])
-        if v is not None: m["operatingMarginTTM"] = v
-        v = pick(["netProfitMarginTTM", "netMarginTTM"])
-        if v is not None: m["netMarginTTM"] = v
-        # leverage & liquidity
-        v = pick(["debtToEquity"])
-        if v is not None: m["debtToEquity"] = v
-        v = pick(["currentRatio"])
-        if v is not None: m["currentRatio"] = v
-        v = pick(["quickRatio"])
-        if v is not None: m["quickRatio"] = v
-        # risk & income
-        v = pick(["beta"])
-        if v is not None: m["beta"] = v
-        dy = _num(metric.get("dividendYieldTTM"))
-        if dy is not None:
-            # normalize to fraction if API returns percent like 2.5 → 0.025
-            if dy > 1.0:
-                dy = dy / 100.0
-            m["dividendYieldTTM"] = max(0.0, min(1.0, dy))
-        # growth (optional)
-        v = pick(["revenueGrowthTTM"])
-        if v is not None: m["revenueGrowthTTM"] = v
-        v = pick(["epsGrowthTTM"])
-        if v is not None: m["epsGrowthTTM"] = v
 
         if m:
             out[sym] = m
 
     return out
 
+
+def _normalize_metrics(metric: dict) -> dict[str, float]:
+    """Map Finnhub's raw 'metric' block onto our normalized keys."""
+    # map: choose the first available key in each list
+    def pick(keys: list[str]):
+        for k in keys:
+            if k in metric:
+                return _num(metric.get(k))
+        return None
+
+    m: dict[str, float] = {}
+    # valuation
+    v = pick(["peInclExtraTTM", "peTTM", "peBasicExclExtraTTM"])
+    if v is not None: m["pe"] = v
+    v = pick(["pbAnnual", "pbTTM"])
+    if v is not None: m["pb"] = v
+    v = pick(["psTTM"])
+    if v is not None: m["ps"] = v
+    # quality / margins
+    v = pick(["roeTTM"])
+    if v is not None: m["roe"] = v
+    v = pick(["roaTTM"])
+    if v is not None: m["roa"] = v
+    v = pick(["grossMarginTTM"])
+    if v is not None: m["grossMarginTTM"] = v
+    v = pick(["operatingMarginTTM"])
+    if v is not None: m["operatingMarginTTM"] = v
+    v = pick(["netProfitMarginTTM", "netMarginTTM"])
+    if v is not None: m["netMarginTTM"] = v
+    # leverage & liquidity
+    v = pick(["debtToEquity"])
+    if v is not None: m["debtToEquity"] = v
+    v = pick(["currentRatio"])
+    if v is not None: m["currentRatio"] = v
+    v = pick(["quickRatio"])
+    if v is not None: m["quickRatio"] = v
+    # risk & income
+    v = pick(["beta"])
+    if v is not None: m["beta"] = v
+    dy = _num(metric.get("dividendYieldTTM"))
+    if dy is not None:
+        # normalize to fraction if API returns percent like 2.5 → 0.025
+        if dy > 1.0:
+            dy = dy / 100.0
+        m["dividendYieldTTM"] = max(0.0, min(1.0, dy))
+    # growth (optional)
+    v = pick(["revenueGrowthTTM"])
+    if v is not None: m["revenueGrowthTTM"] = v
+    v = pick(["epsGrowthTTM"])
+    if v is not None: m["epsGrowthTTM"] = v
+
+    return m
+
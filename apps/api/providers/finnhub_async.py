@@ -0,0 +1,141 @@
+import os
+import asyncio
+import httpx
+
+from providers import ratelimit
+from providers.ratelimit import Deferred
+from providers.finnhub import (
+    API_BASE,
+    FINNHUB_API_KEY,
+    _news_window,
+    _normalize_news,
+    _normalize_profile,
+    _normalize_metrics,
+    metrics_cache,
+    news_cache,
+    profile_cache,
+    recommendation_cache,
+)
+
+# One pooled keep-alive client per process; every async fetch below shares its connections.
+FINNHUB_MAX_CONNECTIONS = int(os.getenv("FINNHUB_MAX_CONNECTIONS", "20"))
+FINNHUB_TIMEOUT = float(os.getenv("FINNHUB_TIMEOUT", "10"))
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=API_BASE,
+            headers={"X-Finnhub-Token": FINNHUB_API_KEY},
+            timeout=FINNHUB_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=FINNHUB_MAX_CONNECTIONS,
+                max_keepalive_connections=FINNHUB_MAX_CONNECTIONS,
+                keepalive_expiry=30.0,
+            ),
+        )
+    return _client
+
+
+async def close_async_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _get(path: str, **params):
+    """One rate-limited GET, retried on 429/5xx; raises Deferred when it gives up."""
+    async def once():
+        resp = await get_async_client().get(path, params=params)
+        resp.raise_for_status()
+        return resp.json()
+
+    return await ratelimit.acall(once, op=path)
+
+
+def _symbols(tickers: list[str]) -> list[str]:
+    """Uppercased, de-duplicated, order-preserving."""
+    return list(dict.fromkeys(s for s in ((t or "").strip().upper() for t in tickers) if s))
+
+
+async def afetch_finnhub_recommendation(ticker: str, deferred: list[str] | None = None):
+    symbol = (ticker or "").strip().upper()
+    if not symbol:
+        return {}
+    try:
+        return await recommendation_cache.aget_or_load(
+            symbol, lambda: _get("/stock/recommendation", symbol=symbol)) or []
+    except Deferred as e:
+        print("[finnhub] DEFERRED: recommendation", symbol, str(e))
+        if deferred is not None:
+            deferred.append(symbol)
+        return []
+    except Exception as e:
+        print("[finnhub] ERROR: recommendation", symbol, type(e).__name__, str(e))
+        return []
+
+
+async def afetch_company_news(ticker: str, days: int = 30, limit: int = 365,
+                              deferred: list[str] | None = None) -> list[dict]:
+    symbol = (ticker or "").strip().upper()
+    if not symbol:
+        return []
+    async def load():
+        start, now = _news_window(days)
+        news = await _get("/company-news", symbol=symbol, **{"from": start, "to": now}) or []
+        return _normalize_news(news, limit)
+
+    try:
+        return await news_cache.aget_or_load((symbol, days, limit), load)
+    except Deferred as e:
+        print("[finnhub] DEFERRED: news", symbol, str(e))
+        if deferred is not None:
+            deferred.append(symbol)
+        return []
+    except Exception as e:
+        print("[finnhub] ERROR: news", symbol, type(e).__name__, str(e))
+        return []
+
+
+async def afetch_profiles(tickers: list[str], deferred: list[str] | None = None) -> list[dict]:
+    async def one(sym: str):
+        try:
+            profile = await profile_cache.aget_or_load(sym, lambda: _get("/stock/profile2", symbol=sym)) or {}
+        except Deferred as e:
+            print("[finnhub] DEFERRED: profile", sym, str(e))
+            if deferred is not None:
+                deferred.append(sym)
+            return None
+        except Exception as e:
+            print("[finnhub] ERROR: profile", sym, type(e).__name__, str(e))
+            return None
+        return _normalize_profile(sym, profile)
+
+    rows = await asyncio.gather(*(one(sym) for sym in _symbols(tickers or [])))
+    return [r for r in rows if r is not None]
+
+
+async def afetch_basic_financials(tickers: list[str], deferred: list[str] | None = None) -> dict[str, dict]:
+    """Async twin of fetch_basic_financials: { 'AAPL': {'pe':..., ...}, ... }."""
+    async def one(sym: str):
+        async def load():
+            payload = await _get("/stock/metric", symbol=sym, metric="all") or {}
+            return _normalize_metrics(payload.get("metric") or {})
+
+        try:
+            return sym, await metrics_cache.aget_or_load(sym, load)
+        except Deferred as e:
+            print("[finnhub] DEFERRED: metrics", sym, str(e))
+            if deferred is not None:
+                deferred.append(sym)
+            return sym, {}
+        except Exception as e:
+            print("[finnhub] ERROR: metrics", sym, type(e).__name__, str(e))
+            return sym, {}
+
+    pairs = await asyncio.gather(*(one(sym) for sym in _symbols(tickers or [])))
+    return {sym: m for sym, m in pairs if m}
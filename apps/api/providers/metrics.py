@@ -0,0 +1,143 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Small in-process Prometheus registry (histograms + scrape-time collectors) plus per-request
+# timing for the Server-Timing header. No client library needed; the text format is simple.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # label values -> bucket counts + [sum, count]
+
+    def observe(self, seconds: float, *label_values: str) -> None:
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def expose(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for values, series in sorted(snapshot.items()):
+            base = _labels(self.labels, values)
+            cumulative = 0.0
+            for le, n in zip(self.buckets, series):
+                cumulative += n
+                yield f'{self.name}_bucket{_labels(self.labels + ("le",), values + (_fmt(le),))} {_fmt(cumulative)}'
+            yield f'{self.name}_bucket{_labels(self.labels + ("le",), values + ("+Inf",))} {_fmt(series[-1])}'
+            yield f"{self.name}_sum{base} {series[-2]!r}"
+            yield f"{self.name}_count{base} {_fmt(series[-1])}"
+
+
+def _fmt(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+REQUESTS = Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+DEPENDENCIES = Histogram("dependency_duration_seconds", "Latency of calls to Finnhub, Neo4j and the LLM.", ("dependency", "op", "outcome"))
+
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+
+def register_collector(fn: Callable[[], Iterable[str]]) -> None:
+    """fn() yields exposition lines at scrape time (gauges read from caches, pools, ...)."""
+    _collectors.append(fn)
+
+
+def gauge_lines(name: str, help: str, samples: Iterable[Tuple[Dict[str, str], float | None]], kind: str = "gauge") -> Iterable[str]:
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} {kind}"
+    for labels, value in samples:
+        if value is not None:
+            yield f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_fmt(value)}"
+
+
+def render() -> str:
+    lines: List[str] = []
+    for h in (REQUESTS, DEPENDENCIES):
+        lines.extend(h.expose())
+    for fn in _collectors:
+        try:
+            lines.extend(fn())
+        except Exception as e:
+            print("[metrics] ERROR:", type(e).__name__, str(e))
+    return "\n".join(lines) + "\n"
+
+
+#--------------------------------------- per-request timing ----------------------------------------
+# The middleware puts a fresh dict in this ContextVar; dependency timers add to it from the
+# request's task and from any thread that runs with a copy of its context.
+_request_timing: contextvars.ContextVar[Dict[str, List[float]] | None] = contextvars.ContextVar("request_timing", default=None)
+_timing_lock = threading.Lock()
+
+
+def start_request() -> Tuple[Dict[str, List[float]], contextvars.Token]:
+    timing: Dict[str, List[float]] = {}
+    return timing, _request_timing.set(timing)
+
+
+def end_request(token: contextvars.Token) -> None:
+    _request_timing.reset(token)
+
+
+def add_timing(key: str, seconds: float) -> None:
+    timing = _request_timing.get()
+    if timing is not None:
+        with _timing_lock:
+            entry = timing.setdefault(key, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+
+def server_timing(timing: Dict[str, List[float]], total_s: float) -> str:
+    """Server-Timing header value: total plus summed time and call count per dependency."""
+    parts = [f"app;dur={total_s * 1000:.1f}"]
+    with _timing_lock:
+        items = sorted(timing.items())
+    for key, (seconds, count) in items:
+        parts.append(f'{key};dur={seconds * 1000:.1f};desc="{count} call{"s" if count != 1 else ""}"')
+    return ", ".join(parts)
+
+
+@contextmanager
+def timed(dependency: str, op: str, timing_key: str | None = None):
+    """Record one dependency call in the histogram and in the current request's Server-Timing."""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        DEPENDENCIES.observe(elapsed, dependency, op, outcome)
+        add_timing(timing_key or dependency, elapsed)
@@ -0,0 +1,288 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+from providers import metrics
+
+try:
+    import fcntl
+except Exception:  # not available on Windows, the bucket then stays process-local
+    fcntl = None
+
+# Finnhub free tier: ~60 calls/minute. Every provider call takes one token from the same bucket.
+FINNHUB_RATE_PER_MIN = float(os.getenv("FINNHUB_RATE_PER_MIN", "60"))
+FINNHUB_RATE_BURST = float(os.getenv("FINNHUB_RATE_BURST", "10"))
+# set to a path (e.g. /tmp/finnhub.bucket) to share one budget across uvicorn workers on the host
+FINNHUB_RATE_FILE = os.getenv("FINNHUB_RATE_FILE")
+# tokens the bulk lane must leave in the bucket, so interactive calls rarely have to wait
+FINNHUB_BULK_RESERVE = float(os.getenv("FINNHUB_BULK_RESERVE", "2"))
+
+LANES = ("interactive", "bulk")
+# how long a caller waits for a token before its symbol is reported as deferred
+ACQUIRE_TIMEOUT = {
+    "interactive": float(os.getenv("FINNHUB_WAIT_INTERACTIVE", "10")),
+    "bulk": float(os.getenv("FINNHUB_WAIT_BULK", "30")),
+}
+MAX_ATTEMPTS = int(os.getenv("FINNHUB_MAX_ATTEMPTS", "4"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Deferred(Exception):
+    """The call was not made or kept failing (rate budget exhausted, 429/5xx after retries)."""
+
+
+_lane: contextvars.ContextVar[str] = contextvars.ContextVar("finnhub_lane", default="interactive")
+
+
+@contextmanager
+def lane(name: str):
+    """Run provider calls in this block on the given priority lane ('interactive' or 'bulk')."""
+    if name not in LANES:
+        raise ValueError(f"unknown lane {name!r}")
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+class TokenBucket:
+    """
+    Token bucket with two priority lanes. Bulk callers yield while interactive callers are
+    waiting and may not dip into the last `bulk_reserve` tokens. With `state_file`, the bucket
+    state lives in a flock-protected file so all worker processes draw from one budget.
+    """
+
+    def __init__(self, rate_per_min: float, capacity: float, *, bulk_reserve: float = 0.0,
+                 state_file: str | None = None):
+        self.rate = max(rate_per_min, 1e-6) / 60.0
+        self.capacity = max(capacity, 1.0)
+        self.bulk_reserve = min(max(bulk_reserve, 0.0), self.capacity - 1.0)
+        self.state_file = state_file if fcntl is not None else None
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._stamp = time.time()
+        self._interactive_waiting = 0
+        self.granted = {name: 0 for name in LANES}
+        self.timeouts = {name: 0 for name in LANES}
+        self.wait_s = {name: 0.0 for name in LANES}
+
+    # --- state: in memory or in the shared file ---
+    def _take_locked(self, need: float) -> float:
+        """Refill, then take one token if at least `need` are available. Returns seconds to wait (0 = taken)."""
+        now = time.time()
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        if self._tokens >= need:
+            self._tokens -= 1.0
+            return 0.0
+        return (need - self._tokens) / self.rate
+
+    def _take(self, need: float) -> float:
+        with self._lock:
+            if not self.state_file:
+                return self._take_locked(need)
+            with open(self.state_file, "a+") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    fh.seek(0)
+                    parts = fh.read().split()
+                    if len(parts) == 2:
+                        self._tokens, self._stamp = float(parts[0]), float(parts[1])
+                    wait = self._take_locked(need)
+                    self._write_state(fh)
+                    return wait
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _write_state(self, fh) -> None:
+        fh.seek(0)
+        fh.truncate()
+        fh.write(f"{self._tokens} {self._stamp}")
+        fh.flush()
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after upstream answered 429."""
+        with self._lock:
+            self._tokens, self._stamp = 0.0, time.time()
+            if self.state_file:
+                with open(self.state_file, "a+") as fh:
+                    fcntl.flock(fh, fcntl.LOCK_EX)
+                    try:
+                        self._write_state(fh)
+                    finally:
+                        fcntl.flock(fh, fcntl.LOCK_UN)
+
+    # --- acquire ---
+    def _try(self, lane_name: str) -> float:
+        if lane_name == "bulk":
+            if self._interactive_waiting:
+                return 0.05
+            return self._take(1.0 + self.bulk_reserve)
+        return self._take(1.0)
+
+    async def _atry(self, lane_name: str) -> float:
+        # the shared file means a flock that other processes may hold: wait for it off the event loop
+        if self.state_file:
+            return await asyncio.to_thread(self._try, lane_name)
+        return self._try(lane_name)
+
+    def _granted(self, lane_name: str, started: float) -> bool:
+        self.granted[lane_name] += 1
+        self.wait_s[lane_name] += time.monotonic() - started
+        return True
+
+    def _set_waiting(self, lane_name: str, delta: int) -> None:
+        if lane_name == "interactive":
+            with self._lock:
+                self._interactive_waiting += delta
+
+    def acquire(self, lane_name: str = "interactive", timeout: float | None = None) -> bool:
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        self._set_waiting(lane_name, 1)
+        try:
+            while True:
+                wait = self._try(lane_name)
+                if wait <= 0:
+                    return self._granted(lane_name, started)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts[lane_name] += 1
+                        return False
+                    wait = min(wait, remaining)
+                time.sleep(wait)
+        finally:
+            self._set_waiting(lane_name, -1)
+
+    async def aacquire(self, lane_name: str = "interactive", timeout: float | None = None) -> bool:
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        self._set_waiting(lane_name, 1)
+        try:
+            while True:
+                wait = await self._atry(lane_name)
+                if wait <= 0:
+                    return self._granted(lane_name, started)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts[lane_name] += 1
+                        return False
+                    wait = min(wait, remaining)
+                await asyncio.sleep(wait)
+        finally:
+            self._set_waiting(lane_name, -1)
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_min": round(self.rate * 60.0, 3),
+            "capacity": self.capacity,
+            "bulk_reserve": self.bulk_reserve,
+            "shared_file": self.state_file,
+            "granted": dict(self.granted),
+            "timeouts": dict(self.timeouts),
+            "avg_wait_s": {k: round(self.wait_s[k] / self.granted[k], 4) if self.granted[k] else None for k in LANES},
+        }
+
+
+bucket = TokenBucket(FINNHUB_RATE_PER_MIN, FINNHUB_RATE_BURST,
+                     bulk_reserve=FINNHUB_BULK_RESERVE, state_file=FINNHUB_RATE_FILE)
+
+
+#--------------------------------------- retry ----------------------------------------
+def _status_of(exc: BaseException) -> int | None:
+    status = getattr(exc, "status_code", None)  # finnhub.FinnhubAPIException
+    if status is None:
+        response = getattr(exc, "response", None)  # httpx / requests HTTP errors
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def _is_requests_network_error(exc: BaseException) -> bool:
+    # requests (used by finnhub-python) isn't a direct dependency: match its classes by name
+    return any(c.__module__.split(".")[0] == "requests" and c.__name__ in ("ConnectionError", "Timeout")
+               for c in type(exc).__mro__)
+
+
+def _is_transient(exc: BaseException) -> bool:
+    status = _status_of(exc)
+    if status is not None:
+        return status in RETRY_STATUSES
+    return isinstance(exc, httpx.TransportError) or _is_requests_network_error(exc)
+
+
+def _backoff(exc: BaseException, attempt: int) -> float:
+    response = getattr(exc, "response", None)
+    retry_after = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), 60.0)
+    except ValueError:
+        pass
+    return min(30.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+def _on_failure(exc: BaseException) -> None:
+    if _status_of(exc) == 429:
+        bucket.drain()
+
+
+def call(fn: Callable[[], Any], op: str = "call") -> Any:
+    """
+    Run one upstream call under the rate limiter, retrying 429/5xx/network errors with backoff.
+    `op` (the Finnhub endpoint) labels the latency metrics.
+    """
+    lane_name = current_lane()
+    for attempt in range(MAX_ATTEMPTS):
+        waited = time.perf_counter()
+        granted = bucket.acquire(lane_name, timeout=ACQUIRE_TIMEOUT[lane_name])
+        metrics.add_timing("finnhub_wait", time.perf_counter() - waited)
+        if not granted:
+            raise Deferred("rate limit budget exhausted")
+        try:
+            with metrics.timed("finnhub", op):
+                return fn()
+        except Exception as e:
+            if not _is_transient(e):
+                raise
+            _on_failure(e)
+            if attempt == MAX_ATTEMPTS - 1:
+                raise Deferred(f"gave up after {MAX_ATTEMPTS} attempts: {type(e).__name__}") from e
+            time.sleep(_backoff(e, attempt))
+
+
+async def acall(fn: Callable[[], Awaitable[Any]], op: str = "call") -> Any:
+    """Async twin of call()."""
+    lane_name = current_lane()
+    for attempt in range(MAX_ATTEMPTS):
+        waited = time.perf_counter()
+        granted = await bucket.aacquire(lane_name, timeout=ACQUIRE_TIMEOUT[lane_name])
+        metrics.add_timing("finnhub_wait", time.perf_counter() - waited)
+        if not granted:
+            raise Deferred("rate limit budget exhausted")
+        try:
+            with metrics.timed("finnhub", op):
+                return await fn()
+        except Exception as e:
+            if not _is_transient(e):
+                raise
+            if bucket.state_file:
+                await asyncio.to_thread(_on_failure, e)
+            else:
+                _on_failure(e)
+            if attempt == MAX_ATTEMPTS - 1:
+                raise Deferred(f"gave up after {MAX_ATTEMPTS} attempts: {type(e).__name__}") from e
+            await asyncio.sleep(_backoff(e, attempt))
@@ -0,0 +1,140 @@
+from typing import Any, Dict, List, Mapping
+
+import numpy as np
+
+# Bump whenever the scoring rules or fmt_money change: Asset nodes stamped with an older
+# scoreRulesVersion get their materialized score recomputed on the next read.
+RULES_VERSION = 1
+
+# Normalized metric keys on the Asset node that the fundamentals score reads
+METRIC_KEYS = (
+    "pe", "pb", "ps",
+    "roe", "roa",
+    "grossMarginTTM", "operatingMarginTTM", "netMarginTTM",
+    "debtToEquity", "currentRatio", "quickRatio",
+    "beta", "dividendYieldTTM",
+    "marketCap",
+)
+
+
+def _num(v, default=None):
+    try:
+        if v is None:
+            return default
+        f = float(v)
+        return f
+    except Exception:
+        return default
+
+
+def extract_metrics(item: Mapping[str, Any]) -> Dict[str, float | None]:
+    return {k: _num(item.get(k)) for k in METRIC_KEYS}
+
+
+def score_fundamentals(m: Mapping[str, float | None]) -> tuple[int, List[str]]:
+    """Rule-based 0-100 fundamentals score plus human-readable notes, for one asset."""
+    pe, pb, ps = m.get("pe"), m.get("pb"), m.get("ps")
+    roe = m.get("roe")
+    gm, om, nm = m.get("grossMarginTTM"), m.get("operatingMarginTTM"), m.get("netMarginTTM")
+    dte, cr, qr = m.get("debtToEquity"), m.get("currentRatio"), m.get("quickRatio")
+    beta, dy = m.get("beta"), m.get("dividendYieldTTM")
+
+    score = 50
+    notes = []
+
+    if pe is not None:
+        if pe < 12:  score += 6;  notes.append(f"P/E {pe:.1f} looks inexpensive.")
+        elif pe > 30: score -= 6; notes.append(f"P/E {pe:.1f} looks rich.")
+        else: notes.append(f"P/E {pe:.1f} is moderate.")
+
+    if pb is not None and pb > 6: score -= 3
+    if ps is not None and ps > 12: score -= 3
+
+    if roe is not None:
+        if roe >= 15: score += 6; notes.append(f"ROE {roe:.1f}% is strong.")
+        elif roe < 5: score -= 4; notes.append(f"ROE {roe:.1f}% is low.")
+
+    if gm is not None and gm >= 50: score += 3
+    if om is not None and om >= 20: score += 2
+    if nm is not None and nm >= 15: score += 2
+
+    if dte is not None:
+        if dte > 2.0: score -= 5; notes.append(f"Debt/Equity {dte:.2f} is high.")
+        elif dte < 0.5: score += 3
+
+    if cr is not None and cr < 1.0: score -= 3
+    if qr is not None and qr < 0.8: score -= 2
+
+    if beta is not None:
+        if beta > 1.4: score -= 3
+        elif beta < 0.8: score += 2
+
+    if dy is not None and dy >= 0.02: score += 2  # ≥2% div yield
+
+    score = max(0, min(100, score))
+    return score, notes
+
+
+def fmt_money(x: float | None) -> str:
+    if x is None:
+        return "n/a"
+    absx = abs(x)
+    if absx >= 1e12: return f"${x/1e12:.2f}T"
+    if absx >= 1e9:  return f"${x/1e9:.2f}B"
+    if absx >= 1e6:  return f"${x/1e6:.2f}M"
+    if absx >= 1e3:  return f"${x/1e3:.2f}K"
+    return f"${x:,.0f}"
+
+
+def materialize(item: Mapping[str, Any]) -> Dict[str, Any]:
+    """Derived properties written onto the Asset node next to the raw metrics."""
+    m = extract_metrics(item)
+    score, notes = score_fundamentals(m)
+    return {
+        "score": score,
+        "scoreNotes": notes,
+        "marketCapPretty": fmt_money(m["marketCap"]),
+        "scoreRulesVersion": RULES_VERSION,
+    }
+
+
+def score_fundamentals_vec(cols: Mapping[str, np.ndarray]) -> np.ndarray:
+    """
+    Same rules as score_fundamentals over whole columns (float64, NaN = missing).
+    Every comparison against NaN is False, which is exactly the scalar "is not None and ..." guard,
+    and the scalar elif chains are mutually exclusive ranges, so plain adds reproduce them.
+    """
+    n = len(next(iter(cols.values()))) if cols else 0
+    score = np.full(n, 50, dtype=np.int64)
+
+    def adj(mask: np.ndarray, delta: int) -> None:
+        score[mask] += delta
+
+    pe, pb, ps = cols["pe"], cols["pb"], cols["ps"]
+    adj(pe < 12, 6)
+    adj(pe > 30, -6)
+    adj(pb > 6, -3)
+    adj(ps > 12, -3)
+
+    roe = cols["roe"]
+    adj(roe >= 15, 6)
+    adj(roe < 5, -4)
+
+    adj(cols["grossMarginTTM"] >= 50, 3)
+    adj(cols["operatingMarginTTM"] >= 20, 2)
+    adj(cols["netMarginTTM"] >= 15, 2)
+
+    dte = cols["debtToEquity"]
+    adj(dte > 2.0, -5)
+    adj(dte < 0.5, 3)
+
+    adj(cols["currentRatio"] < 1.0, -3)
+    adj(cols["quickRatio"] < 0.8, -2)
+
+    beta = cols["beta"]
+    adj(beta > 1.4, -3)
+    adj(beta < 0.8, 2)
+
+    adj(cols["dividendYieldTTM"] >= 0.02, 2)
+
+    return np.clip(score, 0, 100)
@@ -0,0 +1,77 @@
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from scoring import METRIC_KEYS, _num, score_fundamentals_vec
+
+# from the local price store (pricestore.py), filled in after load with set_prices()
+PRICE_KEYS = ("volatility", "max_drawdown")
+
+# columns /screen can filter and sort on
+SCREEN_FIELDS = METRIC_KEYS + PRICE_KEYS + ("score",)
+
+
+class ScreenFrame:
+    """
+    Column-oriented snapshot of the whole asset universe: one float64 array per metric
+    (NaN = missing) plus the fundamentals score computed once, vectorized, at load time.
+    Rows are kept in ticker order so ties always break by ticker.
+    """
+
+    def __init__(self, rows: Sequence[Mapping[str, Any]]):
+        rows = sorted((r for r in rows if r.get("ticker")), key=lambda r: r["ticker"])
+        self.tickers: List[str] = [r["ticker"] for r in rows]
+        self.names: List[str] = [r.get("name") or r["ticker"] for r in rows]
+        self.sectors: List[str] = [r.get("sector") or "Unknown" for r in rows]
+        self.sector_keys = np.array([s.upper() for s in self.sectors], dtype=object)
+        self.cols: Dict[str, np.ndarray] = {
+            k: np.array([_num(r.get(k), np.nan) for r in rows], dtype=np.float64) for k in METRIC_KEYS
+        }
+        self.scores = score_fundamentals_vec(self.cols)
+        self.cols["score"] = self.scores.astype(np.float64)
+        for k in PRICE_KEYS:
+            self.cols[k] = np.full(len(rows), np.nan)
+        self.loaded_at = time.time()
+
+    def set_prices(self, stats: Mapping[str, Mapping[str, Any]]) -> None:
+        """Fill the PRICE_KEYS columns from {ticker: PriceStore.stats() entry}."""
+        for k in PRICE_KEYS:
+            self.cols[k] = np.array([_num((stats.get(t) or {}).get(k), np.nan) for t in self.tickers], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def screen(self, *, filters: Sequence[Mapping[str, Any]] = (), sector: Optional[str] = None,
+               sort: str = "score", descending: bool = True, top_k: int = 50) -> tuple[int, List[Dict[str, Any]]]:
+        """Apply range filters (missing values never pass), sort, and return (matched, top-K rows)."""
+        mask = np.ones(len(self), dtype=bool)
+        if sector:
+            mask &= self.sector_keys == sector.strip().upper()
+        for f in filters:
+            col = self.cols[f["metric"]]
+            if f.get("min") is not None:
+                mask &= col >= f["min"]
+            if f.get("max") is not None:
+                mask &= col <= f["max"]
+
+        idx = np.flatnonzero(mask)
+        key = self.cols[sort][idx]
+        # missing sort values go last in either direction; ties keep ticker order
+        key = np.where(np.isnan(key), np.inf, -key if descending else key)
+        top = idx[np.lexsort((idx, key))[:top_k]]
+        return len(idx), [self._row(i) for i in top]
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        metrics = {}
+        for k in METRIC_KEYS:
+            v = self.cols[k][i]
+            metrics[k] = None if np.isnan(v) else float(v)
+        return {
+            "ticker": self.tickers[i],
+            "name": self.names[i],
+            "sector": self.sectors[i],
+            "score": int(self.scores[i]),
+            "metrics": metrics,
+            "prices": {k: None if np.isnan(self.cols[k][i]) else float(self.cols[k][i]) for k in PRICE_KEYS},
+        }
@@ -0,0 +1,101 @@
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from heapq import nsmallest
+from typing import Any, Dict, Iterable, List
+
+# sorts after every character we store, so [key, key + _HIGH) is the whole prefix range
+_HIGH = "\U0010ffff"
+
+
+class PrefixIndex:
+    """
+    In-process autocomplete index over ticker and name prefixes.
+    Two sorted arrays (tickerKey, and (nameKey, ticker) pairs) answer a prefix query with
+    two bisects. Same semantics as the /search Cypher: one row per (asset, sector), ordered
+    by ticker, case-insensitive prefix on ticker or name.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._assets: Dict[str, Dict[str, Any]] = {}  # ticker -> {"name", "sectors"}
+        self._tickers: List[str] = []
+        self._names: List[tuple[str, str]] = []
+        self.warm = False
+        self.loaded_at: float | None = None
+        self.updates = 0
+
+    # --- writes ---
+    def load(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Replace the whole index. rows: {ticker, name, sectors}."""
+        assets: Dict[str, Dict[str, Any]] = {}
+        for r in rows:
+            ticker = (r.get("ticker") or "").strip().upper()
+            if ticker:
+                assets[ticker] = {"name": r.get("name") or ticker, "sectors": sorted(set(r.get("sectors") or []))}
+        tickers = sorted(assets)
+        names = sorted((a["name"].upper(), t) for t, a in assets.items())
+        with self._lock:
+            self._assets, self._tickers, self._names = assets, tickers, names
+            self.warm = True
+            self.loaded_at = time.time()
+        return len(assets)
+
+    def upsert(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Incremental update. rows: {ticker, name, sector}; sectors accumulate like IN_SECTOR edges."""
+        with self._lock:
+            for r in rows:
+                ticker = (r.get("ticker") or "").strip().upper()
+                if not ticker:
+                    continue
+                name = r.get("name") or ticker
+                current = self._assets.get(ticker)
+                if current is None:
+                    current = self._assets[ticker] = {"name": name, "sectors": []}
+                    insort(self._tickers, ticker)
+                    insort(self._names, (name.upper(), ticker))
+                elif current["name"] != name:
+                    old = (current["name"].upper(), ticker)
+                    i = bisect_left(self._names, old)
+                    if i < len(self._names) and self._names[i] == old:
+                        del self._names[i]
+                    insort(self._names, (name.upper(), ticker))
+                    current["name"] = name
+                sector = r.get("sector")
+                if sector and sector not in current["sectors"]:
+                    insort(current["sectors"], sector)
+                self.updates += 1
+
+    # --- reads ---
+    def search(self, q: str, limit: int) -> List[Dict[str, Any]]:
+        key = (q or "").strip().upper()
+        with self._lock:
+            lo, hi = bisect_left(self._tickers, key), bisect_left(self._tickers, key + _HIGH)
+            matches = set(self._tickers[lo:hi])
+            lo, hi = bisect_left(self._names, (key,)), bisect_left(self._names, (key + _HIGH,))
+            matches.update(t for _, t in self._names[lo:hi])
+
+            rows: List[Dict[str, Any]] = []
+            for ticker in nsmallest(limit, matches):
+                asset = self._assets[ticker]
+                for sector in asset["sectors"] or ["Unknown"]:
+                    rows.append({"ticker": ticker, "name": asset["name"], "sector": sector})
+            return rows[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = sys.getsizeof(self._assets) + sys.getsizeof(self._tickers) + sys.getsizeof(self._names)
+            for ticker, asset in self._assets.items():
+                size += sys.getsizeof(ticker) + sys.getsizeof(asset) + sys.getsizeof(asset["name"])
+                size += sys.getsizeof(asset["sectors"]) + sum(sys.getsizeof(s) for s in asset["sectors"])
+            for pair in self._names:
+                size += sys.getsizeof(pair) + sys.getsizeof(pair[0])  # ticker strings are shared with _assets
+            return {
+                "warm": self.warm,
+                "assets": len(self._assets),
+                "name_keys": len(self._names),
+                "memory_bytes": size,
+                "loaded_at": self.loaded_at,
+                "incremental_updates": self.updates,
+            }
@@ -31,9 +31,14 @@ with driver.session() as s:
     s.run("""
     UNWIND $rows AS row
     MERGE (sec:Sector {name: row.sector})
+      ON CREATE SET sec.nameKey = toUpper(row.sector)
     MERGE (a:Asset {ticker: row.ticker})
       ON CREATE SET a.name = row.name
       ON MATCH SET a.name = coalesce(a.name, row.name)
+    SET a.tickerKey = row.ticker, a.nameKey = toUpper(coalesce(a.name, row.ticker))
+    SET a.profileFetchedAtMs = coalesce(a.profileFetchedAtMs, 0),
+        a.metricsFetchedAtMs = coalesce(a.metricsFetchedAtMs, 0),
+        a.recsFetchedAtMs = coalesce(a.recsFetchedAtMs, 0)
     MERGE (a)-[:IN_SECTOR]->(sec)
     """, rows=rows)
 
@@ -0,0 +1,143 @@
+import csv
+import hashlib
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Sequence
+
+import numpy as np
+
+from providers.cache import TTLCache
+
+# Lexicon-based headline sentiment: CPU only, no model download, no LLM. Word weights are in
+# [-1, 1] (finance-flavoured, in the spirit of Loughran-McDonald); a negator flips the next few
+# words. Headline score = sum / sqrt(sum^2 + ALPHA), so one strong word lands near ±0.5 and a
+# pile-up saturates towards ±1. Scoring a batch is one tokenizer pass plus a bincount.
+
+LEXICON_VERSION = 1
+
+POSITIVE = {
+    "beat": 0.6, "beats": 0.6, "tops": 0.5, "surge": 0.7, "surges": 0.7, "soar": 0.7, "soars": 0.7,
+    "jump": 0.5, "jumps": 0.5, "rally": 0.6, "rallies": 0.6, "gain": 0.4, "gains": 0.4, "rise": 0.3, "rises": 0.3,
+    "climb": 0.4, "climbs": 0.4, "upgrade": 0.7, "upgrades": 0.7, "upgraded": 0.7,
+    "outperform": 0.6, "outperforms": 0.6, "buy": 0.3, "bullish": 0.7, "strong": 0.4, "stronger": 0.4,
+    "growth": 0.4, "grows": 0.4, "expands": 0.4, "expansion": 0.3, "profit": 0.4, "profitable": 0.5,
+    "raises": 0.4, "raised": 0.3, "boost": 0.5, "boosts": 0.5, "wins": 0.5, "win": 0.4, "approval": 0.5,
+    "approved": 0.5, "launches": 0.2, "breakthrough": 0.7, "dividend": 0.2, "buyback": 0.4, "partnership": 0.3,
+    "exceeds": 0.6, "exceeded": 0.6, "optimistic": 0.6, "optimism": 0.5, "rebound": 0.5, "rebounds": 0.5,
+    "recovery": 0.4, "robust": 0.5, "momentum": 0.3, "innovative": 0.3, "accelerates": 0.4, "upbeat": 0.6,
+}
+
+NEGATIVE = {
+    "miss": -0.6, "misses": -0.6, "missed": -0.6, "fall": -0.4, "falls": -0.4, "drop": -0.4, "drops": -0.4,
+    "plunge": -0.8, "plunges": -0.8, "slump": -0.7, "slumps": -0.7, "tumble": -0.7, "tumbles": -0.7,
+    "sink": -0.5, "sinks": -0.5, "slide": -0.4, "slides": -0.4, "decline": -0.4, "declines": -0.4,
+    "loss": -0.5, "losses": -0.5, "downgrade": -0.7, "downgrades": -0.7, "downgraded": -0.7,
+    "underperform": -0.6, "sell": -0.3, "bearish": -0.7, "weak": -0.5, "weaker": -0.5, "cuts": -0.4,
+    "cut": -0.4, "layoffs": -0.6, "lawsuit": -0.6, "sues": -0.5, "sued": -0.5, "probe": -0.5,
+    "investigation": -0.5, "fraud": -0.9, "recall": -0.5, "delay": -0.4, "delays": -0.4, "delayed": -0.4,
+    "warning": -0.5, "warns": -0.5, "risk": -0.2, "risks": -0.2, "concern": -0.4, "concerns": -0.4,
+    "fears": -0.5, "slowdown": -0.5, "bankruptcy": -1.0, "fined": -0.6,
+    "penalty": -0.5, "halt": -0.5, "halts": -0.5, "faces": -0.2, "struggles": -0.5, "volatile": -0.3,
+    "disappointing": -0.6, "disappoints": -0.6, "pessimistic": -0.6, "crash": -0.9, "selloff": -0.6,
+}
+
+NEGATORS = {"not", "no", "never", "without", "fails", "failed"}
+NEGATION_SPAN = 3
+ALPHA = 1.0
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+def _load_lexicon() -> Dict[str, float]:
+    """Built-in words, optionally extended/overridden by SENTIMENT_LEXICON (CSV: word,weight)."""
+    lexicon = {**POSITIVE, **NEGATIVE}
+    path = os.getenv("SENTIMENT_LEXICON")
+    if path:
+        with open(path, newline="", encoding="utf-8") as fh:
+            for row in csv.reader(fh):
+                if len(row) >= 2 and row[0].strip() and not row[0].startswith("#"):
+                    try:
+                        lexicon[row[0].strip().lower()] = max(-1.0, min(1.0, float(row[1])))
+                    except ValueError:
+                        continue
+    return lexicon
+
+
+class HeadlineScorer:
+    def __init__(self, lexicon: Mapping[str, float], cache_size: int = 20000, cache_ttl: float = 7 * 86400):
+        self.vocab = {w: i for i, w in enumerate(lexicon)}
+        self.weights = np.array(list(lexicon.values()), dtype=np.float64)
+        self.cache = TTLCache("sentiment", cache_size, cache_ttl)
+
+    def score_texts(self, texts: Sequence[str]) -> np.ndarray:
+        """Score every text in [-1, 1] (0 = no lexicon words)."""
+        docs: List[int] = []
+        words: List[int] = []
+        signs: List[float] = []
+        for d, text in enumerate(texts):
+            flip_until = -1
+            for pos, tok in enumerate(_TOKEN.findall((text or "").lower())):
+                if tok in NEGATORS:
+                    flip_until = pos + NEGATION_SPAN
+                    continue
+                idx = self.vocab.get(tok)
+                if idx is not None:
+                    docs.append(d)
+                    words.append(idx)
+                    signs.append(-1.0 if pos <= flip_until else 1.0)
+        if not docs:
+            return np.zeros(len(texts))
+        raw = np.bincount(np.array(docs), weights=self.weights[np.array(words)] * np.array(signs),
+                          minlength=len(texts))
+        return raw / np.sqrt(raw * raw + ALPHA)
+
+    @staticmethod
+    def _key(item: Mapping[str, Any]) -> str:
+        raw = item.get("url") or item.get("headline") or ""
+        return hashlib.sha1(f"{LEXICON_VERSION}|{raw}".encode("utf-8")).hexdigest()
+
+    def score_items(self, items: Sequence[Mapping[str, Any]]) -> List[float]:
+        """Per-item score of headline (+ summary when present), cached by URL or headline hash."""
+        scores: List[float | None] = []
+        todo: List[int] = []
+        for i, it in enumerate(items):
+            # 0.0 is a real score and the cache skips falsy values, so entries are 1-tuples
+            hit = self.cache.get(self._key(it))
+            scores.append(hit[0] if hit else None)
+            if hit is None:
+                todo.append(i)
+        if todo:
+            fresh = self.score_texts([self._text(items[i]) for i in todo])
+            for i, s in zip(todo, fresh):
+                scores[i] = round(float(s), 4)
+                self.cache.set(self._key(items[i]), (scores[i],))
+        return scores
+
+    @staticmethod
+    def _text(item: Mapping[str, Any]) -> str:
+        return f"{item.get('headline') or ''}. {item.get('summary') or ''}"
+
+
+def aggregate(items: Sequence[Mapping[str, Any]], scores: Sequence[float], half_life_days: float = 3.0,
+              now: float | None = None) -> float:
+    """Recency-weighted mean of item scores (weight halves every half_life_days); 0.0 when empty."""
+    if not items:
+        return 0.0
+    now = time.time() if now is None else now
+    ages = np.array([max(0.0, now - float(it.get("datetime") or now)) for it in items]) / 86400.0
+    weights = np.power(0.5, ages / half_life_days)
+    return round(float(np.dot(weights, np.asarray(scores, dtype=np.float64)) / weights.sum()), 3)
+
+
+scorer = HeadlineScorer(
+    _load_lexicon(),
+    cache_size=int(os.getenv("SENTIMENT_CACHE_SIZE", "20000")),
+)
+
+
+def score_news(items: Iterable[Mapping[str, Any]]) -> tuple[float, List[float]]:
+    """(overall sentiment, per-item scores) for a list of news items."""
+    items = list(items)
+    scores = scorer.score_items(items)
+    return aggregate(items, scores), scores
@@ -35,6 +35,9 @@ export default {
     if (method === "POST" && path === "/advice/v1") {
       return proxyJson(request, "/advice/v1");
     }
+    if (method === "POST" && path === "/advice/v1/stream") {
+      return proxyJson(request, "/advice/v1/stream");
+    }
 
     if (method === "GET" && path === "/ingest/finnhub") {
       return proxyGet(path, url.search);